@@ -0,0 +1,61 @@
+import math
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+from app.config import Config
+from app.core.admission import upload_limit_bytes
+from app.core.model_manager import ModelNotReady
+from app.core.scheduler import Overloaded
+from app.services.service_registry import ServiceUnavailable
+
+# Room for the multipart boundaries and form fields around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def overloaded_response(e: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        content={"error": str(e)},
+        status_code=429,
+        headers={"Retry-After": str(math.ceil(e.retry_after))}
+    )
+
+
+def unavailable_response(e: ModelNotReady | ServiceUnavailable) -> JSONResponse:
+    return JSONResponse(
+        content={"error": str(e)},
+        status_code=503,
+        headers={"Retry-After": str(math.ceil(e.retry_after))}
+    )
+
+
+def file_too_large_response(tier: str) -> JSONResponse:
+    return JSONResponse(
+        content={"error": f"File exceeds the {tier} tier limit of {Config.FILE_SIZE_MB_LIMITS[tier]} MB."},
+        status_code=413
+    )
+
+
+class UploadSizeLimit:
+    """
+    ASGI middleware rejecting uploads whose Content-Length is over the
+    tier's FILE_SIZE_MB_LIMITS before the body is received, so oversized
+    files are never buffered or spooled to disk.
+    """
+
+    def __init__(self, app, path: str = "/upload-file"):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == self.path:
+            headers = Headers(scope=scope)
+            tier = (headers.get(Config.TIER_HEADER) or Config.DEFAULT_TIER).strip().lower()
+            try:
+                length = int(headers.get("content-length", ""))
+            except ValueError:
+                length = None
+            if tier in Config.FILE_SIZE_MB_LIMITS and length is not None \
+                    and length > upload_limit_bytes(tier) + MULTIPART_OVERHEAD:
+                await file_too_large_response(tier)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,38 @@
+from fastapi import Depends, HTTPException, Request
+from app.config import Config
+from app.core.admission import rate_limiter
+from app.core.scheduler import Overloaded
+from app.services.service_registry import ServiceRegistry
+from app.core.ingestion import IngestionManager
+
+
+def get_registry(request: Request) -> ServiceRegistry:
+    """
+    FastAPI dependency returning the registry built in the app lifespan.
+    """
+    return request.app.state.registry
+
+
+def get_ingestion(request: Request) -> IngestionManager:
+    return request.app.state.ingestion
+
+
+def get_tier(request: Request) -> str:
+    """
+    The request's tier, from the gateway-set tier header.
+    """
+    tier = (request.headers.get(Config.TIER_HEADER) or Config.DEFAULT_TIER).strip().lower()
+    if tier not in Config.ASKLYNE_TIERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported tier: {tier}")
+    return tier
+
+
+def admit_tier(tier: str = Depends(get_tier)) -> str:
+    """
+    get_tier plus the tier's token-bucket rate limit. An empty bucket raises
+    Overloaded, answered by the app's handler like any other 429.
+    """
+    retry_after = rate_limiter.admit(tier)
+    if retry_after:
+        raise Overloaded(f"Rate limit exceeded for the {tier} tier, retry shortly.", retry_after=retry_after)
+    return tier
@@ -1,238 +1,442 @@
-from fastapi import APIRouter, File, UploadFile, Form , Query
+from fastapi import APIRouter, File, UploadFile, Form , Depends
 from typing import Optional, Literal
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-import pdfplumber
-import io
-from PIL import ImageEnhance, ImageFilter
-import numpy as np
 import os
 import traceback
-from app.services.qdrant_service import QdrantService
-from app.services.typesense_service import TypesenseService
-from PIL import Image
-import pytesseract
-from app.utils.code_parser import extract_code_from_py, extract_code_from_ipynb
+import asyncio
+from app.services.service_registry import ServiceRegistry, ServiceUnavailable
+from app.api.dependencies import get_registry, get_ingestion, admit_tier
+from app.api.admission import overloaded_response, unavailable_response, file_too_large_response
+from app.core.ingestion import IngestionManager, IngestionJob, spool_upload, remove_upload
 import json
-from datetime import datetime
 from app.core.note_builder import generate_notes as build_notes
-from fastapi.responses import FileResponse
-from app.core.note_builder import save_notes_as_pdf
-from app.core.chunker import Chunker
-from app.core.embedder import Embedder
-from app.core.retriever import Retriever
+from fastapi.responses import FileResponse, StreamingResponse
+from app.services.pdf_renderer import pdf_renderer
 from app.core.reranker import Reranker
+from app.core.embedder import Embedder
+from app.core.answer_cache import answer_cache
 from app.core.context_builder import ContextBuilder
-from app.core.llm_client import LLMClient
+from app.core.tokenizer import llm_token_counter_async
+from app.core.llm_client import LLMClient, LLMError
+from app.core import metrics
+from app.core.model_manager import model_manager, ModelNotReady
+from app.core.executor import run_in_thread
+from app.core.scheduler import scheduler, Overloaded
+from app.core.admission import upload_limit_bytes
+from app.services.session_store import get_session_store, ExchangeLimitReached
+from app.config import Config
 import time
 
 
 router = APIRouter()
 
 @router.get("/healthcheck")
+@router.get("/livez")
 def healthcheck():
+    # Liveness: the process is up and serving, models may still be loading
     return {"status": "ok"}
 
 
-@router.post("/upload-file")
+@router.get("/readyz")
+def readiness():
+    stats = model_manager.stats()
+    if not stats["ready"]:
+        return JSONResponse(content={"status": "warming_up", **stats}, status_code=503)
+    return {"status": "ready", **stats}
+
+
+@router.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
+
+
+@router.post("/upload-file", status_code=202)
 async def upload_file(
     file: UploadFile = File(...),
     session_id: str = Form(...),
     mode: str = Form(...),
+    ingestion: IngestionManager = Depends(get_ingestion),
+    tier: str = Depends(admit_tier),
 ):
-    tier = os.getenv("ASKLYNE_TIERS", "free").lower()
-    # Read file content
-    content = await file.read()
-    pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-
-    original_mode = mode
+    if mode == "code" and not file.filename.endswith((".py", ".ipynb")):
+        return JSONResponse(content={"error": "Unsupported code file type"}, status_code=400)
 
-    if original_mode == "notes":
-        try:
-            def preprocess_ocr_image(image: Image.Image) -> Image.Image:
-                image = image.convert("L")  # grayscale
-                image = image.resize((1200, int(image.height * (1200 / image.width))))  # upscale
-                image = image.filter(ImageFilter.MedianFilter(size=3))  # denoise
-                enhancer = ImageEnhance.Contrast(image)
-                image = enhancer.enhance(2.0)  # boost contrast
-                return image
-
-            image = Image.open(io.BytesIO(content))
-            image = preprocess_ocr_image(image)
-            text = pytesseract.image_to_string(image, config="--psm 6")
-        except Exception as e:
-            return JSONResponse(content={"error": f"OCR failed: {str(e)}"}, status_code=400)
-
-
-    elif mode == "code":
-        if file.filename.endswith(".py"):
-            text = extract_code_from_py(content)
-        elif file.filename.endswith(".ipynb"):
-            text = extract_code_from_ipynb(content)
-        else:
-            return JSONResponse(content={"error": "Unsupported code file type"}, status_code=400)
-
-    elif file.filename.endswith(".pdf"):
-        with pdfplumber.open(io.BytesIO(content)) as pdf:
-            text = "\n".join(page.extract_text() or "" for page in pdf.pages)
-
-    else:
-        text = content.decode("utf-8", errors="ignore")
-    
-    mode = "text" if original_mode == "notes" else mode
-
-    # Chunking setup
-    max_tokens = 480
-    overlap = 80
-    chunker = Chunker(file_type=mode, max_tokens=max_tokens, overlap=overlap)
-    chunks = chunker.chunk(text)
-
-    # Embedding
-    embedder = Embedder(tier=tier, mode=mode)
-    embeddings = embedder.embed_chunks(chunks)
-
-    # Store in Qdrant
-    qdrant = QdrantService(tier=tier, mode=mode)
-
-    qdrant.upsert_chunks(
-        chunks=chunks,
-        embeddings=embeddings,
-        session_id=session_id,
-        mode=mode
+    try:
+        ingestion.registry.check(tier, mode)
+    except ServiceUnavailable as e:
+        return unavailable_response(e)
+
+    # UploadSizeLimit already rejected oversized Content-Lengths; this covers
+    # chunked uploads before the spooled file is copied
+    if file.size is not None and file.size > upload_limit_bytes(tier):
+        return file_too_large_response(tier)
+
+    # Spool to a temp file: queued jobs hold its path, not the upload's bytes
+    path = await run_in_thread(
+        "spool", spool_upload, file.file, os.path.splitext(file.filename)[1], upload_limit_bytes(tier)
     )
+    if path is None:
+        return file_too_large_response(tier)
 
-    # Store in Typesense
-    typesense = TypesenseService(tier=tier)
-    typesense.upsert_chunks(
-        chunks=chunks,
-        session_id=session_id,
-        mode=mode
-    )
+    job = IngestionJob(session_id=session_id, tier=tier, mode=mode, filename=file.filename)
+    try:
+        ingestion.submit(job, path)
+    except asyncio.QueueFull:
+        remove_upload(path)
+        return JSONResponse(
+            content={"error": "Ingestion queue is full, retry shortly."},
+            status_code=429,
+            headers={"Retry-After": "5"}
+        )
 
     return {
+        "job_id": job.id,
+        "status": job.status,
         "session_id": session_id,
         "tier": tier,
-        "mode": mode,
-        "num_chunks": len(chunks),
-        "sample_chunk": chunks[0] if chunks else "[empty]",
-        "sample_embedding": embeddings[0][:5] if embeddings else []
+        "mode": job.mode,
     }
 
 
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, ingestion: IngestionManager = Depends(get_ingestion)):
+    job = ingestion.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Unknown job id"}, status_code=404)
+    return job.to_dict()
+
+
 class QueryRequest(BaseModel):
     session_id: str
     query: str
     mode: Literal["text", "notes", "code"]
 
-@router.post("/query")
-async def handle_query(request: QueryRequest):
+
+def reserve_exchange(session_id: str, tier: str):
+    """
+    Claims the exchange this query will store; raises ExchangeLimitReached
+    once the tier's limit is used up. Commit or release the result.
+    """
+    return get_session_store().reserve(session_id, Config.EXCHANGE_LIMITS.get(tier))
+
+
+def exchange_limit_response(tier: str) -> JSONResponse:
+    return JSONResponse(
+        content={"error": f"Exchange limit reached for the {tier} tier ({Config.EXCHANGE_LIMITS[tier]} exchanges per session)."},
+        status_code=429
+    )
+
+
+def build_query_prompt(request: QueryRequest, context: str) -> str:
+    if request.mode == "code":
+        return f"""You are a helpful AI coding assistant.
+
+        You will be given source code and a user request. Based on the request, you may:
+        - Modify the code
+        - Add new functionality
+        - Explain parts of the code
+        - Fix bugs or improve performance
+
+        Code Context:
+        {context}
+
+        User Request:
+        {request.query}
+
+        Respond with either a modified version of the code or a helpful explanation.
+        If you update the code, include the full version of the updated code.
+        """
+
+    SYSTEM_PROMPT = """You are a highly intelligent and helpful AI assistant. 
+    You will be given context from a user-uploaded document or notes, along with a user query.
+    Session Metadata:
+    - Tier: {request.tier.capitalize()}
+    - Mode: {request.mode.capitalize()}
+    Your job is to:
+    - Answer clearly, accurately, and in a user-friendly way
+    - Use bullet points, headings, or paragraphs depending on the question
+    - Expand and explain if context is short or vague
+    - Only use the given context — do NOT make up facts
+    - If the context is not sufficient, respond: "Based on the provided context, I cannot answer confidently."
     
+    If mode = 'notes' → Expect imperfect OCR and try to infer meaning  
+    If mode = 'code'  → Use technical reasoning and full examples where possible
+    """
+
+    return f"{SYSTEM_PROMPT}\n\nContext:\n{context}\n\nUser Question:\n{request.query}\n\nAnswer:"
+
+
+def require_query_models(request: QueryRequest, tier: str):
+    """
+    Raises ModelNotReady (503) until the embedder and reranker this query
+    needs are loaded, rather than holding the request through a model load.
+    """
+    Embedder.ready(tier=tier, mode=request.mode)
+    Reranker.ready(tier=tier)
+
+
+async def lookup_answer(request: QueryRequest, tier: str):
+    """
+    Checks the semantic answer cache before running the pipeline.
+    Returns (session answers, normalised query vector, cached answer or None);
+    the first two are passed back to `answer_cache.put` once answered.
+    """
+    if answer_cache is None:
+        return None, None, None
+    mode = "text" if request.mode == "notes" else request.mode
+    # Taken before retrieval so an upload landing mid-answer marks it stale
+    answers = answer_cache.session((tier, mode, request.session_id))
+    # Same embedder (and query cache) as retrieval, so this isn't a second model call
+    query_vec = answer_cache.normalize(await (await Embedder.create(tier=tier, mode=mode)).embed_query_async(request.query))
+    return answers, query_vec, answer_cache.lookup(answers, query_vec, request.mode)
+
+
+async def prepare_query(request: QueryRequest, registry: ServiceRegistry, tier: str):
+    """
+    Retrieval → rerank → context → prompt, shared by /query and /query/stream.
+    Returns None when nothing relevant was found.
+    """
     start = time.time()
+    mode = "text" if request.mode == "notes" else request.mode
+
+    retriever = registry.retriever(tier, mode)
 
-    tier = os.getenv("ASKLYNE_TIERS", "free").lower()
-    def save_interaction(session_id: str, query: str, response: str):
-        path = f"sessions/{session_id}/interaction_log.json"
-        os.makedirs(os.path.dirname(path), exist_ok=True)
+    reranker = await Reranker.create(tier=tier)
+    # With a reranker, over-retrieve and let the cross-encoder pick the best few
+    chunks = await retriever.retrieve_async(
+        query=request.query,
+        session_id=request.session_id,
+        mode=mode,
+        top_k=Config.RERANK_CANDIDATES if reranker.engine else 5
+    )
+    print("⏱️ Retrieval Time:", round(time.time() - start, 2))
 
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                data = json.load(f)
-        else:
-            data = []
+    if not chunks:
+        return None
 
-        data.append({
-            "timestamp": str(datetime.utcnow()),
-            "query": query,
-            "response": response
-        })
+    t1 = time.time()
+    ranked_chunks = (await reranker.rerank_async(request.query, chunks))[:Config.RERANK_TOP_K]
+    print("⏱️ Rerank Time:", round(time.time() - t1, 2))
 
-        with open(path, "w") as f:
-            json.dump(data, f, indent=2)
+    builder = ContextBuilder(tier=tier, counter=await llm_token_counter_async())
+    context = builder.build(ranked_chunks)
 
-    try:
-        mode = "text" if request.mode == "notes" else request.mode
+    client = LLMClient.from_tier(tier, mode)
+    full_prompt = build_query_prompt(request, context)
+    return context, client, full_prompt
 
-        retriever = Retriever(tier=tier,mode=mode)
 
-        chunks = await retriever.retrieve_async(
-            query=request.query,
-            session_id=request.session_id,
-            mode=mode
-        )
-        print("⏱️ Retrieval Time:", round(time.time() - start, 2))
+@router.post("/query")
+async def handle_query(
+    request: QueryRequest,
+    registry: ServiceRegistry = Depends(get_registry),
+    tier: str = Depends(admit_tier),
+):
+    
+    start = time.time()
+
+    try:
+        reservation = await run_in_thread("session_io", reserve_exchange, request.session_id, tier)
+    except ExchangeLimitReached:
+        return exchange_limit_response(tier)
 
+    try:
+        require_query_models(request, tier)
+        answers, query_vec, hit = await lookup_answer(request, tier)
+        if hit is not None:
+            print("⚡ Answer cache hit:", hit["similarity"], "Total Time:", round(time.time() - start, 2))
+            await run_in_thread("session_io", reservation.commit, request.query, hit["response"])
+            return {
+                "response": hit["response"],
+                "context_used": hit["context_used"],
+                "model_used": hit["model_used"],
+                "cached": True
+            }
+
+        async with scheduler.slot(tier):
+            prepared = await prepare_query(request, registry, tier)
+            if prepared is None:
+                return {"error": "No relevant chunks found for this query."}
+            context, client, full_prompt = prepared
+
+            t2 = time.time()
+            try:
+                response = await client.query(full_prompt)
+                failed = False
+            except LLMError as e:
+                # Answered with the placeholder, as before, but never cached
+                response, failed = str(e), True
+            print("⏱️ LLM Time:", round(time.time() - t2, 2))
+        print("⚡ Total Time:", round(time.time() - start, 2))
         
-        reranker = Reranker(tier=tier)
-        if not chunks:
-            return {"error": "No relevant chunks found for this query."}
+        
+        await run_in_thread("session_io", reservation.commit, request.query, response)
 
-        t1 = time.time()
-        ranked_chunks = reranker.rerank(request.query, chunks[:5])
-        print("⏱️ Rerank Time:", round(time.time() - t1, 2))
+        answer = {
+            "response": response,
+            "context_used": context,
+            "model_used": client.model_name  # ✅ shows user which LLM generated the answer
+        }
+        if answers is not None and not failed:
+            answer_cache.put(answers, query_vec, request.mode, answer)
 
-        builder = ContextBuilder(tier=tier)
-        context = builder.build(ranked_chunks)
+        return {**answer, "cached": False}
 
-        client = LLMClient.from_tier(tier, mode)
 
+    except Overloaded as e:
+        return overloaded_response(e)
+    except (ModelNotReady, ServiceUnavailable) as e:
+        return unavailable_response(e)
+    except Exception as e:
+        tb = traceback.format_exc()
+        print(" Exception Traceback:\n", tb)
+        return JSONResponse(content={"error": str(e), "trace": tb}, status_code=500)
+    finally:
+        # No-op once committed; frees the claim when no answer was stored
+        reservation.release()
 
-        if request.mode == "code":
-            full_prompt = f"""You are a helpful AI coding assistant.
 
-            You will be given source code and a user request. Based on the request, you may:
-            - Modify the code
-            - Add new functionality
-            - Explain parts of the code
-            - Fix bugs or improve performance
+def sse_event(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
 
-            Code Context:
-            {context}
 
-            User Request:
-            {request.query}
+def release_once(release, *args):
+    """
+    `release(*args)` as an idempotent callable.
+    """
+    released = False
 
-            Respond with either a modified version of the code or a helpful explanation.
-            If you update the code, include the full version of the updated code.
-            """
-        else:
-            SYSTEM_PROMPT = """You are a highly intelligent and helpful AI assistant. 
-            You will be given context from a user-uploaded document or notes, along with a user query.
-            Session Metadata:
-            - Tier: {request.tier.capitalize()}
-            - Mode: {request.mode.capitalize()}
-            Your job is to:
-            - Answer clearly, accurately, and in a user-friendly way
-            - Use bullet points, headings, or paragraphs depending on the question
-            - Expand and explain if context is short or vague
-            - Only use the given context — do NOT make up facts
-            - If the context is not sufficient, respond: "Based on the provided context, I cannot answer confidently."
-            
-            If mode = 'notes' → Expect imperfect OCR and try to infer meaning  
-            If mode = 'code'  → Use technical reasoning and full examples where possible
-            """
+    def run():
+        nonlocal released
+        if not released:
+            released = True
+            release(*args)
+    return run
 
-            full_prompt = f"{SYSTEM_PROMPT}\n\nContext:\n{context}\n\nUser Question:\n{request.query}\n\nAnswer:"
 
+class SlotStreamingResponse(StreamingResponse):
+    """
+    Calls `on_close` once the response is over, however it ended: a stream
+    cancelled before its generator started never reaches its `finally`.
+    """
 
-        t2 = time.time()
-        response = await client.query(full_prompt)
-        print("⏱️ LLM Time:", round(time.time() - t2, 2))
-        print("⚡ Total Time:", round(time.time() - start, 2))
-        
-        
-        save_interaction(request.session_id, request.query, response)
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
 
-        return {
-            "response": response,
-            "context_used": context,
-            "model_used": client.model_name  # ✅ shows user which LLM generated the answer
-        }
 
+async def cached_stream(request: QueryRequest, hit: dict, reservation):
+    # Same event sequence as a live answer, with the whole answer as one token
+    yield sse_event({"context_used": hit["context_used"], "model_used": hit["model_used"], "cached": True}, event="meta")
+    yield sse_event({"token": hit["response"]})
+    await run_in_thread("session_io", reservation.commit, request.query, hit["response"])
+    yield sse_event({"model_used": hit["model_used"]}, event="done")
 
+
+@router.post("/query/stream")
+async def handle_query_stream(
+    request: QueryRequest,
+    registry: ServiceRegistry = Depends(get_registry),
+    tier: str = Depends(admit_tier),
+):
+    """
+    Same pipeline as /query, but the answer is sent as Server-Sent Events
+    token by token instead of after the full completion.
+    """
+    start = time.time()
+
+    try:
+        reservation = await run_in_thread("session_io", reserve_exchange, request.session_id, tier)
+    except ExchangeLimitReached:
+        return exchange_limit_response(tier)
+    streaming = False
+
+    try:
+        require_query_models(request, tier)
+        answers, query_vec, hit = await lookup_answer(request, tier)
+        if hit is not None:
+            print("⚡ Answer cache hit:", hit["similarity"], "Total Time:", round(time.time() - start, 2))
+            streaming = True
+            return SlotStreamingResponse(
+                cached_stream(request, hit, reservation), on_close=reservation.release, media_type="text/event-stream"
+            )
+
+        # One slot for the whole request: taken here so shedding is a 429 before
+        # any 200 is sent, and held until the stream has finished
+        await scheduler.acquire(tier)
+        release_slot = release_once(scheduler.release, tier)
+        try:
+            prepared = await prepare_query(request, registry, tier)
+        except BaseException:
+            release_slot()
+            raise
+        if prepared is None:
+            release_slot()
+            return {"error": "No relevant chunks found for this query."}
+        context, client, full_prompt = prepared
+        streaming = True
+    except Overloaded as e:
+        return overloaded_response(e)
+    except (ModelNotReady, ServiceUnavailable) as e:
+        return unavailable_response(e)
     except Exception as e:
         tb = traceback.format_exc()
         print(" Exception Traceback:\n", tb)
         return JSONResponse(content={"error": str(e), "trace": tb}, status_code=500)
+    finally:
+        # Once streaming, the response's on_close frees the claim instead
+        if not streaming:
+            reservation.release()
+
+    async def event_stream():
+        t2 = time.time()
+        first_token_at = None
+        parts = []
+        failed = False
+
+        try:
+            yield sse_event({"context_used": context, "model_used": client.model_name, "cached": False}, event="meta")
+            try:
+                async for token in client.query_stream(full_prompt):
+                    if first_token_at is None:
+                        first_token_at = time.time()
+                        print("⏱️ LLM First Token:", round(first_token_at - t2, 2))
+                    parts.append(token)
+                    yield sse_event({"token": token})
+            except LLMError as e:
+                # The placeholder ends the stream; tokens already sent stay
+                failed = True
+                parts.append(str(e))
+                yield sse_event({"token": str(e)})
+        finally:
+            release_slot()
+
+        response = "".join(parts)
+        print("⏱️ LLM Time:", round(time.time() - t2, 2))
+        print("⚡ Total Time:", round(time.time() - start, 2))
+
+        await run_in_thread("session_io", reservation.commit, request.query, response)
+        if answers is not None and not failed:
+            answer_cache.put(answers, query_vec, request.mode, {
+                "response": response,
+                "context_used": context,
+                "model_used": client.model_name
+            })
+        yield sse_event({"model_used": client.model_name}, event="done")
+
+    def on_close():
+        release_slot()
+        reservation.release()
+
+    return SlotStreamingResponse(event_stream(), on_close=on_close, media_type="text/event-stream")
 
 
 
@@ -242,21 +446,25 @@ async def generate_notes_route(
     mode: str = Form(...),
     prompt_type: Literal["full", "response_only", "custom"] = Form(...),
     custom_prompt: Optional[str] = Form(None),
-    as_pdf: bool = Form(False)
+    as_pdf: bool = Form(False),
+    tier: str = Depends(admit_tier),
 ):
-    tier = os.getenv("ASKLYNE_TIERS", "free").lower()
     mode = "text" if mode == "notes" else mode
 
-    notes = await build_notes(
-        session_id=session_id,
-        tier=tier,
-        mode=mode,
-        prompt_type=prompt_type,
-        custom_prompt=custom_prompt or ""
-    )
+    try:
+        async with scheduler.slot(tier):
+            notes = await build_notes(
+                session_id=session_id,
+                tier=tier,
+                mode=mode,
+                prompt_type=prompt_type,
+                custom_prompt=custom_prompt or ""
+            )
+    except Overloaded as e:
+        return overloaded_response(e)
 
     if as_pdf:
-        pdf_path = save_notes_as_pdf(notes, session_id)
+        pdf_path = await pdf_renderer.render(notes)
         return FileResponse(
             path=pdf_path,
             media_type="application/pdf",
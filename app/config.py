@@ -10,6 +10,11 @@ class Config:
     # API Keys
     TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
 
+    # LLM endpoint + shared connection pool
+    LLM_API_URL = os.getenv("LLM_API_URL", "https://api.together.xyz/inference")
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30))
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 20))
+
     # Token limits per tier
     TOKEN_LIMITS = {
         "free": int(os.getenv("FREE_TOKEN_LIMIT", 2048)),
@@ -17,6 +22,43 @@ class Config:
         "pro": int(os.getenv("PRO_TOKEN_LIMIT", 8192)),
     }
 
+    # One process serves every tier in ASKLYNE_TIERS. A request's tier comes
+    # from TIER_HEADER (DEFAULT_TIER when absent); the header is trusted, so it
+    # must be set by the gateway that authenticates users, not by clients.
+    ASKLYNE_TIERS = [t.strip().lower() for t in os.getenv("ASKLYNE_TIERS", "free,plus,pro").split(",") if t.strip()]
+    TIER_HEADER = os.getenv("TIER_HEADER", "X-Asklyne-Tier")
+    DEFAULT_TIER = os.getenv("DEFAULT_TIER", "free").lower()
+
+    # Query/notes requests share REQUEST_CONCURRENCY slots; a tier never holds
+    # more than its quota. Waiting work (request slots, ingestion jobs, embedding
+    # and rerank batches) is served weighted-fair by TIER_WEIGHTS.
+    REQUEST_CONCURRENCY = int(os.getenv("REQUEST_CONCURRENCY", 16))
+    TIER_CONCURRENCY = {
+        "free": int(os.getenv("FREE_CONCURRENCY", 6)),
+        "plus": int(os.getenv("PLUS_CONCURRENCY", 10)),
+        "pro": int(os.getenv("PRO_CONCURRENCY", 16)),
+    }
+    TIER_WEIGHTS = {
+        "free": float(os.getenv("FREE_WEIGHT", 1)),
+        "plus": float(os.getenv("PLUS_WEIGHT", 2)),
+        "pro": float(os.getenv("PRO_WEIGHT", 4)),
+    }
+
+    # Admission control: requests beyond a tier's token bucket, or arriving when
+    # that tier already has TIER_QUEUE_LIMITS requests (or ingestion jobs)
+    # waiting, get an immediate 429; queued requests give up after QUEUE_TIMEOUT
+    TIER_RATE_LIMITS = {  # (requests per minute, burst)
+        "free": (float(os.getenv("FREE_RATE_PER_MIN", 120)), int(os.getenv("FREE_RATE_BURST", 20))),
+        "plus": (float(os.getenv("PLUS_RATE_PER_MIN", 300)), int(os.getenv("PLUS_RATE_BURST", 40))),
+        "pro": (float(os.getenv("PRO_RATE_PER_MIN", 600)), int(os.getenv("PRO_RATE_BURST", 80))),
+    }
+    TIER_QUEUE_LIMITS = {
+        "free": int(os.getenv("FREE_QUEUE_LIMIT", 16)),
+        "plus": int(os.getenv("PLUS_QUEUE_LIMIT", 32)),
+        "pro": int(os.getenv("PRO_QUEUE_LIMIT", 64)),
+    }
+    QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", 15))
+
     # Exchange count caps
     EXCHANGE_LIMITS = {
         "free": int(os.getenv("FREE_MAX_EXCHANGES", 30)),
@@ -34,7 +76,178 @@ class Config:
     QDRANT_HOST = os.getenv("QDRANT_HOST")
     QDRANT_PORT = int(os.getenv("QDRANT_PORT", 6333))
     QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+    QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", 10))
     
+    # Keyword search backend: "typesense" or "bm25" (embedded in-process index)
+    KEYWORD_BACKEND = os.getenv("KEYWORD_BACKEND", "typesense").lower()
+
     # Typesense Config
     TYPESENSE_HOST = os.getenv("TYPESENSE_HOST")
+    TYPESENSE_PORT = int(os.getenv("TYPESENSE_PORT", 443))
+    TYPESENSE_PROTOCOL = os.getenv("TYPESENSE_PROTOCOL", "https")
+    TYPESENSE_TIMEOUT = float(os.getenv("TYPESENSE_TIMEOUT", 2))
     TYPESENSE_API_KEY = os.getenv("TYPESENSE_API_KEY")
+
+    # Embedded BM25 index: snapshots per session under BM25_DIR (empty = memory only)
+    BM25_DIR = os.getenv("BM25_DIR", "cache/bm25")
+    BM25_MAX_SESSIONS = int(os.getenv("BM25_MAX_SESSIONS", 1024))
+    BM25_K1 = float(os.getenv("BM25_K1", 1.2))
+    BM25_B = float(os.getenv("BM25_B", 0.75))
+
+    # Hybrid retrieval: each backend over-fetches top_k * factor, then results
+    # are fused by chunk id ("rrf" = reciprocal rank, "weighted" = min-max scores)
+    RETRIEVAL_FUSION = os.getenv("RETRIEVAL_FUSION", "rrf")
+    RRF_K = int(os.getenv("RRF_K", 60))
+    SEMANTIC_OVERFETCH = float(os.getenv("SEMANTIC_OVERFETCH", 3))
+    KEYWORD_OVERFETCH = float(os.getenv("KEYWORD_OVERFETCH", 3))
+    SEMANTIC_WEIGHT = float(os.getenv("SEMANTIC_WEIGHT", 1.0))
+    KEYWORD_WEIGHT = float(os.getenv("KEYWORD_WEIGHT", 1.0))
+
+    # Model loading: "eager" warms every tier's models up in parallel at startup
+    # (in the background), "lazy" loads each on first use. MODEL_SAFETENSORS
+    # prefers memory-mapped .safetensors weights, so containers sharing the
+    # model cache share the pages.
+    MODEL_LOAD_POLICY = os.getenv("MODEL_LOAD_POLICY", "eager").lower()
+    MODEL_WARMUP_WORKERS = int(os.getenv("MODEL_WARMUP_WORKERS", 4))
+    MODEL_SAFETENSORS = os.getenv("MODEL_SAFETENSORS", "true").lower() == "true"
+
+    # Embedding backend per tier: "torch", "torch-int8", "onnx" or "onnx-int8"
+    # (ONNX needs sentence-transformers[onnx]); EMBED_BACKEND is the default
+    EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").lower()
+    EMBED_BACKENDS = {
+        "free": os.getenv("EMBED_BACKEND_FREE", EMBED_BACKEND).lower(),
+        "plus": os.getenv("EMBED_BACKEND_PLUS", EMBED_BACKEND).lower(),
+        "pro": os.getenv("EMBED_BACKEND_PRO", EMBED_BACKEND).lower(),
+    }
+    # Quantization target for onnx-int8: "arm64", "avx2", "avx512" or "avx512_vnni"
+    ONNX_QUANT_CONFIG = os.getenv("ONNX_QUANT_CONFIG", "avx2")
+    ONNX_EXPORT_DIR = os.getenv("ONNX_EXPORT_DIR", "cache/onnx")
+    # Threads per model forward pass (torch and ONNX Runtime); 0 = library default
+    INTRA_OP_THREADS = int(os.getenv("INTRA_OP_THREADS", 0))
+
+    # Embedding micro-batching
+    EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", 64))
+    EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", 5))
+
+    # Query embedding cache (QUERY_CACHE_DIR enables the on-disk tier)
+    QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 4096))
+    QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", 3600))
+    QUERY_CACHE_DIR = os.getenv("QUERY_CACHE_DIR") or None
+
+    # Persistent chunk embedding cache (empty disables it)
+    CHUNK_CACHE_PATH = os.getenv("CHUNK_CACHE_PATH", "cache/chunk_embeddings.sqlite3")
+
+    # Cross-encoder reranking: backend "torch", "int8" (dynamically quantized,
+    # CPU) or "onnx" (needs optimum[onnxruntime]). Tiers in RERANK_TIERS rerank
+    # RERANK_CANDIDATES retrieved chunks and keep the best RERANK_TOP_K.
+    RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "torch").lower()
+    RERANK_TIERS = [t.strip().lower() for t in os.getenv("RERANK_TIERS", "plus,pro").split(",") if t.strip()]
+    RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 40))
+    RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", 5))
+    RERANK_MAX_BATCH_SIZE = int(os.getenv("RERANK_MAX_BATCH_SIZE", 64))
+    RERANK_MAX_WAIT_MS = float(os.getenv("RERANK_MAX_WAIT_MS", 5))
+    RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", 16384))
+    RERANK_CACHE_TTL = float(os.getenv("RERANK_CACHE_TTL", 3600))
+
+    # In-process per-session vector index in front of Qdrant (0 sessions disables it);
+    # sessions with more chunks than the cap always go to Qdrant
+    SESSION_INDEX_MAX_SESSIONS = int(os.getenv("SESSION_INDEX_MAX_SESSIONS", 256))
+    SESSION_INDEX_MAX_CHUNKS = int(os.getenv("SESSION_INDEX_MAX_CHUNKS", 20000))
+    SESSION_INDEX_TTL = float(os.getenv("SESSION_INDEX_TTL", 3600))
+
+    # Semantic answer cache (0 sessions disables it): a query whose embedding is
+    # within ANSWER_CACHE_THRESHOLD cosine of an earlier one in the same
+    # session/mode/tier reuses its answer until the session gets new uploads
+    ANSWER_CACHE_SESSIONS = int(os.getenv("ANSWER_CACHE_SESSIONS", 1024))
+    ANSWER_CACHE_PER_SESSION = int(os.getenv("ANSWER_CACHE_PER_SESSION", 32))
+    ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 1800))
+    ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+
+    # Note generation: sessions longer than one window of exchanges are summarised
+    # window by window (summaries cached by content hash) and the summaries merged,
+    # NOTES_REDUCE_FANIN at a time
+    NOTES_WINDOW_EXCHANGES = int(os.getenv("NOTES_WINDOW_EXCHANGES", 10))
+    NOTES_MAP_CONCURRENCY = int(os.getenv("NOTES_MAP_CONCURRENCY", 4))
+    NOTES_REDUCE_FANIN = int(os.getenv("NOTES_REDUCE_FANIN", 8))
+    NOTES_CACHE_SIZE = int(os.getenv("NOTES_CACHE_SIZE", 4096))
+    NOTES_CACHE_TTL = float(os.getenv("NOTES_CACHE_TTL", 86400))
+
+    # Rendered note PDFs, content-addressed by a hash of the markdown; the
+    # least recently downloaded are pruned beyond PDF_CACHE_MAX_FILES
+    PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "cache/pdf")
+    PDF_CACHE_MAX_FILES = int(os.getenv("PDF_CACHE_MAX_FILES", 2000))
+
+    # Background ingestion jobs
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 100))
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 64))
+    INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", 1000))
+    INGEST_JOB_TTL = float(os.getenv("INGEST_JOB_TTL", 86400))
+    # Chunk size and overlap in embedding-model tokens (capped by the model's max length)
+    CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 480))
+    CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 80))
+
+    # OCR (TESSERACT_CMD only needs setting when tesseract isn't on PATH)
+    TESSERACT_CMD = os.getenv(
+        "TESSERACT_CMD",
+        r"C:\Program Files\Tesseract-OCR\tesseract.exe" if os.name == "nt" else ""
+    ) or None
+
+    # Execution layer: thread pool for blocking I/O, process pool for
+    # GIL-heavy parsing/OCR (0 = use all available cores)
+    IO_THREADS = int(os.getenv("IO_THREADS", 32))
+    PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", 0))
+    PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 8))
+
+    # Max concurrent calls per stage
+    DEFAULT_STAGE_LIMIT = int(os.getenv("DEFAULT_STAGE_LIMIT", 8))
+    STAGE_LIMITS = {
+        "extract": int(os.getenv("STAGE_LIMIT_EXTRACT", 2)),
+        "upsert": int(os.getenv("STAGE_LIMIT_UPSERT", 8)),
+        "search": int(os.getenv("STAGE_LIMIT_SEARCH", 32)),
+        "embed_cache": int(os.getenv("STAGE_LIMIT_EMBED_CACHE", 8)),
+        "session_io": int(os.getenv("STAGE_LIMIT_SESSION_IO", 16)),
+        "pdf_render": int(os.getenv("STAGE_LIMIT_PDF_RENDER", 2)),
+        # Models loaded on first use from a request or ingestion job
+        "model_load": int(os.getenv("STAGE_LIMIT_MODEL_LOAD", 2)),
+    }
+
+    # Bulk writes to Qdrant and the keyword backend
+    QDRANT_BATCH_SIZE = int(os.getenv("QDRANT_BATCH_SIZE", 128))
+    KEYWORD_BATCH_SIZE = int(os.getenv("KEYWORD_BATCH_SIZE", 250))
+    WRITE_RETRIES = int(os.getenv("WRITE_RETRIES", 3))
+    WRITE_RETRY_BACKOFF = float(os.getenv("WRITE_RETRY_BACKOFF", 0.5))
+
+    # Interaction log storage: "jsonl" (one append-only file per session) or "sqlite"
+    SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "jsonl").lower()
+    SESSIONS_DIR = os.getenv("SESSIONS_DIR", "sessions")
+    SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions/interactions.sqlite3")
+
+    # Token counting: LLM budgets use tiktoken, chunk sizes use the embedding model's tokenizer
+    LLM_TOKENIZER = os.getenv("LLM_TOKENIZER", "cl100k_base")
+    TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", 8192))
+    # cl100k only approximates the tier models (Llama/DeepSeek, Mixtral, Qwen), which can
+    # need ~10% more tokens for the same text, so budgets keep a 10% margin
+    CONTEXT_SAFETY_MARGIN = float(os.getenv("CONTEXT_SAFETY_MARGIN", 0.9))
+
+
+# Per-tier settings indexed directly by tier, so every tier in ASKLYNE_TIERS needs an entry
+REQUIRED_TIER_SETTINGS = ("TOKEN_LIMITS", "TIER_CONCURRENCY", "TIER_WEIGHTS", "TIER_QUEUE_LIMITS")
+
+
+def validate_tiers(tiers: list[str]):
+    """
+    Raises ValueError at startup when a served tier lacks a required
+    setting, instead of a KeyError (500) on its first request.
+    """
+    problems = [
+        f"{name} has no entry for '{tier}'"
+        for name in REQUIRED_TIER_SETTINGS
+        for tier in tiers
+        if tier not in getattr(Config, name)
+    ]
+    if Config.DEFAULT_TIER not in tiers:
+        problems.append(f"DEFAULT_TIER '{Config.DEFAULT_TIER}' is not in ASKLYNE_TIERS")
+    if problems:
+        raise ValueError("Invalid tier configuration: " + "; ".join(problems))
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from app.config import Config
+from app.core import metrics
+
+
+class TokenBucket:
+    """
+    Refills `rate` tokens per second up to `burst`; each admitted request
+    takes one.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        """
+        0 when a token was taken, otherwise seconds until one is available.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate if self.rate > 0 else 60.0
+
+
+class RateLimiter:
+    """
+    Per-tier token buckets from Config.TIER_RATE_LIMITS (per minute, burst).
+    """
+
+    def __init__(self, limits: dict[str, tuple[float, int]]):
+        self.buckets = {tier: TokenBucket(per_min / 60, burst) for tier, (per_min, burst) in limits.items()}
+        self.allowed = {tier: 0 for tier in limits}
+        self.rejected = {tier: 0 for tier in limits}
+
+    def admit(self, tier: str) -> float:
+        """
+        0 if the request may proceed, otherwise the Retry-After in seconds.
+        """
+        bucket = self.buckets.get(tier)
+        if bucket is None:
+            return 0.0
+        retry_after = bucket.take()
+        if retry_after:
+            self.rejected[tier] += 1
+        else:
+            self.allowed[tier] += 1
+        return retry_after
+
+    def stats(self) -> dict:
+        return {
+            tier: {
+                "tokens": round(bucket.tokens, 2),
+                "allowed": self.allowed[tier],
+                "rejected": self.rejected[tier],
+            }
+            for tier, bucket in self.buckets.items()
+        }
+
+
+rate_limiter = RateLimiter(Config.TIER_RATE_LIMITS)
+metrics.register("rate_limits", rate_limiter.stats)
+
+
+def upload_limit_bytes(tier: str) -> int:
+    return Config.FILE_SIZE_MB_LIMITS.get(tier, max(Config.FILE_SIZE_MB_LIMITS.values())) * 1024 * 1024
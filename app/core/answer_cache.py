@@ -0,0 +1,140 @@
+import threading
+import time
+import numpy as np
+
+from app.config import Config
+from app.core import metrics
+from app.core.lru_cache import TTLCache
+
+
+class SessionAnswers:
+    """
+    Answers already given in one (tier, mode, session), each stored with
+    its L2-normalised query vector. Holds at most `max_entries`, dropping
+    the least recently used. Once `stale` is set (new chunks were
+    uploaded) nothing more is stored here.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.stale = False
+        self._entries: list[dict] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, query_vec: np.ndarray, query_mode: str, threshold: float, ttl: float) -> dict | None:
+        now = time.monotonic()
+        with self._lock:
+            if self.stale:
+                return None
+            self._entries = [e for e in self._entries if e["stored_at"] + ttl >= now]
+            best, best_score = None, threshold
+            for entry in self._entries:
+                if entry["query_mode"] != query_mode:
+                    continue
+                score = float(entry["vec"] @ query_vec)
+                if score >= best_score:
+                    best, best_score = entry, score
+            if best is None:
+                return None
+            self._entries.remove(best)
+            self._entries.append(best)
+            return {**best["answer"], "similarity": round(best_score, 4)}
+
+    def put(self, query_vec: np.ndarray, query_mode: str, answer: dict) -> bool:
+        with self._lock:
+            if self.stale:
+                return False
+            self._entries.append({
+                "vec": query_vec,
+                "query_mode": query_mode,
+                "answer": answer,
+                "stored_at": time.monotonic()
+            })
+            del self._entries[:-self.max_entries]
+            return True
+
+
+class AnswerCache:
+    """
+    Semantic response cache keyed by (tier, mode, session_id). A lookup hits
+    when an earlier query in the same session (and same request mode) is
+    within `threshold` cosine similarity. `invalidate` drops the session's
+    answers when its chunk set changes; answers still being generated
+    against the old chunks are discarded rather than stored.
+    """
+
+    def __init__(self, max_sessions: int, per_session: int, ttl_seconds: float, threshold: float):
+        self.sessions = TTLCache(max_entries=max_sessions, ttl_seconds=ttl_seconds)
+        self.per_session = per_session
+        self.ttl = ttl_seconds
+        self.threshold = threshold
+        self._guard = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.stale_skips = 0
+        self.invalidations = 0
+
+    def session(self, key: tuple) -> SessionAnswers:
+        with self._guard:
+            answers = self.sessions.get(key)
+            if answers is None:
+                answers = SessionAnswers(self.per_session)
+                self.sessions.put(key, answers)
+            return answers
+
+    @staticmethod
+    def normalize(query_vec) -> np.ndarray:
+        vec = np.asarray(query_vec, dtype=np.float32)
+        return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+    def lookup(self, answers: SessionAnswers, query_vec: np.ndarray, query_mode: str) -> dict | None:
+        hit = answers.lookup(query_vec, query_mode, self.threshold, self.ttl)
+        if hit is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return hit
+
+    def put(self, answers: SessionAnswers, query_vec: np.ndarray, query_mode: str, answer: dict):
+        if answers.put(query_vec, query_mode, answer):
+            self.stores += 1
+        else:
+            self.stale_skips += 1
+
+    def invalidate(self, key: tuple):
+        with self._guard:
+            answers = self.sessions.pop(key)
+        if answers is not None:
+            answers.stale = True
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self.sessions),
+            "entries": sum(len(a) for a in self.sessions.values()),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "stale_skips": self.stale_skips,
+            "invalidations": self.invalidations,
+            "session_evictions": self.sessions.evictions,
+        }
+
+
+answer_cache = AnswerCache(
+    max_sessions=Config.ANSWER_CACHE_SESSIONS,
+    per_session=Config.ANSWER_CACHE_PER_SESSION,
+    ttl_seconds=Config.ANSWER_CACHE_TTL,
+    threshold=Config.ANSWER_CACHE_THRESHOLD
+) if Config.ANSWER_CACHE_SESSIONS > 0 else None
+
+if answer_cache is not None:
+    metrics.register("answer_cache", answer_cache.stats)
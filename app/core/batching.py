@@ -0,0 +1,124 @@
+import asyncio
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Any
+
+from app.config import Config
+from app.core import metrics
+from app.core.scheduler import FairClock
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+WAIT_MS_BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250]
+
+
+class MicroBatcher:
+    """
+    Collects small requests from many callers into one batch call.
+
+    A dedicated worker thread drains the queue: it waits for the first
+    request, then keeps collecting until `max_batch_size` items or
+    `max_wait_ms` have passed, calls `process_batch` once on the flattened
+    items and hands each caller its slice back through a future.
+    Requests tagged with a tier are taken weighted-fair by item count, so
+    a backlog of one tier's ingestion batches can't hold up another's queries.
+    """
+
+    def __init__(self, name: str, process_batch: Callable[[list], Any], max_batch_size: int = 64, max_wait_ms: float = 5):
+        self.name = name
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._clock = FairClock(Config.TIER_WEIGHTS)
+        self._seq = itertools.count()
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+        self.batch_sizes = metrics.Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = metrics.Histogram(WAIT_MS_BUCKETS)
+        self.batches = 0
+        metrics.register(f"batcher.{name}", self.stats)
+
+    def submit_sync(self, items: list, tier: str = None) -> Future:
+        future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        tag = self._clock.tag(tier or "default", len(items))
+        self._queue.put((tag, next(self._seq), (items, future, time.perf_counter())))
+        return future
+
+    async def submit(self, items: list, tier: str = None) -> list:
+        return await asyncio.wrap_future(self.submit_sync(items, tier))
+
+    def _get(self, timeout: float = None):
+        tag, _, request = self._queue.get(timeout=timeout)
+        self._clock.advance(tag)
+        return request
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth(),
+            "batches": self.batches,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+        }
+
+    def _collect(self) -> list:
+        batch = [self._get()]
+        size = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                request = self._get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                self._run_batch(self._collect())
+            except Exception as e:
+                # Never let the worker die: every later submit would hang
+                print(f"⚠️ Batcher {self.name} error: {e}")
+
+    def _run_batch(self, batch: list):
+        # Drop requests whose callers gave up (cancelled futures); the rest
+        # move to running so a late cancel can't make set_result raise
+        batch = [request for request in batch if request[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        now = time.perf_counter()
+        flat = []
+        for items, _, enqueued in batch:
+            flat.extend(items)
+            self.queue_wait_ms.observe((now - enqueued) * 1000)
+
+        try:
+            results = self.process_batch(flat)
+            if len(results) != len(flat):
+                raise ValueError(f"process_batch returned {len(results)} results for {len(flat)} items")
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.batch_sizes.observe(len(flat))
+        offset = 0
+        for items, future, _ in batch:
+            future.set_result(results[offset:offset + len(items)])
+            offset += len(items)
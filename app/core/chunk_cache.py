@@ -0,0 +1,90 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import numpy as np
+
+from app.config import Config
+from app.core import metrics
+
+# SQLite caps bound parameters per statement; stay well below it
+_LOOKUP_BATCH = 500
+
+
+class ChunkEmbeddingCache:
+    """
+    Persistent, content-addressed store of chunk embeddings.
+    Key = SHA-256(model name + chunk text), value = raw float32 blob,
+    so re-uploading the same document only embeds chunks never seen before.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vec BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        self.hits += sum(1 for k in keys if k in found)
+        self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, items: dict[str, np.ndarray]):
+        rows = []
+        for key, vec in items.items():
+            vec = np.asarray(vec, dtype=np.float32)
+            rows.append((key, vec.shape[-1], vec.tobytes()))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, dim, vec) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_chunk_cache: ChunkEmbeddingCache | None = None
+_chunk_cache_lock = threading.Lock()
+
+
+def get_chunk_cache() -> ChunkEmbeddingCache | None:
+    """
+    The process-wide chunk cache, or None when CHUNK_CACHE_PATH is empty.
+    Opened on first use so importing the app touches no files.
+    """
+    global _chunk_cache
+    if _chunk_cache is None and Config.CHUNK_CACHE_PATH:
+        with _chunk_cache_lock:
+            if _chunk_cache is None:
+                _chunk_cache = ChunkEmbeddingCache(Config.CHUNK_CACHE_PATH)
+                metrics.register("chunk_embedding_cache", _chunk_cache.stats)
+    return _chunk_cache
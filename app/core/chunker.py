@@ -1,108 +1,327 @@
-from typing import List
+from typing import List, Iterable, Iterator, Optional, Tuple
+from bisect import bisect_right
+from itertools import accumulate
+import ast
+import math
 import re
 
+from app.core.tokenizer import TokenCounter, heuristic_count
+
+PARAGRAPH_BREAK = re.compile(r'\n{2,}')
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+# IPython magics / shell escapes aren't Python; commented out before parsing
+NOTEBOOK_MAGIC = re.compile(r'^([ \t]*)(?=[%!])', re.MULTILINE)
+SYMBOL_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+# Placed between a carried overlap window and the next page
+PAGE_JOINER = "\n"
+
+Span = Tuple[int, int]
+
 class Chunker:
-    def __init__(self, file_type:str, max_tokens:int, overlap:int=50):
+    """
+    Chunks are computed as (start, end) character spans into the original
+    text: segments are found with one regex pass, tokenized once in a batch,
+    and packed with a prefix-sum array and two monotonic pointers, so the
+    whole pass is linear in the number of segments. Text is only sliced
+    out when a chunk is emitted.
+    """
+
+    def __init__(self, file_type:str, max_tokens:int, overlap:int=50, counter: TokenCounter = None):
         """
         :param file_type: 'text' or 'code'
         :param max_tokens: target token length per chunk (tier-based)
         :param overlap: number of tokens to overlap between chunks
+        :param counter: tokenizer of the embedding model; falls back to len/4 if omitted
         """
         self.file_type = file_type
+        self.counter = counter
+        # Leave room for the model's special tokens ([CLS]/[SEP] etc.)
+        if counter and counter.max_length:
+            max_tokens = min(max_tokens, counter.max_length - 2)
         self.max_tokens = max_tokens
         self.overlap = overlap
-        
+
     def chunk(self,content:str) -> List[str]:
         if self.file_type == "code" :
             return self.chunk_code(content)
         else:
             return self.chunk_text(content)
-        
+
     def chunk_text(self,text:str) -> List[str]:
         """
         Sentence-based chunking for plain text / PDF-extracted content.
         Groups sentences into token-controlled windows with overlap.
         """
-        sentences = re.split(r'\n{2,}', text.strip())  # split on double newlines
-        if len(sentences) <= 1:
-            sentences = re.split(r'(?<=[.!?])\s+', text.strip())  # fallback to sentence-based
-
-        sentence_tokens = [(s,self.estimate_tokens(s)) for s in sentences if s]
-        print(f"Split into {len(sentence_tokens)} sentences")
-        chunks = []
-        current_chunk = []
-        current_tokens = 0
-        i=0
-        while i< len(sentence_tokens):
-            sentence,est_tokens = sentence_tokens[i]
-            
-            if current_tokens + est_tokens > self.max_tokens:
-                if current_chunk:
-                    chunks.append(" ".join(current_chunk))
-                    
-                    #backtrack to create overlap winndow
-                    overlap_tokens = 0
-                    j = len(current_chunk) - 1
-                    while j>=0 and overlap_tokens<self.overlap : 
-                        overlap_tokens += self.estimate_tokens(current_chunk[j])
-                        j -= 1
-                    current_chunk = current_chunk[j + 1:]
-                    current_tokens = sum(self.estimate_tokens(s) for s in current_chunk)
-                else:
-                    chunks.append(sentence)
-                    i+=1
-                    continue
-            current_chunk.append(sentence)
-            current_tokens += est_tokens
-            i +=1
-        
-        if current_tokens:
-            chunks.append(" ".join(current_chunk))
-            
-        return chunks
-        
-    def chunk_code(self, code: str) -> List[str]:
+        return [text[start:end] for start, end, _ in self.span_text(text)]
+
+    def span_text(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        Same chunking as chunk_text() but returns (start, end, token_count)
+        offsets into `text` instead of copies.
         """
-        Split code into chunks based on function and class definitions,
-        while respecting max_tokens and overlap.
+        segments = self.split_spans(text)
+        segments, counts = self.fit_spans(text, segments, self.count_batch([text[a:b] for a, b in segments]))
+        packed, _ = self._pack(counts, final=True)
+        return [(segments[a][0], segments[b - 1][1], tokens) for a, b, tokens in packed]
+
+    def chunk_stream_counted(self, pages: Iterable[str]) -> Iterator[Tuple[str, int]]:
+        """
+        Streaming variant of chunk(): consumes page texts lazily and yields
+        (chunk, token_count) as soon as a chunk fills up, carrying the
+        overlap window across page boundaries. Only the current window is
+        held in memory. Each page is tokenized once in a single batch and
+        the counts travel with the chunk, so nothing downstream re-counts.
         """
-        # Split at class or def/function declarations
-        blocks = re.split(r'(?=^\s*(def|class)\s)', code, flags=re.MULTILINE)
-        
-        chunks = []
-        current_chunk = []
-        current_tokens = 0
+        if self.file_type == "code":
+            yield from self._chunk_code_counted("\n".join(pages))
+            return
 
-        for block in blocks:
-            block = block.strip()
-            if not block:
+        # Open (not yet emitted) window from the previous page
+        carry_text, carry_spans, carry_counts = "", [], []
+        for page in pages:
+            segments = self.split_spans(page)
+            if not segments:
                 continue
-            block_tokens = self.estimate_tokens(block)
+            segments, counts = self.fit_spans(page, segments, self.count_batch([page[a:b] for a, b in segments]))
+            carried = len(carry_spans)
+            if carried:
+                base = len(carry_text) + len(PAGE_JOINER)
+                text = carry_text + PAGE_JOINER + page
+                spans = carry_spans + [(a + base, b + base) for a, b in segments]
+                counts = carry_counts + counts
+            else:
+                text, spans = page, segments
+
+            packed, open_start = self._pack(counts, final=False, carried=carried)
+            for a, b, tokens in packed:
+                yield text[spans[a][0]:spans[b - 1][1]], tokens
 
-            if current_tokens + block_tokens > self.max_tokens:
-                if current_chunk:
-                    chunks.append("\n\n".join(current_chunk))
+            if open_start < len(spans):
+                offset = spans[open_start][0]
+                carry_text = text[offset:spans[-1][1]]
+                carry_spans = [(a - offset, b - offset) for a, b in spans[open_start:]]
+                carry_counts = counts[open_start:]
+            else:
+                carry_text, carry_spans, carry_counts = "", [], []
+
+        if sum(carry_counts):
+            yield carry_text, sum(carry_counts)
+
+    def split_spans(self, text: str) -> List[Span]:
+        """
+        Paragraph spans (split on blank lines), falling back to sentence
+        spans when the text has no paragraph breaks.
+        """
+        lo = len(text) - len(text.lstrip())
+        hi = len(text.rstrip())
+        spans = self._split_on(PARAGRAPH_BREAK, text, lo, hi)
+        if len(spans) <= 1:
+            spans = self._split_on(SENTENCE_BREAK, text, lo, hi)
+        return [(a, b) for a, b in spans if b > a]
+
+    def split_sentences(self, text: str) -> List[str]:
+        return [text[a:b] for a, b in self.split_spans(text)]
+
+    @staticmethod
+    def _split_on(pattern: re.Pattern, text: str, lo: int, hi: int) -> List[Span]:
+        spans = []
+        pos = lo
+        for match in pattern.finditer(text, lo, hi):
+            spans.append((pos, match.start()))
+            pos = match.end()
+        spans.append((pos, hi))
+        return spans
+
+    def fit_spans(self, text: str, spans: List[Span], counts: List[int]) -> Tuple[List[Span], List[int]]:
+        """
+        Splits segments over max_tokens into consecutive pieces that fit,
+        cut at whitespace where possible; returns (spans, counts).
+        """
+        if all(count <= self.max_tokens for count in counts):
+            return spans, counts
+        fitted = []
+        for span, count in zip(spans, counts):
+            fitted.extend(self._split_span(text, span, count))
+        return [span for span, _ in fitted], [count for _, count in fitted]
+
+    def _split_span(self, text: str, span: Span, tokens: int) -> List[Tuple[Span, int]]:
+        lo, hi = span
+        if tokens <= self.max_tokens or hi - lo <= 1:
+            return [(span, tokens)]
+        parts = math.ceil(tokens / self.max_tokens)
+        cuts = [lo]
+        for i in range(1, parts):
+            cut = lo + (hi - lo) * i // parts
+            # Back up to the last whitespace so words stay whole
+            space = max(text.rfind(" ", cuts[-1] + 1, cut), text.rfind("\n", cuts[-1] + 1, cut))
+            cut = space + 1 if space > cuts[-1] else cut
+            if cut > cuts[-1]:
+                cuts.append(cut)
+        cuts.append(hi)
+        pieces = list(zip(cuts, cuts[1:]))
+        counts = self.count_batch([text[a:b] for a, b in pieces])
+        # Token density varies along the text, so a piece can still be over budget
+        return [fitted for piece, count in zip(pieces, counts) for fitted in self._split_span(text, piece, count)]
+
+    def _pack(self, counts: List[int], final: bool = True, carried: int = 0) -> Tuple[List[Tuple[int, int, int]], int]:
+        """
+        Packs segments into windows of at most max_tokens with up to
+        `overlap` tokens carried back; returns ([(first, last_exclusive,
+        tokens)], start of the still-open window). The first `carried`
+        segments are an open window resumed from a previous call. Window
+        sums come from prefix sums and both window edges only move forward,
+        so this is O(n). Segments should already fit (see fit_spans); one
+        that doesn't becomes a chunk of its own.
+        """
+        prefix = list(accumulate(counts, initial=0))
+        packed = []
+        start = 0
+        for end in range(carried, len(counts)):
+            if prefix[end + 1] - prefix[start] <= self.max_tokens:
+                continue
+            if start < end:
+                packed.append((start, end, prefix[end] - prefix[start]))
+                # Overlap: keep the shortest tail of the window worth >= overlap tokens
+                while start < end and prefix[end] - prefix[start + 1] >= self.overlap:
+                    start += 1
+                # ...and drop from it what the next window has no room for
+                while start < end and prefix[end + 1] - prefix[start] > self.max_tokens:
+                    start += 1
+            if start == end and counts[end] > self.max_tokens:
+                packed.append((end, end + 1, counts[end]))
+                start = end + 1
 
-                    # overlap logic
-                    overlap_tokens = 0
-                    j = len(current_chunk) - 1
-                    while j >= 0 and overlap_tokens < self.overlap:
-                        overlap_tokens += self.estimate_tokens(current_chunk[j])
-                        j -= 1
-                    current_chunk = current_chunk[j + 1:]
-                    current_tokens = sum(self.estimate_tokens(b) for b in current_chunk)
-                else:
-                    chunks.append(block)
-                    continue
+        if final and prefix[-1] - prefix[start] > 0:
+            packed.append((start, len(counts), prefix[-1] - prefix[start]))
+        return packed, start
 
-            current_chunk.append(block)
-            current_tokens += block_tokens
+    def chunk_code(self, code: str) -> List[str]:
+        """
+        Split code into chunks aligned to top-level functions and classes
+        (see CodeChunker), while respecting max_tokens and overlap.
+        """
+        return [chunk for chunk, _ in self._chunk_code_counted(code)]
 
-        if current_chunk:
-            chunks.append("\n\n".join(current_chunk))
+    def _chunk_code_counted(self, code: str) -> List[Tuple[str, int]]:
+        code_chunker = CodeChunker(self.max_tokens, self.overlap, self.counter)
+        return [(chunk, tokens) for chunk, tokens, _ in code_chunker.chunk_source(code)]
 
-        return chunks
+    def count_batch(self, texts: List[str]) -> List[int]:
+        if self.counter:
+            return self.counter.count_batch(texts)
+        return [heuristic_count(t) for t in texts]
 
-    
     def estimate_tokens(self,text:str) -> int:
-        return max(1,len(text)//4)
\ No newline at end of file
+        if self.counter:
+            return self.counter.count(text)
+        return heuristic_count(text)
+
+
+class CodeChunker(Chunker):
+    """
+    Structural chunking for Python sources. Each unit (a .py file or one
+    notebook cell) is parsed once with `ast` and cut at top-level symbols,
+    decorators and leading comments included; consecutive module-level
+    statements form one chunk. A class over the token budget is split into
+    its header and methods, anything else over budget into line windows.
+    Chunks come with symbol metadata for the vector/keyword payloads.
+    """
+
+    def __init__(self, max_tokens: int, overlap: int = 50, counter: TokenCounter = None):
+        super().__init__("code", max_tokens, overlap, counter)
+
+    def chunk_cells(self, cells: Iterable[Tuple[Optional[int], str]]) -> Iterator[Tuple[str, int, dict]]:
+        """
+        Yields (chunk, token_count, metadata) for (cell_index, source) units;
+        cell_index is None for plain .py files.
+        """
+        for cell_index, source in cells:
+            for chunk, tokens, meta in self.chunk_source(source):
+                if cell_index is not None:
+                    meta["cell_index"] = cell_index
+                yield chunk, tokens, meta
+
+    def chunk_source(self, source: str) -> Iterator[Tuple[str, int, dict]]:
+        if not source.strip():
+            return
+        # starts[i] = offset of line i+1; the last entry is the end of the source
+        starts = [0] + [m.end() for m in re.finditer(r'\n', source)]
+        if starts[-1] != len(source):
+            starts.append(len(source))
+        last_line = len(starts) - 1
+
+        try:
+            tree = ast.parse(NOTEBOOK_MAGIC.sub('#', source))
+        except SyntaxError:
+            yield from self._chunk_lines(source, starts, 1, last_line, "<module>", "module")
+            return
+        units = self._units(source, starts, tree.body, 1, last_line, ("<module>", "module"))
+        yield from self._chunk_units(source, starts, units)
+
+    def _units(self, source: str, starts: List[int], body: List[ast.stmt], first_line: int, last_line: int, owner: Tuple[str, str]) -> List[list]:
+        """
+        [start_line, end_line, qualified name, kind, node] per symbol in
+        `body`, covering first_line..last_line without gaps or blank edges.
+        Non-symbol statements are attributed to `owner`.
+        """
+        prefix = "" if owner[1] == "module" else owner[0] + "."
+        units = []
+        for node in body:
+            if isinstance(node, SYMBOL_NODES):
+                kind = "class" if isinstance(node, ast.ClassDef) else "function"
+                units.append([node.lineno, node.end_lineno, prefix + node.name, kind, node])
+            elif units and units[-1][4] is None:
+                units[-1][1] = node.end_lineno
+            else:
+                units.append([node.lineno, node.end_lineno, owner[0], owner[1], None])
+
+        # Decorators, comments and blank lines before a symbol belong to it;
+        # the tail goes to the last one
+        for i, unit in enumerate(units):
+            unit[0] = first_line if i == 0 else units[i - 1][1] + 1
+        if units:
+            units[-1][1] = last_line
+
+        def blank(line: int) -> bool:
+            return not source[starts[line - 1]:starts[line]].strip()
+
+        trimmed = []
+        for unit in units:
+            while unit[0] < unit[1] and blank(unit[0]):
+                unit[0] += 1
+            while unit[1] > unit[0] and blank(unit[1]):
+                unit[1] -= 1
+            if not blank(unit[0]):
+                trimmed.append(unit)
+        return trimmed
+
+    def _chunk_units(self, source: str, starts: List[int], units: List[list]) -> Iterator[Tuple[str, int, dict]]:
+        texts = [source[starts[first - 1]:starts[last]].rstrip() for first, last, _, _, _ in units]
+        counts = self.count_batch(texts)
+        for (first, last, name, kind, node), text, tokens in zip(units, texts, counts):
+            if tokens <= self.max_tokens:
+                yield text, tokens, self._meta(name, kind, first, last)
+            elif isinstance(node, ast.ClassDef):
+                members = self._units(source, starts, node.body, first, last, (name, kind))
+                yield from self._chunk_units(source, starts, members)
+            else:
+                yield from self._chunk_lines(source, starts, first, last, name, kind)
+
+    def _chunk_lines(self, source: str, starts: List[int], first: int, last: int, name: str, kind: str) -> Iterator[Tuple[str, int, dict]]:
+        """
+        Fallback for oversized symbols and unparsable sources: line windows
+        packed like text segments, with overlap.
+        """
+        spans = [(starts[i], starts[i + 1]) for i in range(first - 1, last)]
+        # Lines longer than the budget (minified code, data literals) are split too
+        spans, counts = self.fit_spans(source, spans, self.count_batch([source[a:b] for a, b in spans]))
+        packed, _ = self._pack(counts)
+        for a, b, tokens in packed:
+            lo, hi = spans[a][0], spans[b - 1][1]
+            text = source[lo:hi].rstrip()
+            if text.strip():
+                yield text, tokens, self._meta(name, kind, bisect_right(starts, lo), bisect_right(starts, hi - 1))
+
+    @staticmethod
+    def _meta(name: str, kind: str, first: int, last: int) -> dict:
+        return {"symbol": name, "symbol_type": kind, "start_line": first, "end_line": last}
@@ -1,15 +1,26 @@
 from app.config import Config
+from app.core.tokenizer import TokenCounter, llm_token_counter
+
+SEPARATOR = "\n---\n"
+
 class ContextBuilder:
-    def __init__(self, tier: str):
+    def __init__(self, tier: str, counter: TokenCounter | None = None):
+        """
+        Pass `counter` (see llm_token_counter_async) when building on the
+        event loop, so the tokenizer is never loaded there.
+        """
         self.tier = tier.lower()
         self.token_limit = Config.TOKEN_LIMITS[self.tier]
-        self.safety_margin = 0.9  # Use 90% of token budget for context
+        # Counts come from one tiktoken encoding, not each model's own tokenizer; the margin covers the mismatch
+        self.safety_margin = Config.CONTEXT_SAFETY_MARGIN
+        self.counter = counter or llm_token_counter()
 
     def build(self, chunks: list[dict]) -> str:
         """
         Merges top chunks into a token-safe string for LLM input.
         """
         max_tokens = int(self.token_limit * self.safety_margin)
+        separator_tokens = self.counter.count(SEPARATOR)
         total_tokens = 0
         selected_chunks = []
 
@@ -18,16 +29,21 @@ class ContextBuilder:
 
         for chunk in chunks_sorted:
             text = chunk["text"].strip()
-            token_est = self.estimate_tokens(text)
+            token_est = self.estimate_tokens(text, chunk.get("llm_tokens"))
+            if selected_chunks:
+                token_est += separator_tokens
+            # Skip chunks that don't fit but keep packing smaller ones
             if total_tokens + token_est > max_tokens:
-                break
+                continue
             selected_chunks.append(text)
             total_tokens += token_est
 
-        return "\n---\n".join(selected_chunks)
+        return SEPARATOR.join(selected_chunks)
 
-    def estimate_tokens(self, text: str) -> int:
+    def estimate_tokens(self, text: str, known: int | None = None) -> int:
         """
-        Approximate token count (safe heuristic: 1 token = ~4 chars)
+        Token count for the LLM budget; uses the count stored at ingest when present.
         """
-        return max(1, len(text) // 4)
+        if known:
+            return int(known)
+        return self.counter.count(text)
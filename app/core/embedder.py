@@ -1,8 +1,17 @@
-from typing import List
-from sentence_transformers import SentenceTransformer
+from typing import List, Tuple
+import numpy as np
+from app.config import Config
+from app.core.model_backends import load_sentence_transformer
+from app.core.model_manager import model_manager
+from app.core.batching import MicroBatcher
+from app.core.executor import run_in_thread
+from app.core.embedding_cache import query_cache
+from app.core.chunk_cache import get_chunk_cache, ChunkEmbeddingCache
 
-_loaded_models = {}
+_engines = {}
 
+# Values are a model name, or (model name, backend) to pin a backend for that
+# tier/mode regardless of Config.EMBED_BACKENDS
 TIER_MODE_MODEL_MAP = {
     "free": {
         "text": "BAAI/bge-large-en-v1.5",
@@ -18,24 +27,136 @@ TIER_MODE_MODEL_MAP = {
     }
 }
 
+def resolve_model(tier: str, mode: str, backend: str = None) -> Tuple[str, str]:
+    """
+    (model name, backend) for a tier/mode; an explicit `backend` wins over
+    the map entry, which wins over the tier default.
+    """
+    entry = TIER_MODE_MODEL_MAP.get(tier, {}).get(mode)
+    if not entry:
+        raise ValueError(f"No model defined for tier '{tier}' and mode '{mode}'")
+    model_name, pinned = (entry, None) if isinstance(entry, str) else entry
+    return model_name, (backend or pinned or Config.EMBED_BACKENDS.get(tier, Config.EMBED_BACKEND)).lower()
+
+
 class Embedder:
-    def __init__(self, tier: str = "free", mode: str = "text"):
+    def __init__(self, tier: str = "free", mode: str = "text", backend: str = None):
         self.tier = tier.lower()
-        self.mode = mode.lower()
-        if self.mode == "notes":
-            self.mode = "text"
-
-        model_name = TIER_MODE_MODEL_MAP.get(self.tier, {}).get(self.mode)
-        if not model_name:
-            raise ValueError(f"No model defined for tier '{self.tier}' and mode '{self.mode}'")
-
-        if model_name in _loaded_models:
-            self.model = _loaded_models[model_name]
-        else:
-            print(f"[Embedder] Loading model for {self.tier}/{self.mode}: {model_name}")
-            model = SentenceTransformer(model_name)
-            _loaded_models[model_name] = model
-            self.model = model
+        self.mode = normalize_mode(mode)
+
+        model_name, backend = resolve_model(self.tier, self.mode, backend)
+        # Keyed by the requested backend so a fallback isn't retried on every call
+        self.model, backend = model_manager.get(*model_request(self.tier, self.mode, model_name, backend))
+
+        # model_name stays the Hugging Face name (tokenizer lookups);
+        # model_id also identifies the backend, since quantized vectors differ
+        self.model_name = model_name
+        self.backend = backend
+        self.model_id = model_id(model_name, backend)
+        self.engine = get_engine(self.model_id, self.model)
+
+    @classmethod
+    async def create(cls, tier: str = "free", mode: str = "text", backend: str = None) -> "Embedder":
+        """
+        Embedder(...) for the event loop: the model is loaded off the loop
+        if it isn't in memory yet.
+        """
+        tier, mode = tier.lower(), normalize_mode(mode)
+        await model_manager.get_async(*model_request(tier, mode, *resolve_model(tier, mode, backend)))
+        return cls(tier, mode, backend)
+
+    @classmethod
+    def ready(cls, tier: str = "free", mode: str = "text", backend: str = None) -> "Embedder":
+        """
+        Embedder(...) if its model is loaded, else ModelNotReady (and the
+        model starts loading in the background).
+        """
+        tier, mode = tier.lower(), normalize_mode(mode)
+        model_manager.require(*model_request(tier, mode, *resolve_model(tier, mode, backend)))
+        return cls(tier, mode, backend)
 
     def embed_chunks(self, chunks: List[str]) -> List[List[float]]:
-        return self.model.encode(chunks, convert_to_numpy=True).tolist()
+        found, misses = self._split_cached(chunks)
+        computed = self.engine.submit_sync(misses, self.tier).result() if misses else []
+        return self._merge_cached(chunks, found, misses, computed)
+
+    async def embed_chunks_async(self, chunks: List[str]) -> List[List[float]]:
+        """
+        Same as embed_chunks but awaits the batching engine instead of
+        blocking the event loop.
+        """
+        found, misses = await run_in_thread("embed_cache", self._split_cached, chunks)
+        computed = await self.engine.submit(misses, self.tier) if misses else []
+        return await run_in_thread("embed_cache", self._merge_cached, chunks, found, misses, computed)
+
+    def _split_cached(self, chunks: List[str]):
+        """
+        Looks chunks up in the persistent cache; returns (hits by key, unique misses).
+        """
+        chunk_cache = get_chunk_cache()
+        if chunk_cache is None:
+            return {}, chunks
+        keys = [ChunkEmbeddingCache.key(self.model_id, c) for c in chunks]
+        found = chunk_cache.get_many(keys)
+        misses = list(dict.fromkeys(c for c, k in zip(chunks, keys) if k not in found))
+        return found, misses
+
+    def _merge_cached(self, chunks: List[str], found: dict, misses: List[str], computed) -> List[List[float]]:
+        chunk_cache = get_chunk_cache()
+        if chunk_cache is None:
+            return [vec.tolist() for vec in computed]
+        new = {ChunkEmbeddingCache.key(self.model_id, c): vec for c, vec in zip(misses, computed)}
+        if new:
+            chunk_cache.put_many(new)
+            found.update(new)
+        return [found[ChunkEmbeddingCache.key(self.model_id, c)].tolist() for c in chunks]
+
+    async def embed_query_async(self, query: str) -> np.ndarray:
+        """
+        Embeds a single query through the query cache.
+        Returns a float32 vector; repeated questions skip the model entirely.
+        """
+        vec = await query_cache.get_async(self.model_id, query)
+        if vec is None:
+            vec = await query_cache.put_async(self.model_id, query, (await self.engine.submit([query], self.tier))[0])
+        return vec
+
+
+def normalize_mode(mode: str) -> str:
+    mode = mode.lower()
+    return "text" if mode == "notes" else mode
+
+
+def model_request(tier: str, mode: str, model_name: str, backend: str):
+    """
+    (model manager key, loader) for a resolved model.
+    """
+    def load():
+        print(f"[Embedder] Loading model for {tier}/{mode}: {model_name} ({backend})")
+        return load_sentence_transformer(model_name, backend)
+
+    return ("embedder", model_id(model_name, backend)), load
+
+
+def model_id(model_name: str, backend: str) -> str:
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def get_engine(model_name: str, model) -> MicroBatcher:
+    """
+    One micro-batching worker per loaded model, shared by all Embedders.
+    """
+    engine = _engines.get(model_name)
+    if engine is None:
+        engine = MicroBatcher(
+            name=f"embed:{model_name}",
+            process_batch=lambda texts: model.encode(
+                texts,
+                convert_to_numpy=True,
+                batch_size=Config.EMBED_MAX_BATCH_SIZE
+            ),
+            max_batch_size=Config.EMBED_MAX_BATCH_SIZE,
+            max_wait_ms=Config.EMBED_MAX_WAIT_MS
+        )
+        _engines[model_name] = engine
+    return engine
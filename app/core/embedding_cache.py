@@ -0,0 +1,103 @@
+import hashlib
+import os
+import time
+import numpy as np
+
+from app.config import Config
+from app.core import metrics
+from app.core.executor import run_in_thread
+from app.core.lru_cache import TTLCache
+
+
+def normalize_query(text: str) -> str:
+    # Case and whitespace differences should not cost a re-embed
+    return " ".join(text.split()).casefold()
+
+
+class EmbeddingCache:
+    """
+    LRU+TTL cache of query vectors keyed by (model name, normalized text).
+    Vectors are kept as float32 arrays; an optional on-disk tier stores
+    them as .npy files so hot queries survive restarts.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, disk_dir: str | None = None):
+        self.memory = TTLCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.disk_dir = disk_dir
+        self.disk_hits = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def key(self, model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, model_name: str, text: str) -> np.ndarray | None:
+        key = self.key(model_name, text)
+        vec = self.memory.get(key)
+        if vec is not None or not self.disk_dir:
+            return vec
+        return self._read_disk(key)
+
+    async def get_async(self, model_name: str, text: str) -> np.ndarray | None:
+        """
+        Same as get, but the disk tier is read off the event loop.
+        """
+        key = self.key(model_name, text)
+        vec = self.memory.get(key)
+        if vec is not None or not self.disk_dir:
+            return vec
+        return await run_in_thread("embed_cache", self._read_disk, key)
+
+    def _read_disk(self, key: str) -> np.ndarray | None:
+        path = os.path.join(self.disk_dir, f"{key}.npy")
+        try:
+            if time.time() - os.path.getmtime(path) > self.memory.ttl:
+                os.remove(path)
+                return None
+            vec = np.load(path)
+        except (OSError, ValueError):
+            return None
+
+        self.disk_hits += 1
+        self.memory.put(key, vec)
+        return vec
+
+    def put(self, model_name: str, text: str, vec) -> np.ndarray:
+        key = self.key(model_name, text)
+        vec = np.asarray(vec, dtype=np.float32)
+        self.memory.put(key, vec)
+        if self.disk_dir:
+            self._write_disk(key, vec)
+        return vec
+
+    async def put_async(self, model_name: str, text: str, vec) -> np.ndarray:
+        """
+        Same as put, but the disk tier is written off the event loop.
+        """
+        key = self.key(model_name, text)
+        vec = np.asarray(vec, dtype=np.float32)
+        self.memory.put(key, vec)
+        if self.disk_dir:
+            await run_in_thread("embed_cache", self._write_disk, key, vec)
+        return vec
+
+    def _write_disk(self, key: str, vec: np.ndarray):
+        path = os.path.join(self.disk_dir, f"{key}.npy")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, vec)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not persist query embedding: {e}")
+
+    def stats(self) -> dict:
+        return {**self.memory.stats(), "disk_hits": self.disk_hits}
+
+
+query_cache = EmbeddingCache(
+    max_entries=Config.QUERY_CACHE_SIZE,
+    ttl_seconds=Config.QUERY_CACHE_TTL,
+    disk_dir=Config.QUERY_CACHE_DIR
+)
+metrics.register("query_embedding_cache", query_cache.stats)
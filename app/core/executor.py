@@ -0,0 +1,213 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+from app.config import Config
+from app.core import metrics
+
+MS_BUCKETS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+_thread_pool: ThreadPoolExecutor | None = None
+_process_pool: ProcessPoolExecutor | None = None
+_stages: dict[str, "Stage"] = {}
+
+
+def process_worker_count() -> int:
+    if Config.PROCESS_WORKERS > 0:
+        return Config.PROCESS_WORKERS
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=Config.IO_THREADS, thread_name_prefix="asklyne-io")
+    return _thread_pool
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Shared process pool for GIL-heavy work (PDF parsing, OCR), sized to the
+    usable cores. Uses 'spawn' so workers don't inherit the server's threads
+    and loaded models.
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=process_worker_count(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+def shutdown():
+    global _thread_pool, _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False)
+        _thread_pool = None
+
+
+def picklable_errors(fn):
+    """
+    For process-pool worker functions: some libraries' exceptions (e.g.
+    pytesseract's) can't be unpickled in the parent, which breaks the whole
+    pool, so they are re-raised as plain RuntimeErrors.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            raise RuntimeError(f"{type(e).__name__}: {e}") from None
+    return wrapper
+
+
+def iter_in_order(items: Iterable, window: int, on_error=None) -> Iterator:
+    """
+    Yields results in input order from a mix of plain values and futures,
+    keeping at most `window` futures in flight so memory stays bounded.
+    `on_error(exc)` supplies a replacement value for a failed future.
+    """
+    def resolve(item):
+        if not isinstance(item, Future):
+            return item
+        try:
+            return item.result()
+        except Exception as e:
+            if on_error is None:
+                raise
+            return on_error(e)
+
+    pending = deque()
+    in_flight = 0
+    for item in items:
+        pending.append(item)
+        if isinstance(item, Future):
+            in_flight += 1
+        while pending and (in_flight >= window or not isinstance(pending[0], Future) or pending[0].done()):
+            head = pending.popleft()
+            if isinstance(head, Future):
+                in_flight -= 1
+            yield resolve(head)
+    while pending:
+        yield resolve(pending.popleft())
+
+
+class Stage:
+    """
+    Concurrency limit + timing stats for one named pipeline stage.
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_ms = metrics.Histogram(MS_BUCKETS)
+        self.run_ms = metrics.Histogram(MS_BUCKETS)
+
+    async def run(self, submit):
+        self.waiting += 1
+        t = time.perf_counter()
+        async with self.semaphore:
+            self.waiting -= 1
+            self.in_flight += 1
+            started = time.perf_counter()
+            self.wait_ms.observe((started - t) * 1000)
+            try:
+                result = await submit()
+                self.completed += 1
+                return result
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                self.run_ms.observe((time.perf_counter() - started) * 1000)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_ms": self.wait_ms.snapshot(),
+            "run_ms": self.run_ms.snapshot(),
+        }
+
+
+def get_stage(name: str) -> Stage:
+    stage = _stages.get(name)
+    if stage is None:
+        stage = Stage(name, Config.STAGE_LIMITS.get(name, Config.DEFAULT_STAGE_LIMIT))
+        _stages[name] = stage
+    return stage
+
+
+async def run_in_thread(stage: str, fn, *args, **kwargs):
+    """
+    Runs blocking I/O (or C code that releases the GIL) on the shared
+    thread pool, limited by the stage's concurrency cap.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(fn, *args, **kwargs)
+    return await get_stage(stage).run(lambda: loop.run_in_executor(get_thread_pool(), call))
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up from a fixed sleep.
+    Sustained lag means something CPU-bound is running on the loop.
+    """
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.lag_ms = metrics.Histogram(MS_BUCKETS)
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - t - self.interval) * 1000
+            self.last_ms = lag
+            self.max_ms = max(self.max_ms, lag)
+            self.lag_ms.observe(lag)
+
+    def stats(self) -> dict:
+        return {
+            "last_ms": round(self.last_ms, 3),
+            "max_ms": round(self.max_ms, 3),
+            "lag_ms": self.lag_ms.snapshot(),
+        }
+
+
+loop_monitor = LoopLagMonitor()
+metrics.register("event_loop", loop_monitor.stats)
+metrics.register("stages", lambda: {name: stage.stats() for name, stage in _stages.items()})
@@ -0,0 +1,63 @@
+from typing import Callable, Dict, List
+
+
+def _fuse(ranked: Dict[str, List[dict]], contribution: Callable[[str, int, dict], float]) -> List[dict]:
+    """
+    Merges per-backend hit lists by chunk id. Each hit needs an "id" and a
+    backend-native "score"; the fused entry keeps the first backend's fields
+    (filling gaps from the others) and records every backend's rank/score.
+    """
+    fused: Dict[str, dict] = {}
+    for source, hits in ranked.items():
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.get(hit["id"])
+            if entry is None:
+                entry = fused[hit["id"]] = {**hit, "score": 0.0, "sources": {}}
+            elif source in entry["sources"]:
+                continue
+            else:
+                for key, value in hit.items():
+                    if entry.get(key) is None:
+                        entry[key] = value
+            entry["sources"][source] = {"rank": rank, "score": hit["score"]}
+            entry["score"] += contribution(source, rank, hit)
+
+    for entry in fused.values():
+        entry["source"] = "+".join(entry["sources"])
+    return sorted(fused.values(), key=lambda c: -c["score"])
+
+
+def reciprocal_rank_fusion(ranked: Dict[str, List[dict]], k: int = 60, weights: Dict[str, float] = None) -> List[dict]:
+    """
+    score = sum over backends of weight / (k + rank). Only ranks matter, so
+    cosine similarities and text-match scores never have to be compared.
+    """
+    weights = weights or {}
+    return _fuse(ranked, lambda source, rank, hit: weights.get(source, 1.0) / (k + rank))
+
+
+def weighted_score_fusion(ranked: Dict[str, List[dict]], weights: Dict[str, float] = None) -> List[dict]:
+    """
+    score = sum over backends of weight * min-max normalised backend score.
+    """
+    weights = weights or {}
+    bounds = {}
+    for source, hits in ranked.items():
+        scores = [hit["score"] for hit in hits]
+        if scores:
+            bounds[source] = (min(scores), max(scores))
+
+    def contribution(source, rank, hit):
+        low, high = bounds[source]
+        normalised = (hit["score"] - low) / (high - low) if high > low else 1.0
+        return weights.get(source, 1.0) * normalised
+
+    return _fuse(ranked, contribution)
+
+
+def fuse(ranked: Dict[str, List[dict]], method: str, weights: Dict[str, float] = None, k: int = 60) -> List[dict]:
+    if method == "rrf":
+        return reciprocal_rank_fusion(ranked, k=k, weights=weights)
+    if method == "weighted":
+        return weighted_score_fusion(ranked, weights=weights)
+    raise ValueError(f"Unknown fusion method: {method}")
@@ -0,0 +1,413 @@
+import asyncio
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from typing import Iterator
+
+from app.config import Config
+from app.core import metrics
+from app.core.chunker import Chunker, CodeChunker
+from app.core.embedder import Embedder
+from app.core.tokenizer import embedding_token_counter, llm_token_counter
+from app.core.lru_cache import TTLCache
+from app.core.session_index import session_index
+from app.core.scheduler import FairClock
+from app.core.answer_cache import answer_cache
+from app.utils.code_parser import extract_code_cells
+from app.core.executor import get_process_pool, process_worker_count, iter_in_order, run_in_thread
+from app.utils.ocr_handler import OCRHandler
+from app.utils.pdf_parser import pdf_page_count, extract_pdf_page_range
+
+STAGES = ["extract", "chunk", "embed", "upsert"]
+
+QUEUE_WAIT_BUCKETS = [10, 100, 1000, 5000, 15000, 60000, 300000]
+
+
+class IngestionJob:
+    def __init__(self, session_id: str, tier: str, mode: str, filename: str):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.tier = tier
+        self.original_mode = mode
+        self.mode = "text" if mode == "notes" else mode
+        self.filename = filename or ""
+        self.status = "queued"
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stages = {name: {"items": 0, "seconds": 0.0, "done": False} for name in STAGES}
+
+    def record(self, stage: str, items: int, seconds: float):
+        self.stages[stage]["items"] += items
+        self.stages[stage]["seconds"] += seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "session_id": self.session_id,
+            "tier": self.tier,
+            "mode": self.mode,
+            "filename": self.filename,
+            "status": self.status,
+            "error": self.error,
+            "result": self.result,
+            "stages": {
+                name: {**stage, "seconds": round(stage["seconds"], 3)}
+                for name, stage in self.stages.items()
+            },
+            "queued_seconds": round((self.started_at or time.time()) - self.created_at, 3),
+            "total_seconds": round(self.finished_at - self.started_at, 3) if self.finished_at and self.started_at else None,
+        }
+
+
+def spool_upload(source, suffix: str, max_bytes: int) -> str | None:
+    """
+    Copies an upload into a temp file that the queued job refers to, so
+    waiting jobs hold a path rather than the file's bytes. Returns None
+    (and keeps nothing) when it turns out larger than `max_bytes`.
+    """
+    with tempfile.NamedTemporaryFile(prefix="asklyne-upload-", suffix=suffix, delete=False) as tmp:
+        shutil.copyfileobj(source, tmp, 1024 * 1024)
+        size = tmp.tell()
+    if size > max_bytes:
+        os.remove(tmp.name)
+        return None
+    return tmp.name
+
+
+def remove_upload(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def iter_pdf_pages(path: str) -> Iterator[str]:
+    """
+    Yields PDF page texts in order. Page ranges are parsed in the process
+    pool, and pages without a text layer are sent on to OCR; both are
+    resolved with a bounded look-ahead window, so memory stays per-page.
+    """
+    window = process_worker_count() * 2
+    step = Config.PDF_PAGES_PER_TASK
+    pool = get_process_pool()
+    ocr = None
+
+    def on_ocr_error(e: Exception) -> str:
+        print(f"⚠️ OCR fallback failed: {e}")
+        return ""
+
+    # Workers read from the spooled file instead of receiving the PDF bytes per task
+    page_count = pool.submit(pdf_page_count, path).result()
+    ranges = (
+        pool.submit(extract_pdf_page_range, path, first, min(first + step - 1, page_count))
+        for first in range(1, page_count + 1, step)
+    )
+
+    def pages():
+        nonlocal ocr
+        page_number = 0
+        for texts in iter_in_order(ranges, window):
+            for text in texts:
+                page_number += 1
+                if text.strip():
+                    yield text
+                    continue
+                ocr = ocr or OCRHandler()
+                yield ocr.submit_pdf_page(path, page_number)
+
+    yield from iter_in_order(pages(), window, on_error=on_ocr_error)
+
+
+def iter_pages(path: str, filename: str, mode: str) -> Iterator[str]:
+    """
+    Yields the uploaded document one page-sized text at a time.
+    PDF pages without a text layer are rasterized and OCR'd individually.
+    """
+    if mode == "notes":
+        if filename.endswith(".pdf"):
+            # Scanned multi-page notes: every page goes through the OCR pool
+            yield from OCRHandler().iter_pdf_pages(path)
+            return
+        try:
+            text = OCRHandler().submit_image(read_bytes(path)).result()
+        except Exception as e:
+            raise ValueError(f"OCR failed: {str(e)}")
+        yield text
+        return
+
+    if mode == "code":
+        for _, source in extract_code_cells(read_bytes(path), filename):
+            yield source
+        return
+
+    if filename.endswith(".pdf"):
+        yield from iter_pdf_pages(path)
+        return
+
+    yield read_bytes(path).decode("utf-8", errors="ignore")
+
+
+class IngestionManager:
+    """
+    In-process ingestion queue with a bounded pool of worker tasks.
+    /upload-file only enqueues; workers run extract → chunk → embed → upsert
+    with embedding and upserts done batch by batch, and /jobs/{id} reads
+    the per-stage progress recorded on the job.
+    """
+
+    def __init__(self, registry, workers: int = Config.INGEST_WORKERS, queue_size: int = Config.INGEST_QUEUE_SIZE):
+        self.registry = registry
+        self.workers = workers
+        # Jobs are picked weighted-fair across tiers, FIFO within a tier
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=queue_size)
+        self._clock = FairClock(Config.TIER_WEIGHTS)
+        self._seq = itertools.count()
+        self.queued: dict[str, int] = {}
+        self.shed = 0
+        self.queue_wait_ms = {tier: metrics.Histogram(QUEUE_WAIT_BUCKETS) for tier in Config.ASKLYNE_TIERS}
+        self.jobs = TTLCache(max_entries=Config.INGEST_JOB_HISTORY, ttl_seconds=Config.INGEST_JOB_TTL)
+        self._tasks: list[asyncio.Task] = []
+        self.completed = 0
+        self.failed = 0
+        metrics.register("ingestion", self.stats)
+
+    def start(self):
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(i)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        # Jobs still queued at shutdown won't run; drop their spooled uploads
+        while not self.queue.empty():
+            remove_upload(self.queue.get_nowait()[3])
+
+    def submit(self, job: IngestionJob, path: str) -> IngestionJob:
+        """
+        Queues the job for the upload spooled at `path`; the job deletes it
+        when it finishes. Raises asyncio.QueueFull when the backlog, or the
+        job's tier's share of it (Config.TIER_QUEUE_LIMITS), is at capacity.
+        """
+        if self.queued.get(job.tier, 0) >= Config.TIER_QUEUE_LIMITS.get(job.tier, 0):
+            self.shed += 1
+            raise asyncio.QueueFull
+        try:
+            self.queue.put_nowait((self._clock.tag(job.tier), next(self._seq), job, path))
+        except asyncio.QueueFull:
+            self.shed += 1
+            raise
+        self.queued[job.tier] = self.queued.get(job.tier, 0) + 1
+        self.jobs.put(job.id, job)
+        return job
+
+    def get(self, job_id: str) -> IngestionJob | None:
+        return self.jobs.get(job_id)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queued_by_tier": dict(self.queued),
+            "shed": self.shed,
+            "queue_wait_ms": {tier: h.snapshot() for tier, h in self.queue_wait_ms.items()},
+            "workers": self.workers,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    async def _worker(self, index: int):
+        while True:
+            tag, _, job, path = await self.queue.get()
+            self._clock.advance(tag)
+            self.queued[job.tier] -= 1
+            if job.tier in self.queue_wait_ms:
+                self.queue_wait_ms[job.tier].observe((time.time() - job.created_at) * 1000)
+            try:
+                await self.run(job, path)
+                self.completed += 1
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                self.failed += 1
+                print(f"⚠️ Ingestion job {job.id} failed:\n", traceback.format_exc())
+            finally:
+                job.finished_at = time.time()
+                remove_upload(path)
+                self.queue.task_done()
+
+    def _produce_chunks(self, job: IngestionJob, path: str, emit, model_name: str):
+        """
+        Runs in a worker thread: pulls pages lazily, chunks them as they
+        arrive and hands each (chunk, payload metadata) to `emit` (which blocks
+        when the consumer is behind, so at most a few pages are in flight).
+        """
+        counter = embedding_token_counter(model_name)
+        llm_counter = llm_token_counter()
+
+        def timed(units):
+            units = iter(units)
+            while True:
+                t = time.perf_counter()
+                try:
+                    unit = next(units)
+                except StopIteration:
+                    job.record("extract", 0, time.perf_counter() - t)
+                    return
+                job.record("extract", 1, time.perf_counter() - t)
+                yield unit
+
+        if job.mode == "code":
+            # Each file / notebook cell is parsed once and cut at its symbols
+            code_chunker = CodeChunker(max_tokens=Config.CHUNK_MAX_TOKENS, overlap=Config.CHUNK_OVERLAP, counter=counter)
+            chunks = code_chunker.chunk_cells(timed(extract_code_cells(read_bytes(path), job.filename)))
+        else:
+            chunker = Chunker(file_type=job.mode, max_tokens=Config.CHUNK_MAX_TOKENS, overlap=Config.CHUNK_OVERLAP, counter=counter)
+            pages = iter_pages(path, job.filename, job.original_mode)
+            chunks = ((chunk, tokens, {}) for chunk, tokens in chunker.chunk_stream_counted(timed(pages)))
+
+        pending = []
+
+        def flush():
+            # LLM-side counts are stored with the chunks so ContextBuilder never
+            # re-counts; one tokenizer call per embed batch
+            t = time.perf_counter()
+            llm_counts = llm_counter.count_batch([chunk for chunk, _, _ in pending])
+            job.record("chunk", 0, time.perf_counter() - t)
+            for (chunk, token_count, meta), llm_tokens in zip(pending, llm_counts):
+                emit((chunk, {"token_count": token_count, "llm_tokens": llm_tokens, **meta}))
+            pending.clear()
+
+        while True:
+            t = time.perf_counter()
+            extract_before = job.stages["extract"]["seconds"]
+            try:
+                chunk, token_count, meta = next(chunks)
+            except StopIteration:
+                break
+            extract_spent = job.stages["extract"]["seconds"] - extract_before
+            job.record("chunk", 1, time.perf_counter() - t - extract_spent)
+            pending.append((chunk, token_count, meta))
+            if len(pending) >= Config.INGEST_BATCH_SIZE:
+                flush()
+        flush()
+
+        job.stages["extract"]["done"] = True
+        job.stages["chunk"]["done"] = True
+
+    async def run(self, job: IngestionJob, path: str):
+        job.status = "running"
+        job.started_at = time.time()
+        tier, mode = job.tier, job.mode
+
+        loop = asyncio.get_running_loop()
+        batch_size = Config.INGEST_BATCH_SIZE
+        # Two batches of look-ahead keeps extraction busy without buffering the document
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=batch_size * 2)
+        done = object()
+
+        cancelled = threading.Event()
+
+        def emit(item):
+            if cancelled.is_set():
+                raise RuntimeError("ingestion consumer stopped")
+            asyncio.run_coroutine_threadsafe(chunk_queue.put(item), loop).result()
+
+        def produce():
+            try:
+                self._produce_chunks(job, path, emit, embedder.model_name)
+            except Exception as e:
+                if not cancelled.is_set():
+                    emit(e)
+            finally:
+                if not cancelled.is_set():
+                    emit(done)
+
+        embedder = await Embedder.create(tier=tier, mode=mode)
+        writer = self.registry.bulk_writer(tier, mode)
+        producer = asyncio.create_task(run_in_thread("extract", produce))
+
+        index_key = (tier, mode, job.session_id)
+        if session_index is not None:
+            # Load the session's existing chunks now so new ones can be appended as they're written
+            await session_index.get(index_key, writer.qdrant)
+
+        async def write(batch, embeddings, metadata):
+            t = time.perf_counter()
+            ids = await writer.write(batch, embeddings, session_id=job.session_id, mode=mode, metadata=metadata)
+            job.record("upsert", len(batch), time.perf_counter() - t)
+            if session_index is not None:
+                session_index.add(index_key, ids, embeddings, [{"text": c, **m} for c, m in zip(batch, metadata)])
+            if answer_cache is not None:
+                # The session's chunk set changed, cached answers may be out of date
+                answer_cache.invalidate(index_key)
+
+        pending_write = None
+        num_chunks = 0
+        sample_chunk = None
+        sample_embedding = []
+        finished = False
+        try:
+            while not finished:
+                batch = []
+                while len(batch) < batch_size:
+                    item = await chunk_queue.get()
+                    if item is done:
+                        finished = True
+                        break
+                    if isinstance(item, Exception):
+                        await producer
+                        raise item
+                    batch.append(item)
+                if not batch:
+                    break
+                batch, metadata = [text for text, _ in batch], [meta for _, meta in batch]
+
+                t = time.perf_counter()
+                embeddings = await embedder.embed_chunks_async(batch)
+                job.record("embed", len(batch), time.perf_counter() - t)
+                if sample_chunk is None:
+                    sample_chunk = batch[0]
+                    sample_embedding = embeddings[0][:5]
+
+                # Overlap this batch's write with embedding the next one
+                if pending_write:
+                    await pending_write
+                pending_write = asyncio.create_task(write(batch, embeddings, metadata))
+                num_chunks += len(batch)
+
+            if pending_write:
+                await pending_write
+            await writer.flush()
+            if answer_cache is not None:
+                answer_cache.invalidate(index_key)
+        finally:
+            if pending_write and not pending_write.done():
+                pending_write.cancel()
+            # Unblock a producer stuck on a full queue if we bailed out early
+            cancelled.set()
+            while not chunk_queue.empty():
+                chunk_queue.get_nowait()
+
+        await producer
+        job.stages["embed"]["done"] = True
+        job.stages["upsert"]["done"] = True
+        job.status = "done"
+        job.result = {
+            "num_chunks": num_chunks,
+            "sample_chunk": sample_chunk if sample_chunk is not None else "[empty]",
+            "sample_embedding": sample_embedding
+        }
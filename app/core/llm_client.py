@@ -1,13 +1,67 @@
-import os
+import json
 import httpx
+from typing import AsyncIterator
 from app.config import Config
 
+# Shared connection pool for all LLM calls (owned by the app lifespan)
+_http_client: httpx.AsyncClient | None = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def open_http_client() -> httpx.AsyncClient:
+    """
+    Creates the process-wide pooled client. Called once from the lifespan;
+    HTTP/2 is used when the optional 'h2' package is installed.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(Config.LLM_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=Config.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.LLM_MAX_CONNECTIONS,
+                keepalive_expiry=60.0
+            ),
+            http2=_http2_available()
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    # Lazily opened so scripts outside the app lifespan still work
+    return open_http_client()
+
+
+class LLMError(Exception):
+    """
+    Raised by LLMClient when the endpoint fails or answers in a format we
+    can't parse. str(e) is the placeholder shown to users in place of an
+    answer, so callers can tell a failure from an answer that merely looks
+    like one.
+    """
+
+
 class LLMClient:
     def __init__(self, model_name: str, max_tokens: int = 1024):
         self.api_key = Config.TOGETHER_API_KEY
         self.model_name = model_name
         self.max_tokens = max_tokens
-        self.api_url = "https://api.together.xyz/inference"
+        # Overridable so a local mock server can stand in for Together
+        self.api_url = Config.LLM_API_URL
         
     @classmethod
     def from_tier(cls, tier: str, mode: str = "text"):
@@ -38,8 +92,8 @@ class LLMClient:
             "Content-Type": "application/json"
         }
 
-    def build_payload(self, prompt: str):
-        return {
+    def build_payload(self, prompt: str, stream: bool = False):
+        payload = {
             "model": self.model_name,
             "messages": [
                 {"role": "system", "content": "You are a helpful assistant."},
@@ -49,28 +103,70 @@ class LLMClient:
             "temperature": 0.9,
             "top_p":0.95
         }
+        if stream:
+            payload["stream"] = True
+        return payload
 
     async def query(self, prompt: str) -> str:
         payload = self.build_payload(prompt)
         headers = self.build_headers()
 
         try:
-            timeout = httpx.Timeout(30.0)
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.post(self.api_url, headers=headers, json=payload)
+            client = get_http_client()
+            response = await client.post(self.api_url, headers=headers, json=payload)
+            response.raise_for_status()
+            data = response.json()
+            print("LLM response data:", data)
+
+            # Try Together-style
+            if "output" in data:
+                return data["output"]["choices"][0]["text"]
+            elif "choices" in data and "message" in data["choices"][0]:
+                return data["choices"][0]["message"]["content"]
+            else:
+                raise LLMError("[LLM returned unexpected format]")
+
+        except LLMError:
+            raise
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            raise LLMError("[LLM failed]") from e
+
+    async def query_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Yields completion text pieces as they arrive over SSE; raises
+        LLMError on failure, possibly after some pieces were yielded.
+        """
+        payload = self.build_payload(prompt, stream=True)
+        headers = self.build_headers()
+
+        try:
+            client = get_http_client()
+            async with client.stream("POST", self.api_url, headers=headers, json=payload) as response:
                 response.raise_for_status()
-                data = response.json()
-                print("LLM response data:", data)
-
-                # Try Together-style
-                if "output" in data:
-                    return data["output"]["choices"][0]["text"]
-                elif "choices" in data and "message" in data["choices"][0]:
-                    return data["choices"][0]["message"]["content"]
-                else:
-                    return "[LLM returned unexpected format]"
-
-        except Exception:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    token = self.extract_stream_token(json.loads(data))
+                    if token:
+                        yield token
+
+        except Exception as e:
             import traceback
             traceback.print_exc()
-            return "[LLM failed]"
+            raise LLMError("[LLM failed]") from e
+
+    @staticmethod
+    def extract_stream_token(event: dict) -> str:
+        choices = event.get("choices") or []
+        if not choices:
+            return ""
+        choice = choices[0]
+        # Chat-style deltas first, then Together's completion-style text
+        if "delta" in choice:
+            return choice["delta"].get("content") or ""
+        return choice.get("text") or ""
@@ -0,0 +1,55 @@
+import threading
+from typing import Callable
+
+# name -> callable returning a JSON-able snapshot
+_providers: dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, provider: Callable[[], dict]):
+    """
+    Registers a stats provider exposed under /metrics.
+    """
+    _providers[name] = provider
+
+
+def snapshot() -> dict:
+    out = {}
+    for name, provider in list(_providers.items()):
+        try:
+            out[name] = provider()
+        except Exception as e:
+            out[name] = {"error": str(e)}
+    return out
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram (cumulative counts are left to the reader).
+    """
+
+    def __init__(self, buckets: list[float]):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+            self.count += 1
+            self.total += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            labels = [f"le_{b:g}" for b in self.buckets] + ["le_inf"]
+            return {
+                "buckets": dict(zip(labels, self.counts)),
+                "count": self.count,
+                "mean": round(self.total / self.count, 4) if self.count else 0.0,
+            }
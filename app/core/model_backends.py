@@ -0,0 +1,87 @@
+import os
+
+from app.config import Config
+
+# Embedding backends; the int8 variants use dynamic (weight-only) quantization
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+
+def set_torch_threads():
+    if Config.INTRA_OP_THREADS > 0:
+        import torch
+        torch.set_num_threads(Config.INTRA_OP_THREADS)
+
+
+def quantize_linear_int8(module):
+    """
+    Dynamic int8 quantization of a torch module's Linear layers (CPU only).
+    """
+    import torch
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def onnx_model_kwargs(file_name: str | None = None) -> dict:
+    kwargs = {"provider": "CPUExecutionProvider"}
+    if file_name:
+        kwargs["file_name"] = file_name
+    if Config.INTRA_OP_THREADS > 0:
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = Config.INTRA_OP_THREADS
+        kwargs["session_options"] = options
+    return kwargs
+
+
+def _load_onnx(model_name: str, quantize: bool):
+    from sentence_transformers import SentenceTransformer
+
+    if not quantize:
+        return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=onnx_model_kwargs())
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    # Exported once into ONNX_EXPORT_DIR and reused by later starts
+    export_dir = os.path.join(Config.ONNX_EXPORT_DIR, model_name.replace("/", "__"))
+    file_name = f"onnx/model_qint8_{Config.ONNX_QUANT_CONFIG}.onnx"
+    if not os.path.exists(os.path.join(export_dir, file_name)):
+        print(f"[Embedder] Exporting int8 ONNX model for {model_name} to {export_dir}")
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=onnx_model_kwargs())
+        model.save_pretrained(export_dir)
+        export_dynamic_quantized_onnx_model(model, Config.ONNX_QUANT_CONFIG, export_dir)
+    return SentenceTransformer(export_dir, device="cpu", backend="onnx", model_kwargs=onnx_model_kwargs(file_name))
+
+
+def load_sentence_transformer(model_name: str, backend: str):
+    """
+    Loads an embedding model on the requested backend. Returns
+    (model, backend actually used): ONNX backends fall back to torch when
+    optimum/onnxruntime aren't installed.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+    if backend.startswith("onnx"):
+        try:
+            return _load_onnx(model_name, quantize=backend == "onnx-int8"), backend
+        except ImportError as e:
+            print(f"⚠️ ONNX backend unavailable for {model_name} ({e}); install sentence-transformers[onnx]. Falling back to torch.")
+            backend = "torch"
+
+    set_torch_threads()
+    if backend == "torch-int8":
+        model = _load_torch(model_name, device="cpu")
+        model[0].auto_model = quantize_linear_int8(model[0].auto_model)
+        return model, backend
+    return _load_torch(model_name), backend
+
+
+def _load_torch(model_name: str, **kwargs):
+    from sentence_transformers import SentenceTransformer
+
+    if Config.MODEL_SAFETENSORS:
+        # safetensors are memory-mapped instead of unpickled into fresh memory
+        try:
+            return SentenceTransformer(model_name, model_kwargs={"use_safetensors": True}, **kwargs)
+        except (OSError, EnvironmentError) as e:
+            print(f"ℹ️ No safetensors weights for {model_name}, loading the pickled checkpoint ({e})")
+    return SentenceTransformer(model_name, **kwargs)
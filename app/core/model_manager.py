@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable
+
+from app.config import Config
+from app.core import metrics
+from app.core.executor import run_in_thread
+
+# Taken when this module is first imported, i.e. early in app startup
+PROCESS_T0 = time.perf_counter()
+
+
+class ModelNotReady(Exception):
+    """
+    Raised by `ModelManager.require` while a model is still loading; the
+    API turns it into a 503 with Retry-After.
+    """
+
+    def __init__(self, message: str, retry_after: float = 5.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ModelManager:
+    """
+    Owns every loaded model (embedders, reranker). `get` loads a model on
+    first use, exactly once even when several requests ask concurrently;
+    `get_async` does the same from the event loop without blocking it;
+    `warmup` loads a set of them in parallel in the background so the
+    server is live immediately and reports ready once every one of them
+    is in memory.
+    """
+
+    def __init__(self):
+        self._models: dict[Hashable, Any] = {}
+        self._status: dict[Hashable, dict] = {}
+        self._locks: dict[Hashable, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self._loading: dict[Hashable, asyncio.Future] = {}
+        self._warmup: asyncio.Task | None = None
+        self.warmup_started: float | None = None
+        self.ready_at: float | None = None
+        self.warmup_failures: dict[str, str] = {}
+
+    def _lock(self, key: Hashable) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock(key):
+            model = self._models.get(key)
+            if model is None:
+                self._status[key] = {"status": "loading"}
+                t = time.perf_counter()
+                try:
+                    model = loader()
+                except Exception as e:
+                    self._status[key] = {"status": "failed", "error": str(e)}
+                    raise
+                self._models[key] = model
+                self._status[key] = {"status": "ready", "load_ms": round((time.perf_counter() - t) * 1000, 1)}
+        return model
+
+    async def get_async(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        `get` for the event loop: a model that isn't loaded yet is loaded on
+        the "model_load" stage, and concurrent callers share that one load.
+        """
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = asyncio.ensure_future(run_in_thread("model_load", self.get, key, loader))
+            self._loading[key] = loading
+            loading.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await asyncio.shield(loading)
+
+    def require(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        The model if it is loaded. Otherwise starts loading it in the
+        background (once) and raises ModelNotReady, so request handlers
+        can answer 503 instead of waiting out a model load.
+        """
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        if key not in self._loading:
+            # Failures are recorded in _status; the next request retries
+            task = asyncio.ensure_future(self.get_async(key, loader))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        status = self._status.get(key, {}).get("status", "loading")
+        raise ModelNotReady(f"Model {key} is {status}, retry shortly.")
+
+    def start_warmup(self, tasks: dict[str, Callable[[], Any]], workers: int = Config.MODEL_WARMUP_WORKERS):
+        """
+        Runs the named loaders concurrently on a dedicated pool (so slow
+        model loads don't occupy the shared I/O threads).
+        """
+        self.warmup_started = time.perf_counter()
+        self._warmup = asyncio.create_task(self._run_warmup(tasks, workers))
+
+    async def _run_warmup(self, tasks: dict[str, Callable[[], Any]], workers: int):
+        loop = asyncio.get_running_loop()
+        pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="asklyne-warmup")
+        try:
+            results = await asyncio.gather(
+                *(loop.run_in_executor(pool, task) for task in tasks.values()),
+                return_exceptions=True
+            )
+        finally:
+            pool.shutdown(wait=False)
+        for name, result in zip(tasks, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ Warmup failed for {name}: {result}")
+                self.warmup_failures[name] = str(result)
+        # Not ready with a model missing; /readyz keeps reporting the failures
+        if not self.warmup_failures:
+            self.mark_ready()
+
+    def mark_ready(self):
+        self.ready_at = time.perf_counter()
+        print(f"[Startup] Ready in {self.ready_at - PROCESS_T0:.1f}s")
+
+    async def stop(self):
+        if self._warmup and not self._warmup.done():
+            self._warmup.cancel()
+            await asyncio.gather(self._warmup, return_exceptions=True)
+
+    def is_ready(self) -> bool:
+        return self.ready_at is not None
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.is_ready(),
+            "startup_seconds": round(self.ready_at - PROCESS_T0, 2) if self.ready_at else None,
+            "warmup_seconds": round(self.ready_at - self.warmup_started, 2) if self.ready_at and self.warmup_started else None,
+            "warmup_failures": self.warmup_failures,
+            "models": {str(key): status for key, status in self._status.items()},
+        }
+
+
+model_manager = ModelManager()
+metrics.register("models", model_manager.stats)
@@ -1,21 +1,36 @@
-import os
-import json
-import markdown2
-import pdfkit
-from app.core.llm_client import LLMClient
+import asyncio
+import hashlib
+from app.config import Config
+from app.core import metrics
+from app.core.llm_client import LLMClient, LLMError
+from app.core.executor import run_in_thread
+from app.core.lru_cache import TTLCache
+from app.services.session_store import get_session_store
 
-def load_interactions(session_id: str) -> list[dict]:
-    log_path = f"sessions/{session_id}/interaction_log.json"
-    if not os.path.exists(log_path):
-        return []
-    with open(log_path, "r") as f:
-        return json.load(f)
+# Window (and merge) summaries keyed by a hash of model + input, so
+# regenerating notes only summarises windows that changed
+summary_cache = TTLCache(max_entries=Config.NOTES_CACHE_SIZE, ttl_seconds=Config.NOTES_CACHE_TTL)
+metrics.register("notes_summary_cache", summary_cache.stats)
 
-def format_qa_log(interactions: list[dict]) -> str:
-    return "\n\n".join(
-        f"Q{i+1}: {entry['query']}\nA{i+1}: {entry['response']}"
-        for i, entry in enumerate(interactions)
-    )
+MAP_PROMPT = """You are condensing part of a study session between a user and an AI assistant into notes.
+
+Extract every important fact, definition, rule, example and insight from the exchanges below
+as concise bullet points grouped under short headings. Keep technical details and code exact.
+Do not mention that this is a partial session or refer to the Q&A format.
+
+Exchanges:
+{text}"""
+
+REDUCE_PROMPT = """You are merging partial notes taken from consecutive parts of one study session.
+
+Combine them into a single set of notes: merge overlapping headings, remove repetition,
+keep every distinct fact, and preserve the order in which topics appear.
+
+Partial notes:
+{text}"""
+
+def load_interactions(session_id: str) -> list[dict]:
+    return get_session_store().read_all(session_id)
 
 def build_prompt(mode: str, qa_log: str, custom_prompt: str | None = None) -> str:
     base = """You are an intelligent AI assistant trained to generate high-quality notes from user conversations.
@@ -38,58 +53,71 @@ def build_prompt(mode: str, qa_log: str, custom_prompt: str | None = None) -> st
     base += f"\nSession:\n{qa_log}"
     return base
 
+def notes_model(tier: str) -> str:
+    # Use Mistral for now for better speed and context balance
+    if tier in ["plus", "pro"]:
+        return "mistralai/Mixtral-8x7B-Instruct-v0.1"
+    return "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"
+
+def format_qa_log(interactions: list[dict], prompt_type: str = "full", offset: int = 0) -> str:
+    if prompt_type == "response_only":
+        return "\n\n".join(f"A{offset+i+1}: {entry['response']}" for i, entry in enumerate(interactions))
+    return "\n\n".join(
+        f"Q{offset+i+1}: {entry['query']}\nA{offset+i+1}: {entry['response']}"
+        for i, entry in enumerate(interactions)
+    )
+
+async def summarize(llm: LLMClient, template: str, text: str, limit: asyncio.Semaphore) -> str:
+    """
+    One map/merge call, served from `summary_cache` when the same model
+    has already summarised the same text.
+    """
+    key = hashlib.sha256(f"{llm.model_name}\0{template}\0{text}".encode("utf-8")).hexdigest()
+    summary = summary_cache.get(key)
+    if summary is not None:
+        return summary
+    try:
+        async with limit:
+            summary = await llm.query(template.format(text=text))
+    except LLMError as e:
+        # The placeholder stands in for this part; it is never cached
+        return str(e)
+    summary_cache.put(key, summary)
+    return summary
+
 async def generate_notes(session_id: str, tier: str, mode: str, prompt_type: str, custom_prompt: str = "") -> str:
-    interactions = load_interactions(session_id)
+    """
+    Short sessions go to the LLM in one prompt. Longer ones are map-reduced:
+    fixed windows of NOTES_WINDOW_EXCHANGES exchanges are summarised
+    concurrently, then the summaries are merged NOTES_REDUCE_FANIN at a time
+    until one prompt's worth is left. Window boundaries don't move as the
+    session grows, so only the newest windows miss the summary cache.
+    """
+    interactions = await run_in_thread("session_io", load_interactions, session_id)
     if not interactions:
         return "[Error: No conversation found for this session.]"
 
-    if prompt_type == "response_only":
-        qa_log = "\n\n".join(f"A{i+1}: {entry['response']}" for i, entry in enumerate(interactions))
-    else:
-        qa_log = format_qa_log(interactions)
-
-    prompt = build_prompt(mode, qa_log, custom_prompt if prompt_type == "custom" else None)
+    llm = LLMClient(model_name=notes_model(tier))
+    window = max(1, Config.NOTES_WINDOW_EXCHANGES)
 
-    # Use Mistral for now for better speed and context balance
-    if tier in ["plus", "pro"]:
-        model_name = "mistralai/Mixtral-8x7B-Instruct-v0.1"
+    if len(interactions) <= window:
+        qa_log = format_qa_log(interactions, prompt_type)
     else:
-        model_name = "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"
-
-    llm = LLMClient(model_name=model_name)
-
-    return await llm.query(prompt)
-
-def save_notes_as_pdf(md_content: str, session_id: str) -> str:
-    html = markdown2.markdown(md_content)
-
-    styled_html = f"""
-    <html>
-    <head>
-        <style>
-            body {{
-                font-family: 'Segoe UI', sans-serif;
-                font-size: 16px;
-                line-height: 1.7;
-                padding: 40px;
-                background-color: #ffffff;
-            }}
-            h1, h2, h3 {{
-                color: #1a237e;
-            }}
-            ul {{
-                margin-bottom: 1em;
-            }}
-            li {{
-                margin-bottom: 0.4em;
-            }}
-        </style>
-    </head>
-    <body>{html}</body>
-    </html>
-    """
+        limit = asyncio.Semaphore(max(1, Config.NOTES_MAP_CONCURRENCY))
+        summaries = await asyncio.gather(*(
+            summarize(llm, MAP_PROMPT, format_qa_log(interactions[i:i + window], prompt_type, offset=i), limit)
+            for i in range(0, len(interactions), window)
+        ))
+        fan_in = max(2, Config.NOTES_REDUCE_FANIN)
+        while len(summaries) > fan_in:
+            summaries = await asyncio.gather(*(
+                summarize(llm, REDUCE_PROMPT, "\n\n---\n\n".join(summaries[i:i + fan_in]), limit)
+                for i in range(0, len(summaries), fan_in)
+            ))
+        qa_log = "\n\n---\n\n".join(summaries)
 
-    pdf_path = f"sessions/{session_id}/asklyne_notes.pdf"
-    os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
-    pdfkit.from_string(styled_html, pdf_path)
-    return pdf_path
+    prompt = build_prompt(mode, qa_log, custom_prompt if prompt_type == "custom" else None)
+    try:
+        return await llm.query(prompt)
+    except LLMError as e:
+        return str(e)
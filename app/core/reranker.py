@@ -1,28 +1,158 @@
+import hashlib
+import threading
 from typing import List, Dict
+
 from app.config import Config
+from app.core import metrics
+from app.core.batching import MicroBatcher
+from app.core.embedding_cache import normalize_query
+from app.core.lru_cache import TTLCache
+from app.core.model_backends import onnx_model_kwargs, quantize_linear_int8, set_torch_threads
+from app.core.model_manager import model_manager
+from app.utils.chunk_ids import chunk_hash
+
+_engine: MicroBatcher | None = None
+_engine_lock = threading.Lock()
+MODEL_KEY = ("reranker", Config.RERANKER_MODEL)
+
+score_cache = TTLCache(max_entries=Config.RERANK_CACHE_SIZE, ttl_seconds=Config.RERANK_CACHE_TTL)
+metrics.register("rerank_score_cache", score_cache.stats)
+
+
+def _load_torch_scorer(model_name: str, quantize: bool):
+    from sentence_transformers import CrossEncoder
+
+    set_torch_threads()
+    model = CrossEncoder(model_name, device="cpu" if quantize else None)
+    if quantize:
+        model.model = quantize_linear_int8(model.model)
+
+    def score(pairs: list) -> list[float]:
+        return [float(s) for s in model.predict(pairs, batch_size=Config.RERANK_MAX_BATCH_SIZE, show_progress_bar=False)]
+
+    return score
+
+
+def _load_onnx_scorer(model_name: str):
+    import torch
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True, **onnx_model_kwargs())
+
+    def score(pairs: list) -> list[float]:
+        queries, passages = zip(*pairs)
+        inputs = tokenizer(list(queries), list(passages), padding=True, truncation=True, return_tensors="pt")
+        with torch.no_grad():
+            logits = model(**inputs).logits
+        return logits[:, 0].tolist()
+
+    return score
+
+
+def _load_scorer():
+    backend = Config.RERANKER_BACKEND
+    model_name = Config.RERANKER_MODEL
+    print(f"[Reranker] Loading {model_name} ({backend})")
+    if backend == "onnx":
+        try:
+            return _load_onnx_scorer(model_name)
+        except ImportError as e:
+            print(f"⚠️ ONNX reranker unavailable ({e}); install optimum[onnxruntime]. Falling back to torch.")
+    return _load_torch_scorer(model_name, quantize=backend == "int8")
+
+
+def get_engine() -> MicroBatcher:
+    """
+    The process-wide cross-encoder, loaded once and fed by a micro-batcher
+    so (query, passage) pairs from concurrent requests share forward passes.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = MicroBatcher(
+                    name="rerank",
+                    process_batch=model_manager.get(MODEL_KEY, _load_scorer),
+                    max_batch_size=Config.RERANK_MAX_BATCH_SIZE,
+                    max_wait_ms=Config.RERANK_MAX_WAIT_MS
+                )
+    return _engine
+
+
+def preload(tiers: List[str]):
+    if any(tier.strip().lower() in Config.RERANK_TIERS for tier in tiers):
+        get_engine()
+
 
 class Reranker:
+    """
+    Cheap per-request handle over the shared cross-encoder. Scores are
+    cached by (query hash, chunk id), so follow-up questions and retries
+    only score passages they haven't seen.
+    """
+
     def __init__(self, tier: str = "free"):
         self.tier = tier.lower()
-        if self.tier in ["plus", "pro"]:
-            from sentence_transformers import CrossEncoder
-            self.model = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
-        else:
-            self.model = None
+        # Free tier: skip reranking
+        self.engine = get_engine() if self.tier in Config.RERANK_TIERS else None
 
-    def rerank(self, query: str, chunks: List[Dict]) -> List[Dict]:
-        if self.model is None:
-            # Free tier: skip reranking
-            return chunks
+    @classmethod
+    async def create(cls, tier: str = "free") -> "Reranker":
+        """
+        Reranker(...) for the event loop: the cross-encoder is loaded off
+        the loop if it isn't in memory yet.
+        """
+        if tier.lower() in Config.RERANK_TIERS:
+            await model_manager.get_async(MODEL_KEY, _load_scorer)
+        return cls(tier)
+
+    @classmethod
+    def ready(cls, tier: str = "free") -> "Reranker":
+        """
+        Reranker(...) if the cross-encoder is loaded (or not needed), else
+        ModelNotReady while it loads in the background.
+        """
+        if tier.lower() in Config.RERANK_TIERS:
+            model_manager.require(MODEL_KEY, _load_scorer)
+        return cls(tier)
 
-        pairs = [(query, chunk["text"]) for chunk in chunks]
-        if not pairs:
-            return [] 
-        scores = self.model.predict(pairs)
+    @staticmethod
+    def query_key(query: str) -> str:
+        return hashlib.sha256(f"{Config.RERANKER_MODEL}@{Config.RERANKER_BACKEND}\0{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def _split_cached(self, query: str, chunks: List[Dict]):
+        qkey = self.query_key(query)
+        keys = [(qkey, chunk.get("id") or chunk_hash(chunk["text"])) for chunk in chunks]
+        scores = [score_cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        return keys, scores, missing
+
+    def _apply(self, chunks: List[Dict], keys, scores, missing, computed) -> List[Dict]:
+        for i, score in zip(missing, computed):
+            scores[i] = score
+            score_cache.put(keys[i], score)
 
         # Inject scores back into chunks
-        for i, score in enumerate(scores):
-            chunks[i]["score"] = float(score)
-            chunks[i]["source"] = chunks[i].get("source", "reranked")
+        for chunk, score in zip(chunks, scores):
+            chunk["score"] = float(score)
+            chunk["source"] = chunk.get("source", "reranked")
 
         return sorted(chunks, key=lambda x: -x["score"])
+
+    def rerank(self, query: str, chunks: List[Dict]) -> List[Dict]:
+        if self.engine is None or not chunks:
+            return chunks
+        keys, scores, missing = self._split_cached(query, chunks)
+        pairs = [(query, chunks[i]["text"]) for i in missing]
+        computed = self.engine.submit_sync(pairs, self.tier).result() if pairs else []
+        return self._apply(chunks, keys, scores, missing, computed)
+
+    async def rerank_async(self, query: str, chunks: List[Dict]) -> List[Dict]:
+        if self.engine is None or not chunks:
+            return chunks
+        keys, scores, missing = self._split_cached(query, chunks)
+        pairs = [(query, chunks[i]["text"]) for i in missing]
+        computed = await self.engine.submit(pairs, self.tier) if pairs else []
+        return self._apply(chunks, keys, scores, missing, computed)
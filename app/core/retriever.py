@@ -1,53 +1,99 @@
 from app.services.qdrant_service import QdrantService
-from app.services.typesense_service import TypesenseService
+from app.services.keyword_backend import KeywordBackend, get_keyword_backend
 from app.core.embedder import Embedder
+from app.core.executor import run_in_thread
+from app.core.fusion import fuse
+from app.core.session_index import session_index
+from app.config import Config
 import asyncio
+import math
+
+# Payload fields attached to code chunks (see CodeChunker)
+SYMBOL_FIELDS = ("symbol", "symbol_type", "start_line", "end_line", "cell_index")
+
+# Above this many matrix cells (rows x dim) the in-process search moves off the event loop
+INLINE_SEARCH_CELLS = 2_000_000
+
+
+def make_chunk(chunk_id: str, score: float, payload: dict) -> dict:
+    return {
+        "id": chunk_id,
+        "text": payload["text"],
+        "score": score,
+        "llm_tokens": payload.get("llm_tokens"),
+        **{k: payload[k] for k in SYMBOL_FIELDS if k in payload}
+    }
 
 
 class Retriever:
-    def __init__(self, tier: str, mode: str):
+    def __init__(self, tier: str, mode: str, qdrant: QdrantService = None, keyword: KeywordBackend = None):
         self.tier = tier.lower()
         self.mode = mode.lower()
 
-        self.embedder = Embedder(tier=self.tier, mode=self.mode)
-        self.qdrant = QdrantService(tier=self.tier, mode=self.mode)
-        self.typesense = TypesenseService(tier=self.tier)
+        # Created on first retrieval, where the model can be loaded off the event loop
+        self.embedder: Embedder | None = None
+        # Prefer the shared services from the registry; fall back to fresh ones.
+        self.qdrant = qdrant or QdrantService(tier=self.tier, mode=self.mode)
+        self.keyword = keyword or get_keyword_backend(self.tier)
 
 
     async def retrieve_async(self, query: str, session_id: str, mode: str, top_k: int = 5) -> list[dict]:
+        """
+        Hybrid search: both backends over-fetch, hits are deduplicated by
+        chunk id and ranked by the configured fusion method. Returns the top
+        `top_k` chunks; "score" is the fused score, per-backend ranks and
+        scores are under "sources".
+        """
         if not self.embedder or self.embedder.mode != mode:
-            self.embedder = Embedder(tier=self.tier, mode=mode)
+            self.embedder = await Embedder.create(tier=self.tier, mode=mode)
 
-        query_vec = self.embedder.embed_chunks([query])[0]
+        query_vec = await self.embedder.embed_query_async(query)
 
-        semantic_task = asyncio.to_thread(
-            self.qdrant.search,
-            query_embedding=query_vec,
-            top_k=top_k,
-            filters={"session_id": session_id, "mode": mode}
+        semantic_task = self.semantic_search(
+            query_vec,
+            session_id=session_id,
+            mode=mode,
+            top_k=math.ceil(top_k * max(1.0, Config.SEMANTIC_OVERFETCH))
         )
-        keyword_task = asyncio.to_thread(
-            self.typesense.search,
+        keyword_task = run_in_thread(
+            "search",
+            self.keyword.search,
             query=query,
-            top_k=top_k,
+            top_k=math.ceil(top_k * max(1.0, Config.KEYWORD_OVERFETCH)),
             filters={"session_id": session_id, "mode": mode}
         )
 
-        semantic_hits, keyword_hits = await asyncio.gather(semantic_task, keyword_task)
+        semantic_chunks, keyword_hits = await asyncio.gather(semantic_task, keyword_task)
+
+        keyword_chunks = [make_chunk(hit["id"], hit["score"], hit) for hit in keyword_hits]
 
-        semantic_chunks = [
-            {"text": hit.payload["text"], "source": "qdrant", "score": hit.score}
-            for hit in semantic_hits
-        ]
+        fused = fuse(
+            {"semantic": semantic_chunks, "keyword": keyword_chunks},
+            method=Config.RETRIEVAL_FUSION,
+            weights={"semantic": Config.SEMANTIC_WEIGHT, "keyword": Config.KEYWORD_WEIGHT},
+            k=Config.RRF_K
+        )
+        return fused[:top_k]
 
-        keyword_chunks = [
-            {
-                "text": hit["document"].get("text", ""),
-                "source": "typesense",
-                "score": hit.get("text_match_score", 0.0)
-            }
-            for hit in keyword_hits
-        ]
+    async def semantic_search(self, query_vec, session_id: str, mode: str, top_k: int) -> list[dict]:
+        """
+        Exact top-k from the in-process session index when the session fits
+        in memory, otherwise a filtered Qdrant search.
+        """
+        if session_index is not None:
+            vectors = await session_index.get((self.tier, mode, session_id), self.qdrant)
+            if vectors is not None:
+                if len(vectors) * len(query_vec) <= INLINE_SEARCH_CELLS:
+                    hits = vectors.search(query_vec, top_k)
+                else:
+                    hits = await run_in_thread("search", vectors.search, query_vec, top_k)
+                return [make_chunk(*hit) for hit in hits]
 
-        all_chunks = {c["text"]: c for c in semantic_chunks + keyword_chunks}
-        return list(all_chunks.values())
+        hits = await run_in_thread(
+            "search",
+            self.qdrant.search,
+            query_embedding=query_vec,
+            top_k=top_k,
+            filters={"session_id": session_id, "mode": mode}
+        )
+        return [make_chunk(str(hit.id), hit.score, hit.payload) for hit in hits]
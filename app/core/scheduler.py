@@ -0,0 +1,163 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from app.config import Config
+from app.core import metrics
+from app.core.executor import MS_BUCKETS
+
+
+class Overloaded(Exception):
+    """
+    Raised instead of queueing work that would wait too long; the API
+    turns it into a 429 with Retry-After.
+    """
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class FairClock:
+    """
+    Start-time fair queueing tags. Ordering waiting work by `tag` gives each
+    tier a share of service proportional to its weight while it has work
+    queued; an idle tier doesn't bank credit for later.
+    """
+
+    def __init__(self, weights: dict[str, float]):
+        self.weights = weights
+        self.vtime = 0.0
+        self._finish: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def tag(self, tier: str, cost: float = 1.0) -> float:
+        with self._lock:
+            start = max(self.vtime, self._finish.get(tier, 0.0))
+            self._finish[tier] = start + cost / max(self.weights.get(tier, 1.0), 1e-6)
+            return start
+
+    def advance(self, tag: float):
+        # Called when work with this tag starts being served
+        with self._lock:
+            self.vtime = max(self.vtime, tag)
+
+
+class TierScheduler:
+    """
+    Shares `capacity` request slots between tiers served by one process.
+    A tier never holds more than its quota, so free traffic can't occupy
+    every slot; freed slots go to the waiting request with the lowest fair
+    tag (weighted-fair between tiers, FIFO within one). A tier with
+    `queue_limits[tier]` requests already waiting is shed at once, and a
+    request that waits longer than `timeout` gives up, both as Overloaded.
+    """
+
+    def __init__(self, capacity: int, quotas: dict[str, int], weights: dict[str, float],
+                 queue_limits: dict[str, int], timeout: float):
+        self.capacity = capacity
+        self.quotas = quotas
+        self.queue_limits = queue_limits
+        self.timeout = timeout
+        self.clock = FairClock(weights)
+        self.active: dict[str, int] = {tier: 0 for tier in quotas}
+        self.admitted: dict[str, int] = {tier: 0 for tier in quotas}
+        self.shed: dict[str, int] = {tier: 0 for tier in quotas}
+        self.timed_out: dict[str, int] = {tier: 0 for tier in quotas}
+        self._waiters: dict[str, deque[tuple[float, asyncio.Future]]] = {tier: deque() for tier in quotas}
+        self.wait_ms = {tier: metrics.Histogram(MS_BUCKETS) for tier in quotas}
+
+    def _free(self) -> int:
+        return self.capacity - sum(self.active.values())
+
+    def _can_run(self, tier: str) -> bool:
+        return self.active[tier] < self.quotas[tier]
+
+    def _grant(self, tier: str, tag: float):
+        self.active[tier] += 1
+        self.admitted[tier] += 1
+        self.clock.advance(tag)
+
+    def _dispatch(self):
+        while self._free() > 0:
+            ready = [t for t, q in self._waiters.items() if q and self._can_run(t)]
+            if not ready:
+                return
+            tier = min(ready, key=lambda t: self._waiters[t][0][0])
+            tag, waiter = self._waiters[tier].popleft()
+            if not waiter.done():
+                self._grant(tier, tag)
+                waiter.set_result(None)
+
+    async def acquire(self, tier: str):
+        t = time.perf_counter()
+        waiting = self._waiters[tier]
+        # After every dispatch no waiter is eligible for a free slot, so a
+        # free slot within quota means nobody of this tier is queued ahead
+        if self._free() > 0 and self._can_run(tier):
+            self._grant(tier, self.clock.tag(tier))
+        else:
+            if len(waiting) >= self.queue_limits.get(tier, 0):
+                self.shed[tier] += 1
+                raise Overloaded(f"Too many queued {tier} requests, retry shortly.")
+            entry = (self.clock.tag(tier), asyncio.get_running_loop().create_future())
+            waiting.append(entry)
+            try:
+                await asyncio.wait_for(asyncio.shield(entry[1]), self.timeout)
+            except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+                if entry[1].done() and not entry[1].cancelled():
+                    # Granted just as we gave up: hand the slot on
+                    self.release(tier)
+                else:
+                    entry[1].cancel()
+                    try:
+                        waiting.remove(entry)
+                    except ValueError:
+                        pass
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timed_out[tier] += 1
+                    raise Overloaded(f"Timed out waiting for a {tier} slot, retry shortly.", retry_after=self.timeout) from None
+                raise
+        self.wait_ms[tier].observe((time.perf_counter() - t) * 1000)
+
+    def release(self, tier: str):
+        self.active[tier] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, tier: str):
+        await self.acquire(tier)
+        try:
+            yield
+        finally:
+            self.release(tier)
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "tiers": {
+                tier: {
+                    "quota": self.quotas[tier],
+                    "weight": self.clock.weights.get(tier, 1.0),
+                    "active": self.active[tier],
+                    "waiting": len(self._waiters[tier]),
+                    "admitted": self.admitted[tier],
+                    "shed": self.shed[tier],
+                    "timed_out": self.timed_out[tier],
+                    "queue_wait_ms": self.wait_ms[tier].snapshot(),
+                }
+                for tier in self.quotas
+            },
+        }
+
+
+scheduler = TierScheduler(
+    capacity=Config.REQUEST_CONCURRENCY,
+    quotas=Config.TIER_CONCURRENCY,
+    weights=Config.TIER_WEIGHTS,
+    queue_limits=Config.TIER_QUEUE_LIMITS,
+    timeout=Config.QUEUE_TIMEOUT
+)
+metrics.register("tier_scheduler", scheduler.stats)
@@ -0,0 +1,196 @@
+import asyncio
+import threading
+import time
+import numpy as np
+
+from app.config import Config
+from app.core import metrics
+from app.core.executor import run_in_thread
+from app.core.lru_cache import TTLCache
+
+# Stored instead of vectors for sessions over SESSION_INDEX_MAX_CHUNKS
+TOO_LARGE = object()
+
+
+class SessionVectors:
+    """
+    All chunk vectors of one (tier, mode, session), L2-normalised in one
+    float32 matrix so exact cosine top-k is a single matmul. Rows are
+    keyed by chunk id; re-adding an id overwrites its row.
+    """
+
+    def __init__(self):
+        self._matrix: np.ndarray | None = None
+        self._size = 0
+        self.ids: list[str] = []
+        self.payloads: list[dict] = []
+        self._rows: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, ids: list[str], vectors, payloads: list[dict]):
+        if not ids:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.empty((max(64, len(ids)), vectors.shape[1]), dtype=np.float32)
+            for chunk_id, vector, payload in zip(ids, vectors, payloads):
+                row = self._rows.get(chunk_id)
+                if row is None:
+                    if self._size == len(self._matrix):
+                        # Grow geometrically so appends stay amortised O(1)
+                        grown = np.empty((2 * len(self._matrix), self._matrix.shape[1]), dtype=np.float32)
+                        grown[:self._size] = self._matrix[:self._size]
+                        self._matrix = grown
+                    row = self._rows[chunk_id] = self._size
+                    self._size += 1
+                    self.ids.append(chunk_id)
+                    self.payloads.append(payload)
+                else:
+                    self.payloads[row] = payload
+                self._matrix[row] = vector
+
+    def search(self, query_vec, top_k: int) -> list[tuple[str, float, dict]]:
+        """
+        Exact cosine top-k as (chunk id, score, payload), best first.
+        """
+        with self._lock:
+            size = self._size
+            if size == 0 or top_k <= 0:
+                return []
+            matrix = self._matrix[:size]
+            ids, payloads = self.ids[:size], self.payloads[:size]
+
+        query = np.asarray(query_vec, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        scores = matrix @ query
+        if top_k < size:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+        return [(ids[i], float(scores[i]), payloads[i]) for i in top]
+
+
+class SessionIndex:
+    """
+    LRU of SessionVectors keyed by (tier, mode, session_id). A session is
+    loaded from Qdrant with one scroll on first use (query or ingest) and
+    kept current by ingestion afterwards; Qdrant remains the durable store
+    and the fallback when a session isn't (or can't be) held in memory.
+    """
+
+    def __init__(self, max_sessions: int, ttl_seconds: float, max_chunks: int):
+        self.sessions = TTLCache(max_entries=max_sessions, ttl_seconds=ttl_seconds)
+        self.max_chunks = max_chunks
+        self._loading: dict[tuple, asyncio.Future] = {}
+        # Adds that arrive while a session is being loaded, replayed on install
+        self._pending: dict[tuple, list] = {}
+        self.loads = 0
+        self.load_failures = 0
+        self.load_seconds = 0.0
+        self.too_large = 0
+
+    async def get(self, key: tuple, qdrant) -> SessionVectors | None:
+        """
+        The session's vectors, loading them from `qdrant` if needed.
+        None means the caller should search Qdrant instead.
+        """
+        vectors = self.sessions.get(key)
+        if vectors is not None:
+            return None if vectors is TOO_LARGE else vectors
+
+        # Concurrent first queries share a single scroll
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(key, qdrant))
+            self._loading[key] = loading
+            loading.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await asyncio.shield(loading)
+
+    async def _load(self, key: tuple, qdrant) -> SessionVectors | None:
+        _, mode, session_id = key
+        t = time.perf_counter()
+        self._pending[key] = []
+        try:
+            points = await run_in_thread(
+                "search",
+                qdrant.scroll_points,
+                filters={"session_id": session_id, "mode": mode},
+                max_points=self.max_chunks + 1
+            )
+        except Exception as e:
+            self.load_failures += 1
+            print(f"⚠️ Could not load session index for {key}: {e}")
+            return None
+        finally:
+            # Everything below runs without awaiting, so no add can slip in
+            # between replaying the buffer and installing the session
+            pending = self._pending.pop(key, [])
+
+        if len(points) > self.max_chunks:
+            self.too_large += 1
+            self.sessions.put(key, TOO_LARGE)
+            return None
+
+        vectors = SessionVectors()
+        vectors.add(
+            [str(point.id) for point in points],
+            [point.vector for point in points],
+            [point.payload for point in points]
+        )
+        # Chunks written while the scroll ran (re-adding an id just overwrites it)
+        for ids, embeddings, payloads in pending:
+            vectors.add(ids, embeddings, payloads)
+        if len(vectors) > self.max_chunks:
+            self.too_large += 1
+            self.sessions.put(key, TOO_LARGE)
+            return None
+        self.sessions.put(key, vectors)
+        self.loads += 1
+        self.load_seconds += time.perf_counter() - t
+        return vectors
+
+    def add(self, key: tuple, ids: list[str], embeddings, payloads: list[dict]):
+        """
+        Adds freshly written chunks to a loaded session (or buffers them
+        for one being loaded). Sessions that aren't loaded pick them up
+        from Qdrant on their first query. Must be called on the event loop.
+        """
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.append((ids, embeddings, payloads))
+            return
+        vectors = self.sessions.get(key)
+        if not isinstance(vectors, SessionVectors):
+            return
+        vectors.add(ids, embeddings, payloads)
+        if len(vectors) > self.max_chunks:
+            self.too_large += 1
+            self.sessions.put(key, TOO_LARGE)
+
+    def stats(self) -> dict:
+        return {
+            **self.sessions.stats(),
+            "vectors": sum(len(v) for v in self.sessions.values() if isinstance(v, SessionVectors)),
+            "loads": self.loads,
+            "load_failures": self.load_failures,
+            "avg_load_ms": round(self.load_seconds / self.loads * 1000, 1) if self.loads else 0.0,
+            "too_large": self.too_large,
+        }
+
+
+session_index = SessionIndex(
+    max_sessions=Config.SESSION_INDEX_MAX_SESSIONS,
+    ttl_seconds=Config.SESSION_INDEX_TTL,
+    max_chunks=Config.SESSION_INDEX_MAX_CHUNKS
+) if Config.SESSION_INDEX_MAX_SESSIONS > 0 else None
+
+if session_index is not None:
+    metrics.register("session_index", session_index.stats)
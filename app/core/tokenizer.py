@@ -0,0 +1,110 @@
+import functools
+import threading
+from typing import Callable
+
+from app.config import Config
+from app.core.executor import run_in_thread
+
+_counters: dict[str, "TokenCounter"] = {}
+_lock = threading.Lock()
+
+
+def heuristic_count(text: str) -> int:
+    # Old approximation (1 token ≈ 4 chars); only used when no tokenizer is available
+    return max(1, len(text) // 4)
+
+
+class TokenCounter:
+    """
+    Counts tokens with a real tokenizer. `count` is memoised so repeated
+    texts (e.g. overlap sentences, popular chunks) are only tokenized once;
+    `count_batch` tokenizes a whole document's pieces in one call.
+    """
+
+    def __init__(self, name: str, lengths: Callable[[list[str]], list[int]], max_length: int | None = None):
+        self.name = name
+        self._lengths = lengths
+        self.max_length = max_length
+        self.count = functools.lru_cache(maxsize=Config.TOKEN_COUNT_CACHE_SIZE)(self._count)
+
+    def _count(self, text: str) -> int:
+        return self._lengths([text])[0]
+
+    def count_batch(self, texts: list[str]) -> list[int]:
+        if not texts:
+            return []
+        return self._lengths(texts)
+
+
+def _hf_counter(model_name: str) -> TokenCounter:
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+    # Rust fast tokenizers raise "Already borrowed" when shared across threads
+    tokenizer_lock = threading.Lock()
+
+    def lengths(texts: list[str]) -> list[int]:
+        with tokenizer_lock:
+            encoded = tokenizer(texts, add_special_tokens=False, return_attention_mask=False, verbose=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    # model_max_length is a huge sentinel when the checkpoint doesn't set it
+    max_length = tokenizer.model_max_length if tokenizer.model_max_length < 100_000 else None
+    return TokenCounter(model_name, lengths, max_length=max_length)
+
+
+def _tiktoken_counter(encoding_name: str) -> TokenCounter:
+    import tiktoken
+
+    encoding = tiktoken.get_encoding(encoding_name)
+
+    def lengths(texts: list[str]) -> list[int]:
+        return [len(ids) for ids in encoding.encode_ordinary_batch(texts)]
+
+    return TokenCounter(f"tiktoken:{encoding_name}", lengths)
+
+
+def _heuristic_counter(name: str) -> TokenCounter:
+    return TokenCounter(name, lambda texts: [heuristic_count(t) for t in texts])
+
+
+def _get(key: str, factory: Callable[[], TokenCounter]) -> TokenCounter:
+    counter = _counters.get(key)
+    if counter is None:
+        with _lock:
+            counter = _counters.get(key)
+            if counter is None:
+                try:
+                    counter = factory()
+                except Exception as e:
+                    print(f"⚠️ Tokenizer '{key}' unavailable, falling back to len/4 estimate: {e}")
+                    counter = _heuristic_counter(key)
+                _counters[key] = counter
+    return counter
+
+
+def embedding_token_counter(model_name: str) -> TokenCounter:
+    """
+    Counter matching the embedding model's own tokenizer (chunk sizing).
+    """
+    return _get(model_name, lambda: _hf_counter(model_name))
+
+
+def llm_token_counter() -> TokenCounter:
+    """
+    Counter for LLM context budgets (Config.TOKEN_LIMITS). One tiktoken
+    encoding stands in for every tier's model, whose own tokenizers differ;
+    Config.CONTEXT_SAFETY_MARGIN absorbs the difference.
+    """
+    return _get(f"tiktoken:{Config.LLM_TOKENIZER}", lambda: _tiktoken_counter(Config.LLM_TOKENIZER))
+
+
+async def llm_token_counter_async() -> TokenCounter:
+    """
+    llm_token_counter() for the event loop: the first call loads the BPE
+    ranks (possibly downloading them) off the loop.
+    """
+    counter = _counters.get(f"tiktoken:{Config.LLM_TOKENIZER}")
+    if counter is not None:
+        return counter
+    return await run_in_thread("model_load", llm_token_counter)
@@ -1,36 +1,84 @@
+# Imported first so startup time is measured from here
+from app.core.model_manager import model_manager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-import os
+import functools
 
+from app.config import Config, validate_tiers
 from app.api.routes import router as api_router
-from app.core.embedder import Embedder
+from app.api.admission import UploadSizeLimit, overloaded_response
+from app.core.embedder import Embedder, resolve_model, model_id
+from app.core import reranker
+from app.services.service_registry import ServiceRegistry
+from app.core.llm_client import open_http_client, close_http_client
+from app.core.tokenizer import llm_token_counter
+from app.core.ingestion import IngestionManager
+from app.core import executor
+from app.core.scheduler import Overloaded
 
-# Read allowed tiers from environment variable
-TIERS_TO_LOAD = os.getenv("ASKLYNE_TIERS", "free").split(",")
+# Every tier is served by this process; requests pick theirs via Config.TIER_HEADER
+TIERS_TO_LOAD = Config.ASKLYNE_TIERS
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print(f"[Startup] Preloading embedding models for: {TIERS_TO_LOAD}")
-
-    for tier in TIERS_TO_LOAD:
-        for mode in ["text", "code"]:
-            try:
-                print(f"▶ Preloading embedder: {tier}/{mode}")
-                Embedder(tier=tier, mode=mode)
-                print(f"✅ Done: {tier}/{mode}")
-            except Exception as e:
-                print(f"⚠️ Failed to preload embedder for {tier}/{mode}: {e}")
-
-    print("[Startup] Embedding model loading complete.")
+    # Fail fast on tiers without scheduler/budget settings
+    validate_tiers(TIERS_TO_LOAD)
+
+    # Shared Qdrant/keyword-search clients, connected (and schemas checked) off
+    # the event loop during warmup; until then their routes answer 503
+    registry = ServiceRegistry(TIERS_TO_LOAD)
+    app.state.registry = registry
+
+    # Long-lived pooled HTTP client for the LLM endpoint
+    open_http_client()
+
+    # Event-loop lag probe, reported under /metrics
+    executor.loop_monitor.start()
+
+    # Background ingestion workers behind /upload-file
+    ingestion = IngestionManager(registry)
+    ingestion.start()
+    app.state.ingestion = ingestion
+
+    # Models load on first use. With MODEL_LOAD_POLICY=eager they are also
+    # warmed up in parallel in the background; the server is live at once
+    # and /readyz reports ready once every warmup loader has succeeded.
+    # Query routes answer 503 until the models they need are loaded.
+    # The LLM tokenizer is small and needed by every query, so it is always warmed
+    warmup = {"service_registry": registry.startup, "llm_tokenizer": llm_token_counter}
+    if Config.MODEL_LOAD_POLICY == "eager":
+        print(f"[Startup] Warming up models for: {TIERS_TO_LOAD}")
+        # Tiers sharing a model (e.g. free/plus text) share one instance, so
+        # warm each distinct model once
+        for tier in TIERS_TO_LOAD:
+            for mode in ["text", "code"]:
+                name = f"embedder:{model_id(*resolve_model(tier, mode))}"
+                warmup.setdefault(name, functools.partial(Embedder, tier=tier, mode=mode))
+        # One shared cross-encoder for every reranking tier
+        warmup["reranker"] = functools.partial(reranker.preload, TIERS_TO_LOAD)
+    model_manager.start_warmup(warmup)
+
     yield
 
+    await model_manager.stop()
+    await ingestion.stop()
+    await executor.loop_monitor.stop()
+    executor.shutdown()
+    await close_http_client()
+    registry.close()
+
 app = FastAPI(
     title="Asklyne API",
     version="0.1.0",
     lifespan=lifespan
 )
 
+# Oversized uploads are refused from their Content-Length, before the body is read
+app.add_middleware(UploadSizeLimit)
+
+# Added last so CORS wraps the early 413s too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -39,6 +87,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Rate limiting in dependencies sheds with the same {"error": ...} 429 as the routes
+app.add_exception_handler(Overloaded, lambda request, e: overloaded_response(e))
+
 app.include_router(api_router)
 
 @app.get("/")
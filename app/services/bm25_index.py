@@ -0,0 +1,282 @@
+# app/services/bm25_index.py
+
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from app.config import Config
+from app.services.keyword_backend import KeywordBackend
+from app.utils.chunk_ids import chunk_id
+
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    # snake_case identifiers are indexed whole and by part
+    terms = []
+    for word in WORD.findall(text.casefold()):
+        terms.append(word)
+        if "_" in word:
+            terms.extend(part for part in word.split("_") if part)
+    return terms
+
+
+class SessionPostings:
+    """
+    Inverted index over one (session, mode): term -> {doc: term frequency},
+    plus document lengths and stored fields. `lock` guards all of it;
+    `resident` turns False once the partition has been evicted and saved.
+    """
+
+    def __init__(self):
+        self.docs: dict[str, dict] = {}
+        self.lengths: dict[str, int] = {}
+        self.postings: dict[str, dict[str, int]] = {}
+        self.total_length = 0
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.resident = True
+
+    def add(self, doc_id: str, document: dict):
+        existing = self.docs.get(doc_id)
+        if existing is not None:
+            if existing.get("text") == document.get("text"):
+                self.docs[doc_id] = document
+                self.dirty = True
+                return
+            self.remove(doc_id)
+
+        terms = Counter(tokenize(document.get("text", "")))
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        length = sum(terms.values())
+        self.docs[doc_id] = document
+        self.lengths[doc_id] = length
+        self.total_length += length
+        self.dirty = True
+
+    def remove(self, doc_id: str):
+        document = self.docs.pop(doc_id)
+        for term in set(tokenize(document.get("text", ""))):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.lengths.pop(doc_id)
+        self.dirty = True
+
+    def search(self, terms: list[str], top_k: int, k1: float, b: float) -> list[tuple[float, str]]:
+        n = len(self.docs)
+        if not n or not terms:
+            return []
+        avg_length = self.total_length / n or 1.0
+        scores: dict[str, float] = {}
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for doc_id, tf in postings.items():
+                norm = k1 * (1 - b + b * self.lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, ((score, doc_id) for doc_id, score in scores.items()))
+
+    def to_snapshot(self, session_id: str, mode: str) -> dict:
+        return {
+            "session_id": session_id,
+            "mode": mode,
+            "docs": self.docs,
+            "lengths": self.lengths,
+            "postings": self.postings,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: dict) -> "SessionPostings":
+        postings = cls()
+        postings.docs = data["docs"]
+        postings.lengths = data["lengths"]
+        postings.postings = data["postings"]
+        postings.total_length = sum(postings.lengths.values())
+        return postings
+
+
+class Bm25Index(KeywordBackend):
+    """
+    Embedded keyword backend: BM25 over per-session postings, held in
+    memory (LRU over sessions) and snapshotted to one JSON file per
+    (session, mode) under BM25_DIR. Adds are incremental; snapshots are
+    written on flush() and when a modified session is evicted.
+
+    `_lock` only guards the LRU bookkeeping. Snapshot reads and writes run
+    under a per-(session, mode) lock and scoring under the partition's own
+    lock, so one session's disk I/O never stalls another session's search.
+    """
+
+    def __init__(self, tier: str, root: str | None = Config.BM25_DIR, max_sessions: int = Config.BM25_MAX_SESSIONS):
+        self.tier = tier.lower()
+        self.root = os.path.join(root, self.tier) if root else None
+        self.max_sessions = max_sessions
+        self.k1 = Config.BM25_K1
+        self.b = Config.BM25_B
+        self._sessions: OrderedDict[tuple[str, str], SessionPostings] = OrderedDict()
+        # Evicted partitions whose snapshot has not been written yet
+        self._evicting: dict[tuple[str, str], SessionPostings] = {}
+        self._key_locks: dict[tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        if self.root:
+            os.makedirs(self.root, exist_ok=True)
+
+    def ensure_collection_exists(self):
+        pass
+
+    def path(self, session_id: str, mode: str) -> str:
+        # session_id is client-supplied: hash it so distinct ids never share a file
+        digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, f"{digest}.{mode}.json")
+
+    def _key_lock(self, key: tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _resident(self, key: tuple[str, str]) -> SessionPostings | None:
+        with self._lock:
+            postings = self._sessions.get(key)
+            if postings is not None:
+                self._sessions.move_to_end(key)
+            return postings
+
+    def _postings(self, session_id: str, mode: str) -> SessionPostings:
+        key = (session_id, mode)
+        postings = self._resident(key)
+        if postings is not None:
+            return postings
+
+        with self._key_lock(key):
+            postings = self._resident(key)
+            if postings is not None:
+                return postings
+            with self._lock:
+                # Evicted but not saved yet: the in-memory copy is the newest
+                postings = self._evicting.pop(key, None)
+            if postings is None:
+                postings = self._load(session_id, mode)
+            with self._lock:
+                self._sessions[key] = postings
+                evicted = []
+                while len(self._sessions) > self.max_sessions:
+                    evicted_key, evicted_postings = self._sessions.popitem(last=False)
+                    self._evicting[evicted_key] = evicted_postings
+                    evicted.append((evicted_key, evicted_postings))
+
+        for evicted_key, evicted_postings in evicted:
+            self._retire(evicted_key, evicted_postings)
+        return postings
+
+    def _load(self, session_id: str, mode: str) -> SessionPostings:
+        postings = SessionPostings()
+        if self.root:
+            try:
+                with open(self.path(session_id, mode), "r") as f:
+                    data = json.load(f)
+                if data.get("session_id") != session_id or data.get("mode") != mode:
+                    raise ValueError("snapshot belongs to another session")
+                postings = SessionPostings.from_snapshot(data)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError) as e:
+                print(f"⚠️ Ignoring unreadable BM25 snapshot for {session_id}/{mode}: {e}")
+        return postings
+
+    def _retire(self, key: tuple[str, str], postings: SessionPostings):
+        # Holds the key lock so a reload of `key` waits for this snapshot
+        with self._key_lock(key):
+            with self._lock:
+                if self._evicting.get(key) is not postings:
+                    # Reloaded before we got here; it is resident again
+                    return
+            with postings.lock:
+                postings.resident = False
+                self._save(key, postings)
+            with self._lock:
+                del self._evicting[key]
+
+    def _save(self, key: tuple[str, str], postings: SessionPostings):
+        """
+        Writes the snapshot; callers hold postings.lock.
+        """
+        if not self.root or not postings.dirty:
+            return
+        path = self.path(*key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(postings.to_snapshot(*key), f)
+            os.replace(tmp_path, path)
+            postings.dirty = False
+        except OSError as e:
+            print(f"⚠️ Could not write BM25 snapshot for {key}: {e}")
+
+    def upsert_chunks(self, chunks: list[str], session_id: str, mode: str, ids: list[str] = None, metadata: list[dict] = None):
+        ids = ids or [chunk_id(session_id, mode, chunk) for chunk in chunks]
+        metadata = metadata or [{} for _ in chunks]
+        while True:
+            postings = self._postings(session_id, mode)
+            with postings.lock:
+                if not postings.resident:
+                    # Evicted and saved between lookup and lock; reload it
+                    continue
+                for i, chunk in enumerate(chunks):
+                    postings.add(ids[i], {
+                        "id": ids[i],
+                        "text": chunk,
+                        "mode": mode,
+                        "tier": self.tier,
+                        "session_id": session_id,
+                        **metadata[i]
+                    })
+                break
+        print(f"✅ Indexed {len(chunks)} chunks in BM25 ({self.tier})")
+
+    def search(self, query: str, top_k: int = 5, filters: dict = None) -> list[dict]:
+        filters = dict(filters or {})
+        session_id = filters.pop("session_id", None)
+        mode = filters.pop("mode", None)
+        terms = tokenize(query)
+
+        if session_id is not None and mode is not None:
+            partitions = [self._postings(session_id, mode)]
+        else:
+            with self._lock:
+                partitions = [
+                    p for (s, m), p in self._sessions.items()
+                    if session_id in (None, s) and mode in (None, m)
+                ]
+        scored = []
+        # Other filters are checked on stored fields, so over-fetch a little
+        limit = top_k * 4 if filters else top_k
+        for postings in partitions:
+            with postings.lock:
+                for score, doc_id in postings.search(terms, limit, self.k1, self.b):
+                    document = postings.docs[doc_id]
+                    if all(document.get(k) == v for k, v in filters.items()):
+                        scored.append((score, doc_id, document))
+
+        return [{**document, "score": score} for score, _, document in heapq.nlargest(top_k, scored, key=lambda s: s[0])]
+
+    def flush(self):
+        with self._lock:
+            resident = list(self._sessions.items())
+        for key, postings in resident:
+            with postings.lock:
+                if postings.resident:
+                    self._save(key, postings)
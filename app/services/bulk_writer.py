@@ -0,0 +1,121 @@
+# app/services/bulk_writer.py
+
+import asyncio
+import time
+from typing import TYPE_CHECKING
+
+from app.config import Config
+from app.core import metrics
+from app.core.executor import run_in_thread
+from app.services.keyword_backend import KeywordBackend
+from app.utils.chunk_ids import chunk_id
+
+# Only needed for annotations, so stand-in stores work without qdrant_client
+if TYPE_CHECKING:
+    from app.services.qdrant_service import QdrantService
+
+
+class WriteStats:
+    def __init__(self):
+        self.chunks = 0
+        self.batches = 0
+        self.retries = 0
+        self.failures = 0
+        self.seconds = 0.0
+        self.last_chunks_per_sec = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "chunks": self.chunks,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failures": self.failures,
+            "chunks_per_sec": round(self.chunks / self.seconds, 1) if self.seconds else 0.0,
+            "last_chunks_per_sec": round(self.last_chunks_per_sec, 1),
+        }
+
+
+stats = WriteStats()
+metrics.register("bulk_writer", stats.snapshot)
+
+
+class BulkWriter:
+    """
+    Writes chunks to Qdrant and the keyword backend with deterministic ids.
+    Each store gets its own batch size; all batches of both stores run
+    concurrently (bounded by the 'upsert' stage limit) and failed batches
+    are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        qdrant: "QdrantService",
+        keyword: KeywordBackend,
+        qdrant_batch_size: int = Config.QDRANT_BATCH_SIZE,
+        keyword_batch_size: int = Config.KEYWORD_BATCH_SIZE,
+        retries: int = Config.WRITE_RETRIES,
+    ):
+        self.qdrant = qdrant
+        self.keyword = keyword
+        self.qdrant_batch_size = qdrant_batch_size
+        self.keyword_batch_size = keyword_batch_size
+        self.retries = retries
+
+    async def write(self, chunks: list[str], embeddings: list[list[float]], session_id: str, mode: str, metadata: list[dict] = None) -> list[str]:
+        """
+        Upserts chunks to both stores and returns their ids.
+        `metadata` holds extra per-chunk payload fields (e.g. token counts).
+        """
+        if not chunks:
+            return []
+        t = time.perf_counter()
+        ids = [chunk_id(session_id, mode, chunk) for chunk in chunks]
+        metadata = metadata or [{} for _ in chunks]
+
+        tasks = []
+        for start in range(0, len(chunks), self.qdrant_batch_size):
+            end = start + self.qdrant_batch_size
+            tasks.append(self._with_retry(
+                self.qdrant.upsert_chunks,
+                chunks=chunks[start:end],
+                embeddings=embeddings[start:end],
+                session_id=session_id,
+                mode=mode,
+                ids=ids[start:end],
+                metadata=metadata[start:end]
+            ))
+        for start in range(0, len(chunks), self.keyword_batch_size):
+            end = start + self.keyword_batch_size
+            tasks.append(self._with_retry(
+                self.keyword.upsert_chunks,
+                chunks=chunks[start:end],
+                session_id=session_id,
+                mode=mode,
+                ids=ids[start:end],
+                metadata=metadata[start:end]
+            ))
+        await asyncio.gather(*tasks)
+
+        elapsed = time.perf_counter() - t
+        stats.chunks += len(chunks)
+        stats.seconds += elapsed
+        stats.last_chunks_per_sec = len(chunks) / elapsed if elapsed else 0.0
+        return ids
+
+    async def flush(self):
+        await run_in_thread("upsert", self.keyword.flush)
+
+    async def _with_retry(self, fn, **kwargs):
+        for attempt in range(self.retries + 1):
+            try:
+                result = await run_in_thread("upsert", fn, **kwargs)
+                stats.batches += 1
+                return result
+            except Exception as e:
+                if attempt == self.retries:
+                    stats.failures += 1
+                    raise
+                stats.retries += 1
+                delay = Config.WRITE_RETRY_BACKOFF * (2 ** attempt)
+                print(f"⚠️ {fn.__qualname__} batch failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
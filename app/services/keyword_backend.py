@@ -0,0 +1,46 @@
+# app/services/keyword_backend.py
+
+from abc import ABC, abstractmethod
+
+from app.config import Config
+
+
+class KeywordBackend(ABC):
+    """
+    Keyword (full-text) search over chunks, one instance per tier.
+    Hits are flat dicts: the stored document fields plus "id" and a
+    backend-native "score", best first.
+    """
+
+    def ensure_collection_exists(self):
+        pass
+
+    @abstractmethod
+    def upsert_chunks(self, chunks: list[str], session_id: str, mode: str, ids: list[str] = None, metadata: list[dict] = None):
+        ...
+
+    @abstractmethod
+    def search(self, query: str, top_k: int = 5, filters: dict = None) -> list[dict]:
+        ...
+
+    def flush(self):
+        """
+        Persists buffered writes (end of an ingestion job, shutdown).
+        """
+        pass
+
+    def close(self):
+        self.flush()
+
+
+def get_keyword_backend(tier: str) -> KeywordBackend:
+    """
+    Builds the backend selected by Config.KEYWORD_BACKEND.
+    """
+    if Config.KEYWORD_BACKEND == "bm25":
+        from app.services.bm25_index import Bm25Index
+        return Bm25Index(tier=tier)
+    if Config.KEYWORD_BACKEND == "typesense":
+        from app.services.typesense_service import TypesenseService
+        return TypesenseService(tier=tier)
+    raise ValueError(f"Unknown keyword backend: {Config.KEYWORD_BACKEND}")
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+
+from app.config import Config
+from app.core import metrics
+from app.core.executor import run_in_thread
+
+# Bump when the HTML template changes so cached PDFs are re-rendered
+TEMPLATE_VERSION = "1"
+
+NOTES_TEMPLATE = """
+<html>
+<head>
+    <style>
+        body {{
+            font-family: 'Segoe UI', sans-serif;
+            font-size: 16px;
+            line-height: 1.7;
+            padding: 40px;
+            background-color: #ffffff;
+        }}
+        h1, h2, h3 {{
+            color: #1a237e;
+        }}
+        ul {{
+            margin-bottom: 1em;
+        }}
+        li {{
+            margin-bottom: 0.4em;
+        }}
+    </style>
+</head>
+<body>{html}</body>
+</html>
+"""
+
+
+def render_pdf_file(md_content: str, path: str):
+    """
+    markdown -> HTML -> PDF (wkhtmltopdf via pdfkit), written to a temp file
+    beside `path` and renamed into place, so readers never see a partial PDF.
+    """
+    import markdown2
+    import pdfkit
+
+    styled_html = NOTES_TEMPLATE.format(html=markdown2.markdown(md_content))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path[:-len('.pdf')]}.{uuid.uuid4().hex}.tmp.pdf"
+    try:
+        pdfkit.from_string(styled_html, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class PdfRenderer:
+    """
+    Renders notes to PDF at content-addressed paths under `root`
+    ({hash[:2]}/{hash}.pdf). Identical markdown is rendered once: later
+    requests reuse the file, and concurrent requests for the same content
+    share a single render. Renders run on the bounded "pdf_render" stage.
+    """
+
+    def __init__(self, root: str, max_files: int):
+        self.root = root
+        self.max_files = max_files
+        self._rendering: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.renders = 0
+        self.failures = 0
+        self.render_seconds = 0.0
+        self.pruned = 0
+
+    @staticmethod
+    def content_key(md_content: str) -> str:
+        return hashlib.sha256(f"{TEMPLATE_VERSION}\0{md_content}".encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.pdf")
+
+    async def render(self, md_content: str) -> str:
+        """
+        Path of the rendered PDF for `md_content`, rendering it if needed.
+        """
+        key = self.content_key(md_content)
+        path = self.path_for(key)
+        if os.path.exists(path):
+            self.hits += 1
+            # mtime doubles as last-used time for pruning
+            await run_in_thread("session_io", os.utime, path)
+            return path
+
+        rendering = self._rendering.get(key)
+        if rendering is None:
+            self.misses += 1
+            rendering = asyncio.ensure_future(self._render(md_content, path))
+            self._rendering[key] = rendering
+            rendering.add_done_callback(lambda _: self._rendering.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(rendering)
+
+    async def _render(self, md_content: str, path: str) -> str:
+        t = time.perf_counter()
+        try:
+            await run_in_thread("pdf_render", render_pdf_file, md_content, path)
+        except Exception:
+            self.failures += 1
+            raise
+        self.renders += 1
+        self.render_seconds += time.perf_counter() - t
+        if self.max_files > 0:
+            await run_in_thread("session_io", self.prune)
+        return path
+
+    def prune(self):
+        """
+        Deletes the least recently used PDFs beyond `max_files`.
+        """
+        files = []
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(".pdf") and ".tmp." not in name:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        files.append((os.path.getmtime(path), path))
+                    except OSError:
+                        pass
+        if len(files) <= self.max_files:
+            return
+        files.sort()
+        for _, path in files[:len(files) - self.max_files]:
+            try:
+                os.remove(path)
+                self.pruned += 1
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "renders": self.renders,
+            "failures": self.failures,
+            "avg_render_ms": round(self.render_seconds / self.renders * 1000, 1) if self.renders else 0.0,
+            "pruned": self.pruned,
+        }
+
+
+pdf_renderer = PdfRenderer(root=Config.PDF_CACHE_DIR, max_files=Config.PDF_CACHE_MAX_FILES)
+metrics.register("pdf_render", pdf_renderer.stats)
@@ -2,9 +2,8 @@
 
 from qdrant_client import QdrantClient
 from qdrant_client.models import Distance, VectorParams, PointStruct, PayloadSchemaType, Filter, FieldCondition, MatchValue
-from sentence_transformers.util import cos_sim
 from app.config import Config
-from app.core.embedder import Embedder
+from app.utils.chunk_ids import chunk_id
 from typing import List
 import uuid
 
@@ -13,20 +12,23 @@ QDRANT_API_KEY = Config.QDRANT_API_KEY
 
 
 class QdrantService:
-    def __init__(self, tier: str, mode: str):
+    def __init__(self, tier: str, mode: str, ensure_schema: bool = True):
         self.tier = tier.lower()
         self.mode = mode.lower()
         self.collection_name = f"asklyne_chunks_{self.tier}_{self.mode}"
         self.vector_size = self.get_vector_size()
 
 
+        # One long-lived client per service instance; the underlying httpx pool
+        # keeps connections alive between requests.
         self.client = QdrantClient(
             url=QDRANT_HOST,
-            api_key=QDRANT_API_KEY
+            api_key=QDRANT_API_KEY,
+            timeout=Config.QDRANT_TIMEOUT
         )
 
-        self.embedder = Embedder(tier=self.tier)
-        self.ensure_collection_exists()
+        if ensure_schema:
+            self.ensure_collection_exists()
         
     def get_vector_size(self) -> int:
         # You can customize these as needed
@@ -62,7 +64,8 @@ class QdrantService:
                 "session_id": "keyword",
                 "mode": "keyword",
                 "tier": "keyword",
-                "text": "text"
+                "text": "text",
+                "symbol": "keyword"
             }
             for field, schema_type in index_fields.items():
                 try:
@@ -79,16 +82,19 @@ class QdrantService:
                         raise e
 
 
-    def upsert_chunks(self, chunks: list[str], embeddings: list[list[float]], session_id: str, mode: str):
+    def upsert_chunks(self, chunks: list[str], embeddings: list[list[float]], session_id: str, mode: str, ids: list[str] = None, metadata: list[dict] = None):
+        ids = ids or [chunk_id(session_id, mode, chunk) for chunk in chunks]
+        metadata = metadata or [{} for _ in chunks]
         payloads = [
             PointStruct(
-                id=i,
+                id=ids[i],
                 vector=embeddings[i],
                 payload={
                     "session_id": session_id,
                     "tier": self.tier,
                     "mode": mode,
                     "text": chunk,
+                    **metadata[i],
                 },
             )
             for i, chunk in enumerate(chunks)
@@ -96,18 +102,45 @@ class QdrantService:
 
         self.client.upsert(collection_name=self.collection_name, points=payloads)
         print(f"✅ Upserted {len(payloads)} chunks to {self.collection_name}")
-        print("✅ Chunk Payload:", payloads[0].payload)
 
 
-    def search(self, query_embedding, top_k=5, filters: dict = None):
-        query_filter = None
-        if filters:
-            query_filter = Filter(
-                must=[
-                    FieldCondition(key=key, match=MatchValue(value=val))
-                    for key, val in filters.items()
-                ]
+    @staticmethod
+    def build_filter(filters: dict = None):
+        if not filters:
+            return None
+        return Filter(
+            must=[
+                FieldCondition(key=key, match=MatchValue(value=val))
+                for key, val in filters.items()
+            ]
+        )
+
+    def scroll_points(self, filters: dict = None, max_points: int = None, batch_size: int = 256) -> list:
+        """
+        Pages through every point matching `filters` with vectors and payloads,
+        stopping once `max_points` have been collected.
+        """
+        points = []
+        offset = None
+        while True:
+            limit = batch_size if max_points is None else min(batch_size, max_points - len(points))
+            if limit <= 0:
+                break
+            page, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=self.build_filter(filters),
+                limit=limit,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
             )
+            points.extend(page)
+            if offset is None:
+                break
+        return points
+
+    def search(self, query_embedding, top_k=5, filters: dict = None):
+        query_filter = self.build_filter(filters)
 
         hits = self.client.search(
             collection_name=self.collection_name,
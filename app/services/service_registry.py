@@ -0,0 +1,130 @@
+# app/services/service_registry.py
+
+import asyncio
+import threading
+from typing import Any, Callable, Hashable
+
+from app.config import Config
+from app.core.executor import run_in_thread
+from app.services.qdrant_service import QdrantService
+from app.services.keyword_backend import KeywordBackend, get_keyword_backend
+from app.core.retriever import Retriever
+from app.services.bulk_writer import BulkWriter
+
+MODES = ["text", "code"]
+
+
+class ServiceUnavailable(Exception):
+    """
+    Raised by the registry accessors for a client that isn't connected
+    (still starting up, or its connection failed); the API turns it into a
+    503 with Retry-After.
+    """
+
+    def __init__(self, message: str, retry_after: float = 5.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ServiceRegistry:
+    """
+    Process-wide holder for the Qdrant and keyword-search services.
+    Clients are connected once, off the event loop, by `startup` (run in
+    the app lifespan's warmup) so every request reuses the same keep-alive
+    clients. The accessors never connect: a missing client raises
+    ServiceUnavailable, and one whose connection failed is retried in the
+    background.
+    """
+
+    def __init__(self, tiers: list[str]):
+        self.tiers = [t.strip().lower() for t in tiers if t.strip()]
+        self._qdrant: dict[tuple[str, str], QdrantService] = {}
+        self._keyword: dict[str, KeywordBackend] = {}
+        self._connecting: set[Hashable] = set()
+        self._lock = threading.Lock()
+        self.started = False
+
+    def startup(self):
+        """
+        Creates every (tier, mode) client and checks collections/indexes once.
+        Blocking; run it off the event loop.
+        """
+        for tier in self.tiers:
+            for mode in MODES:
+                try:
+                    self._connect(self._qdrant, (tier, mode), lambda: QdrantService(tier=tier, mode=mode))
+                    print(f"✅ Qdrant ready: {tier}/{mode}")
+                except Exception as e:
+                    print(f"⚠️ Failed to prepare Qdrant for {tier}/{mode}: {e}")
+            try:
+                self._connect(self._keyword, tier, lambda: get_keyword_backend(tier))
+                print(f"✅ Keyword backend ({Config.KEYWORD_BACKEND}) ready: {tier}")
+            except Exception as e:
+                print(f"⚠️ Failed to prepare keyword backend for {tier}: {e}")
+        self.started = True
+
+    def _connect(self, services: dict, key: Hashable, build: Callable[[], Any]):
+        with self._lock:
+            if key in services:
+                return
+        service = build()
+        with self._lock:
+            services.setdefault(key, service)
+
+    def _get(self, services: dict, key: Hashable, build: Callable[[], Any], name: str):
+        service = services.get(key)
+        if service is not None:
+            return service
+        if not self.started:
+            raise ServiceUnavailable(f"{name} is starting up, retry shortly.")
+        if key not in self._connecting:
+            # Reconnect in the background; this request is answered with a 503
+            self._connecting.add(key)
+            task = asyncio.ensure_future(run_in_thread("connect", self._connect, services, key, build))
+            task.add_done_callback(lambda t: self._connected(key, t))
+        raise ServiceUnavailable(f"{name} is unavailable, retry shortly.")
+
+    def _connected(self, key: Hashable, task: asyncio.Future):
+        self._connecting.discard(key)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"⚠️ Reconnect failed for {key}: {task.exception()}")
+
+    def qdrant(self, tier: str, mode: str) -> QdrantService:
+        key = (tier.lower(), mode.lower())
+        return self._get(self._qdrant, key, lambda: QdrantService(tier=key[0], mode=key[1]), f"Qdrant ({key[0]}/{key[1]})")
+
+    def keyword(self, tier: str) -> KeywordBackend:
+        key = tier.lower()
+        return self._get(self._keyword, key, lambda: get_keyword_backend(key), f"Keyword backend ({key})")
+
+    def check(self, tier: str, mode: str):
+        """
+        Raises ServiceUnavailable unless both services for (tier, mode) are connected.
+        """
+        self.qdrant(tier, mode)
+        self.keyword(tier)
+
+    def retriever(self, tier: str, mode: str) -> Retriever:
+        return Retriever(
+            tier=tier,
+            mode=mode,
+            qdrant=self.qdrant(tier, mode),
+            keyword=self.keyword(tier)
+        )
+
+    def bulk_writer(self, tier: str, mode: str) -> BulkWriter:
+        return BulkWriter(qdrant=self.qdrant(tier, mode), keyword=self.keyword(tier))
+
+    def close(self):
+        for service in self._qdrant.values():
+            try:
+                service.client.close()
+            except Exception:
+                pass
+        for service in self._keyword.values():
+            try:
+                service.close()
+            except Exception as e:
+                print(f"⚠️ Failed to close keyword backend: {e}")
+        self._qdrant.clear()
+        self._keyword.clear()
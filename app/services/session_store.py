@@ -0,0 +1,296 @@
+# app/services/session_store.py
+
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from app.config import Config
+
+try:
+    import fcntl  # POSIX only; used to serialise appends across tier containers
+except ImportError:
+    fcntl = None
+
+_TAIL_BLOCK = 64 * 1024
+
+
+class ExchangeLimitReached(Exception):
+    def __init__(self, limit: int):
+        super().__init__(f"Exchange limit reached ({limit} exchanges per session)")
+        self.limit = limit
+
+
+class Reservation:
+    """
+    One claimed exchange; ends in commit() or release(), whichever comes
+    first. release() only touches memory, so it is safe on the event loop.
+    """
+
+    def __init__(self, store: "SessionStore", session_id: str):
+        self.store = store
+        self.session_id = session_id
+        self.done = False
+
+    def commit(self, query: str, response: str, **extra) -> int:
+        count = self.store.append(self.session_id, query, response, reserved=not self.done, **extra)
+        self.done = True
+        return count
+
+    def release(self):
+        if not self.done:
+            self.done = True
+            self.store._release(self.session_id)
+
+
+class SessionStore(ABC):
+    """
+    Append-only log of (query, response) exchanges per session.
+    """
+
+    def __init__(self):
+        # session_id -> exchanges reserved but not yet appended
+        self._pending: dict[str, int] = {}
+        self._pending_lock = threading.Lock()
+
+    @abstractmethod
+    def append(self, session_id: str, query: str, response: str, reserved: bool = False, **extra) -> int:
+        """
+        Appends one exchange and returns the session's new exchange count.
+        `reserved` consumes a reserve() claim in the same critical section.
+        """
+
+    @abstractmethod
+    def count(self, session_id: str) -> int:
+        ...
+
+    @abstractmethod
+    def read_all(self, session_id: str) -> list[dict]:
+        """
+        Every exchange, in insertion order.
+        """
+
+    @abstractmethod
+    def _session_lock(self, session_id: str):
+        """
+        Lock that append() holds for `session_id`.
+        """
+
+    @abstractmethod
+    def _stored_count(self, session_id: str) -> int:
+        """
+        count() for callers already holding _session_lock(session_id).
+        """
+
+    def reserve(self, session_id: str, limit: int | None) -> Reservation:
+        """
+        Claims the session's next exchange. The check against `limit` counts
+        stored and reserved exchanges under the append lock, so concurrent
+        requests can't both take the last slot. Claims are per process.
+        """
+        with self._session_lock(session_id):
+            stored = self._stored_count(session_id)
+            with self._pending_lock:
+                pending = self._pending.get(session_id, 0)
+                if limit is not None and stored + pending >= limit:
+                    raise ExchangeLimitReached(limit)
+                self._pending[session_id] = pending + 1
+        return Reservation(self, session_id)
+
+    def _release(self, session_id: str):
+        with self._pending_lock:
+            pending = self._pending.get(session_id, 0) - 1
+            if pending > 0:
+                self._pending[session_id] = pending
+            else:
+                self._pending.pop(session_id, None)
+
+    @staticmethod
+    def make_entry(query: str, response: str, **extra) -> dict:
+        return {
+            "timestamp": str(datetime.utcnow()),
+            "query": query,
+            "response": response,
+            **extra
+        }
+
+
+class JsonlSessionStore(SessionStore):
+    """
+    One `interaction_log.jsonl` per session under `root`. Appends are a
+    single write of one line (O(1)), guarded by a per-session lock and an
+    flock so concurrent queries and other tier processes can't interleave.
+    """
+
+    def __init__(self, root: str = "sessions"):
+        super().__init__()
+        self.root = root
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        # session_id -> (count, file size the count was taken at)
+        self._counts: dict[str, tuple[int, int]] = {}
+
+    def path(self, session_id: str) -> str:
+        return os.path.join(self.root, session_id, "interaction_log.jsonl")
+
+    def _lock(self, session_id: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(session_id)
+            if lock is None:
+                lock = self._locks[session_id] = threading.Lock()
+            return lock
+
+    def _migrate_legacy(self, session_id: str, path: str):
+        # Older sessions were stored as one JSON array
+        legacy = os.path.join(self.root, session_id, "interaction_log.json")
+        if os.path.exists(path) or not os.path.exists(legacy):
+            return
+        with open(legacy, "r") as f:
+            entries = json.load(f)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, path)
+
+    def _count_lines(self, path: str) -> int:
+        count = 0
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(_TAIL_BLOCK), b""):
+                count += block.count(b"\n")
+        return count
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        return self._lock(session_id)
+
+    def _stored_count(self, session_id: str) -> int:
+        path = self.path(session_id)
+        self._migrate_legacy(session_id, path)
+        return self._count_unlocked(session_id, path)
+
+    def append(self, session_id: str, query: str, response: str, reserved: bool = False, **extra) -> int:
+        path = self.path(session_id)
+        line = (json.dumps(self.make_entry(query, response, **extra)) + "\n").encode("utf-8")
+        with self._lock(session_id):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._migrate_legacy(session_id, path)
+            count = self._count_unlocked(session_id, path)
+            with open(path, "ab") as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.write(line)
+                    f.flush()
+                    size = f.tell()
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+            # If another process appended meanwhile the size won't match and
+            # the next count() falls back to a recount.
+            if size == self._counts.get(session_id, (0, 0))[1] + len(line):
+                count += 1
+                self._counts[session_id] = (count, size)
+            else:
+                self._counts.pop(session_id, None)
+                count = self._count_unlocked(session_id, path)
+            if reserved:
+                self._release(session_id)
+            return count
+
+    def _count_unlocked(self, session_id: str, path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            self._counts[session_id] = (0, 0)
+            return 0
+        cached = self._counts.get(session_id)
+        if cached and cached[1] == size:
+            return cached[0]
+        count = self._count_lines(path)
+        self._counts[session_id] = (count, size)
+        return count
+
+    def count(self, session_id: str) -> int:
+        path = self.path(session_id)
+        with self._lock(session_id):
+            self._migrate_legacy(session_id, path)
+            return self._count_unlocked(session_id, path)
+
+    def read_all(self, session_id: str) -> list[dict]:
+        path = self.path(session_id)
+        with self._lock(session_id):
+            self._migrate_legacy(session_id, path)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r") as f:
+            # Skip a trailing line that is still being written
+            return [json.loads(line) for line in f if line.endswith("\n") and line.strip()]
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    All sessions in one SQLite database in WAL mode; appends are single
+    inserts and reads go through the (session_id, seq) index.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS interactions (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                entry TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_interactions_session ON interactions (session_id, seq)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def _session_lock(self, session_id: str) -> threading.Lock:
+        return self._lock
+
+    def _stored_count(self, session_id: str) -> int:
+        return self._count_unlocked(session_id)
+
+    def append(self, session_id: str, query: str, response: str, reserved: bool = False, **extra) -> int:
+        entry = json.dumps(self.make_entry(query, response, **extra))
+        with self._lock:
+            self._conn.execute("INSERT INTO interactions (session_id, entry) VALUES (?, ?)", (session_id, entry))
+            self._conn.commit()
+            if reserved:
+                self._release(session_id)
+            return self._count_unlocked(session_id)
+
+    def _count_unlocked(self, session_id: str) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM interactions WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+    def count(self, session_id: str) -> int:
+        with self._lock:
+            return self._count_unlocked(session_id)
+
+    def read_all(self, session_id: str) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entry FROM interactions WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+
+_store: SessionStore | None = None
+
+
+def get_session_store() -> SessionStore:
+    global _store
+    if _store is None:
+        if Config.SESSION_STORE_BACKEND == "sqlite":
+            _store = SqliteSessionStore(Config.SESSION_DB_PATH)
+        else:
+            _store = JsonlSessionStore(Config.SESSIONS_DIR)
+    return _store
@@ -2,25 +2,28 @@
 
 import typesense
 from app.config import Config
+from app.services.keyword_backend import KeywordBackend
+from app.utils.chunk_ids import chunk_id
 
 
 
-class TypesenseService:
-    def __init__(self, tier: str):
+class TypesenseService(KeywordBackend):
+    def __init__(self, tier: str, ensure_schema: bool = True):
         self.tier = tier.lower()
         self.collection_name = f"asklyne_chunks_{self.tier}"
 
         self.client = typesense.Client({
             'nodes': [{
                 'host': Config.TYPESENSE_HOST.replace("https://", "").replace("http://", ""),
-                'port': 443,
-                'protocol': 'https'
+                'port': Config.TYPESENSE_PORT,
+                'protocol': Config.TYPESENSE_PROTOCOL
             }],
             'api_key': Config.TYPESENSE_API_KEY,
-            'connection_timeout_seconds': 2
+            'connection_timeout_seconds': Config.TYPESENSE_TIMEOUT
         })
 
-        self.ensure_collection_exists()
+        if ensure_schema:
+            self.ensure_collection_exists()
 
     def ensure_collection_exists(self):
         try:
@@ -34,34 +37,50 @@ class TypesenseService:
                     {"name": "text", "type": "string"},
                     {"name": "mode", "type": "string", "facet": True},
                     {"name": "tier", "type": "string", "facet": True},
-                    {"name": "session_id", "type": "string", "facet": True}
+                    {"name": "session_id", "type": "string", "facet": True},
+                    # Code chunks only (see CodeChunker)
+                    {"name": "symbol", "type": "string", "facet": True, "optional": True},
+                    {"name": "symbol_type", "type": "string", "facet": True, "optional": True},
+                    {"name": "start_line", "type": "int32", "optional": True},
+                    {"name": "end_line", "type": "int32", "optional": True},
+                    {"name": "cell_index", "type": "int32", "optional": True}
                 ],
                 
             }
             self.client.collections.create(schema)
             print(f"✅ Created Typesense collection '{self.collection_name}'")
 
-    def upsert_chunks(self, chunks: list[str], session_id: str, mode: str):
+    def upsert_chunks(self, chunks: list[str], session_id: str, mode: str, ids: list[str] = None, metadata: list[dict] = None):
+        ids = ids or [chunk_id(session_id, mode, chunk) for chunk in chunks]
+        metadata = metadata or [{} for _ in chunks]
         documents = [
             {
-                "id": f"{session_id}_{i}",
+                "id": ids[i],
                 "text": chunk,
                 "mode": mode,
                 "tier": self.tier,
-                "session_id": session_id
+                "session_id": session_id,
+                **metadata[i]
             }
             for i, chunk in enumerate(chunks)
         ]
-        self.client.collections[self.collection_name].documents.import_(documents, {'action': 'upsert'})
+        results = self.client.collections[self.collection_name].documents.import_(documents, {'action': 'upsert'})
+        # import_ reports per-document failures instead of raising
+        failed = [r for r in results if not r.get("success", False)]
+        if failed:
+            raise RuntimeError(f"Typesense import failed for {len(failed)}/{len(documents)} documents: {failed[0].get('error')}")
         print(f"✅ Upserted {len(documents)} chunks to Typesense")
 
-    def search(self, query: str, top_k: int = 5, filters: dict = None):
+    def search(self, query: str, top_k: int = 5, filters: dict = None) -> list[dict]:
         filter_by = " && ".join([f"{k}:={v}" for k, v in filters.items()]) if filters else ""
         results = self.client.collections[self.collection_name].documents.search({
             'q': query,
             'query_by': 'text',
             'filter_by': filter_by,
             'per_page': top_k,
-            "include_fields": "text,text_match_score",  # Add this
+            "include_fields": "id,text,text_match_score,token_count,llm_tokens,symbol,symbol_type,start_line,end_line,cell_index",  # Add this
         })
-        return results['hits']
+        return [
+            {**hit["document"], "score": hit.get("text_match_score", hit.get("text_match", 0.0))}
+            for hit in results['hits']
+        ]
@@ -0,0 +1,17 @@
+import hashlib
+import uuid
+
+# Fixed namespace so the same (session, mode, chunk) always maps to the same id
+CHUNK_NAMESPACE = uuid.UUID("6f1c2b9e-4a53-5d1e-9c7b-3a8f2e1d0c4b")
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(session_id: str, mode: str, text: str) -> str:
+    """
+    Deterministic UUIDv5 for a chunk: re-ingesting a document overwrites its
+    own points instead of piling up duplicates or clobbering other sessions.
+    """
+    return str(uuid.uuid5(CHUNK_NAMESPACE, f"{session_id}:{mode}:{chunk_hash(text)}"))
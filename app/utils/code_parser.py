@@ -1,10 +1,26 @@
-
-import nbformat
-
 def extract_code_from_py(content: bytes) -> str:
     return content.decode("utf-8")
 
 def extract_code_from_ipynb(content: bytes) -> str:
+    import nbformat
     notebook = nbformat.reads(content.decode("utf-8"), as_version=4)
     code_cells = [cell['source'] for cell in notebook.cells if cell['cell_type'] == 'code']
     return "\n\n".join(code_cells)
+
+def extract_code_cells_from_ipynb(content: bytes) -> list[tuple[int, str]]:
+    """
+    (cell index in the notebook, source) for every code cell.
+    """
+    import nbformat
+    notebook = nbformat.reads(content.decode("utf-8"), as_version=4)
+    return [(i, cell['source']) for i, cell in enumerate(notebook.cells) if cell['cell_type'] == 'code']
+
+def extract_code_cells(content: bytes, filename: str) -> list[tuple[int | None, str]]:
+    """
+    Source units of a code upload; a .py file is a single unit without a cell index.
+    """
+    if filename.endswith(".py"):
+        return [(None, extract_code_from_py(content))]
+    if filename.endswith(".ipynb"):
+        return extract_code_cells_from_ipynb(content)
+    raise ValueError("Unsupported code file type")
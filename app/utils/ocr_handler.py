@@ -1,22 +1,86 @@
-from PIL import Image
-import pytesseract
-from pdf2image import convert_from_path
-import os
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Iterator
+import io
+
+from app.config import Config
+from app.core.executor import get_process_pool, process_worker_count, iter_in_order, picklable_errors
+
+# PIL / pytesseract / pdf2image are imported where used: the OCR work runs in
+# pool workers, so the API process doesn't need to load them at import time.
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+def _init_worker(tesseract_cmd: str | None):
+    # Set tesseract path manually if needed (for Windows)
+    if tesseract_cmd:
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+
+def preprocess_ocr_image(image: "Image.Image") -> "Image.Image":
+    from PIL import ImageEnhance, ImageFilter
+
+    image = image.convert("L")  # grayscale
+    image = image.resize((1200, int(image.height * (1200 / image.width))))  # upscale
+    image = image.filter(ImageFilter.MedianFilter(size=3))  # denoise
+    enhancer = ImageEnhance.Contrast(image)
+    image = enhancer.enhance(2.0)  # boost contrast
+    return image
+
+
+# --- worker-side functions (must stay module-level to be picklable) ---
+
+@picklable_errors
+def ocr_image_bytes(content: bytes, preprocess: bool = True, config: str = "--psm 6") -> str:
+    import pytesseract
+    from PIL import Image
+
+    _init_worker(Config.TESSERACT_CMD)
+    image = Image.open(io.BytesIO(content))
+    if preprocess:
+        image = preprocess_ocr_image(image)
+    return pytesseract.image_to_string(image, config=config)
+
+
+@picklable_errors
+def ocr_pdf_page_path(pdf_path: str, page_number: int) -> str:
+    import pytesseract
+    from pdf2image import convert_from_path
+
+    _init_worker(Config.TESSERACT_CMD)
+    text = ""
+    for page in convert_from_path(pdf_path, first_page=page_number, last_page=page_number):
+        text += pytesseract.image_to_string(page)
+        page.close()
+    return text
+
 
 class OCRHandler:
     def __init__(self):
-        # Set tesseract path manually if needed (for Windows)
-        pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+        _init_worker(Config.TESSERACT_CMD)
+        self.pool = get_process_pool()
+        self.window = process_worker_count() * 2
+
+    def submit_image(self, content: bytes) -> Future:
+        return self.pool.submit(ocr_image_bytes, content)
+
+    def submit_pdf_page(self, pdf_path: str, page_number: int) -> Future:
+        return self.pool.submit(ocr_pdf_page_path, pdf_path, page_number)
+
+    def iter_pdf_pages(self, pdf_path: str) -> Iterator[str]:
+        """
+        Rasterizes and OCRs pages in the process pool, yielding them in order.
+        Only `window` pages are in flight, so memory doesn't grow with page count.
+        """
+        from pdf2image import pdfinfo_from_path
 
-    def extract_text_from_image(self, image_path: str) -> str:
-        image = Image.open(image_path)
-        text = pytesseract.image_to_string(image)
-        return text.strip()
+        page_count = pdfinfo_from_path(pdf_path)["Pages"]
+        futures = (self.submit_pdf_page(pdf_path, n) for n in range(1, page_count + 1))
+        yield from iter_in_order(futures, self.window)
 
     def extract_text_from_pdf(self, pdf_path: str) -> str:
-        pages = convert_from_path(pdf_path)
         full_text = ""
-        for page in pages:
-            text = pytesseract.image_to_string(page)
+        for text in self.iter_pdf_pages(pdf_path):
             full_text += text + "\n"
         return full_text.strip()
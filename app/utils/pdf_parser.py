@@ -0,0 +1,26 @@
+from app.core.executor import picklable_errors
+
+# Runs in the process pool: pdfplumber/pdfminer parsing is pure Python and
+# holds the GIL, so it must not share a process with the event loop.
+# pdfplumber is imported inside the workers so the API process never loads it.
+
+
+@picklable_errors
+def pdf_page_count(pdf_path: str) -> int:
+    import pdfplumber
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+@picklable_errors
+def extract_pdf_page_range(pdf_path: str, first_page: int, last_page: int) -> list[str]:
+    """
+    Extracts text for the 1-based, inclusive page range.
+    """
+    import pdfplumber
+    texts = []
+    with pdfplumber.open(pdf_path, pages=list(range(first_page, last_page + 1))) as pdf:
+        for page in pdf.pages:
+            texts.append(page.extract_text() or "")
+            page.flush_cache()  # drop parsed objects so memory stays per-page
+    return texts
@@ -0,0 +1,119 @@
+"""
+Ingest write throughput (chunks/sec): the old path, where one upsert call
+per store carried every chunk and the stores were written one after the
+other, against BulkWriter's concurrent, batched writes.
+
+Runs against local stand-in stores. Each call costs a round trip plus a
+per-chunk cost, a store serves at most --store-parallelism calls at a time,
+and calls can fail at random to exercise retries. --live writes to the
+configured Qdrant and keyword backend instead:
+
+    python -m bench.bulk_write --chunks 5000
+    python -m bench.bulk_write --live --tier free --mode text --chunks 2000
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+from app.config import Config
+from app.services import bulk_writer
+from app.services.bulk_writer import BulkWriter
+from bench.common import quiet
+
+
+class StandInStore:
+    """
+    Sleeps like a remote store would: `rtt_ms` per call plus
+    `per_chunk_us` per chunk, with `parallelism` calls served at once.
+    """
+
+    def __init__(self, rtt_ms: float, per_chunk_us: float, parallelism: int, failure_rate: float = 0.0):
+        self.rtt = rtt_ms / 1000
+        self.per_chunk = per_chunk_us / 1_000_000
+        self.slots = threading.Semaphore(parallelism)
+        self.failure_rate = failure_rate
+
+    def upsert_chunks(self, chunks: list[str], session_id: str, mode: str, embeddings=None, ids=None, metadata=None):
+        with self.slots:
+            time.sleep(self.rtt + self.per_chunk * len(chunks))
+            if random.random() < self.failure_rate:
+                raise ConnectionError("stand-in store dropped the batch")
+
+    def flush(self):
+        pass
+
+
+def make_stores(args):
+    if args.live:
+        from app.services.keyword_backend import get_keyword_backend
+        from app.services.qdrant_service import QdrantService
+
+        return QdrantService(tier=args.tier, mode=args.mode), get_keyword_backend(args.tier)
+    return (
+        StandInStore(args.rtt_ms, args.qdrant_chunk_us, args.store_parallelism, args.failure_rate),
+        StandInStore(args.rtt_ms, args.keyword_chunk_us, args.store_parallelism, args.failure_rate),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--rtt-ms", type=float, default=20)
+    parser.add_argument("--qdrant-chunk-us", type=float, default=200, help="stand-in cost per point")
+    parser.add_argument("--keyword-chunk-us", type=float, default=100, help="stand-in cost per document")
+    parser.add_argument("--store-parallelism", type=int, default=4)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--live", action="store_true")
+    parser.add_argument("--tier", default="free")
+    parser.add_argument("--mode", default="text")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    chunks = [f"chunk {i}: " + "lorem ipsum dolor sit amet " * 20 for i in range(args.chunks)]
+    embeddings = [[random.random() for _ in range(args.dim)] for _ in range(args.chunks)]
+    metadata = [{"token_count": 120} for _ in chunks]
+    qdrant, keyword = make_stores(args)
+
+    def single_calls():
+        # Old path: unbatched, one store after the other, no retries
+        ids = [str(i) for i in range(len(chunks))]
+        qdrant.upsert_chunks(chunks, embeddings=embeddings, session_id="bench-old", mode=args.mode, ids=ids, metadata=metadata)
+        keyword.upsert_chunks(chunks, session_id="bench-old", mode=args.mode, ids=ids, metadata=metadata)
+
+    async def bulk():
+        writer = BulkWriter(qdrant, keyword)
+        await writer.write(chunks, embeddings, session_id="bench-bulk", mode=args.mode, metadata=metadata)
+        await writer.flush()
+
+    where = f"{Config.KEYWORD_BACKEND} + Qdrant ({args.tier}/{args.mode})" if args.live else (
+        f"stand-ins (rtt {args.rtt_ms} ms, {args.store_parallelism} parallel calls, failure rate {args.failure_rate})"
+    )
+    print(f"{args.chunks} chunks, dim {args.dim}, {where}")
+    print(f"  batch sizes: Qdrant {Config.QDRANT_BATCH_SIZE}, keyword {Config.KEYWORD_BATCH_SIZE}; upsert stage limit {Config.STAGE_LIMITS['upsert']}")
+
+    with quiet():
+        t = time.perf_counter()
+        try:
+            single_calls()
+            single = time.perf_counter() - t
+        except Exception as e:
+            single = None
+            failure = e
+        t = time.perf_counter()
+        asyncio.run(bulk())
+        batched = time.perf_counter() - t
+
+    if single is None:
+        print(f"  single calls       failed: {failure}")
+    else:
+        print(f"  single calls       {single:7.2f} s  {args.chunks / single:9.1f} chunks/s")
+    print(f"  BulkWriter         {batched:7.2f} s  {args.chunks / batched:9.1f} chunks/s  ({bulk_writer.stats.retries} retried batches)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Chunker throughput on multi-MB generated documents: the span/prefix-sum
+Chunker against a copy of the previous list-rebuilding implementation.
+Both use the len/4 estimate by default so only the packing differs;
+--tiktoken gives the new Chunker real token counts as well.
+
+Two document shapes: paragraphs (split on blank lines) and one long run of
+short sentences, where the old overflow handling re-summed the window on
+every chunk.
+
+    python -m bench.chunker --mb 2 8
+"""
+
+import argparse
+import random
+import re
+import time
+
+from app.config import Config
+from app.core.chunker import Chunker
+from app.core.tokenizer import TokenCounter
+
+WORDS = (
+    "retrieval index vector query token chunk overlap session model batch cache "
+    "latency ranking fusion embedding keyword document score tier stream"
+).split()
+
+
+class LegacyChunker:
+    """
+    The chunk_text() this module replaced, minus its per-call print.
+    """
+
+    def __init__(self, max_tokens: int, overlap: int):
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+
+    def chunk_text(self, text: str) -> list[str]:
+        sentences = re.split(r'\n{2,}', text.strip())
+        if len(sentences) <= 1:
+            sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+
+        sentence_tokens = [(s, self.estimate_tokens(s)) for s in sentences if s]
+        chunks = []
+        current_chunk = []
+        current_tokens = 0
+        i = 0
+        while i < len(sentence_tokens):
+            sentence, est_tokens = sentence_tokens[i]
+            if current_tokens + est_tokens > self.max_tokens:
+                if current_chunk:
+                    chunks.append(" ".join(current_chunk))
+                    overlap_tokens = 0
+                    j = len(current_chunk) - 1
+                    while j >= 0 and overlap_tokens < self.overlap:
+                        overlap_tokens += self.estimate_tokens(current_chunk[j])
+                        j -= 1
+                    current_chunk = current_chunk[j + 1:]
+                    current_tokens = sum(self.estimate_tokens(s) for s in current_chunk)
+                else:
+                    chunks.append(sentence)
+                    i += 1
+                    continue
+            current_chunk.append(sentence)
+            current_tokens += est_tokens
+            i += 1
+
+        if current_tokens:
+            chunks.append(" ".join(current_chunk))
+        return chunks
+
+    def estimate_tokens(self, text: str) -> int:
+        return max(1, len(text) // 4)
+
+
+def sentence(rng: random.Random, min_words: int, max_words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))).capitalize() + "."
+
+
+def make_document(shape: str, size_bytes: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts, size = [], 0
+    while size < size_bytes:
+        if shape == "paragraphs":
+            part = " ".join(sentence(rng, 6, 20) for _ in range(rng.randint(2, 8))) + "\n\n"
+        else:
+            part = sentence(rng, 2, 5) + " "
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def timed(fn, text: str) -> tuple[float, int]:
+    t = time.perf_counter()
+    chunks = fn(text)
+    return time.perf_counter() - t, len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, nargs="+", default=[2, 8])
+    parser.add_argument("--max-tokens", type=int, default=480)
+    parser.add_argument("--overlap", type=int, default=80)
+    parser.add_argument("--tiktoken", action="store_true", help="also time the new Chunker with the LLM tokenizer")
+    args = parser.parse_args()
+
+    candidates = [
+        ("previous", LegacyChunker(args.max_tokens, args.overlap).chunk_text),
+        ("span/prefix-sum", Chunker("text", args.max_tokens, args.overlap).chunk_text),
+    ]
+    if args.tiktoken:
+        # Built directly so a missing encoding fails here instead of falling back to len/4
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(Config.LLM_TOKENIZER)
+        counter = TokenCounter(Config.LLM_TOKENIZER, lambda texts: [len(ids) for ids in encoding.encode_ordinary_batch(texts)])
+        candidates.append((f"span + {counter.name}", Chunker("text", args.max_tokens, args.overlap, counter=counter).chunk_text))
+
+    print(f"max_tokens {args.max_tokens}, overlap {args.overlap}")
+    for shape in ["paragraphs", "short-sentences"]:
+        for mb in args.mb:
+            text = make_document(shape, int(mb * 1024 * 1024))
+            print(f"  {shape}, {len(text) / 1024 / 1024:.1f} MB")
+            for name, fn in candidates:
+                seconds, count = timed(fn, text)
+                print(f"    {name:28} {seconds:7.2f} s  {len(text) / 1024 / 1024 / seconds:7.2f} MB/s  {count} chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import contextlib
+import io
+import statistics
+import time
+
+
+def percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(samples_ms: list[float]) -> str:
+    return (
+        f"mean {statistics.fmean(samples_ms):8.2f} ms  "
+        f"p50 {percentile(samples_ms, 0.5):8.2f} ms  "
+        f"p95 {percentile(samples_ms, 0.95):8.2f} ms"
+    )
+
+
+def time_calls(fn, n: int) -> list[float]:
+    """
+    Wall time of `n` sequential calls, in ms.
+    """
+    samples = []
+    for _ in range(n):
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    return samples
+
+
+@contextlib.contextmanager
+def quiet():
+    # The services print per call; keep that out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
@@ -0,0 +1,122 @@
+"""
+Embedding backends compared per model: load time, resident memory, query
+latency, batch throughput and cosine drift against the torch (fp32)
+embeddings of the same texts. Each backend is loaded in its own spawned
+process so memory figures don't include the others.
+
+Needs sentence-transformers (plus optimum/onnxruntime for the onnx
+backends; those fall back to torch, and are reported as such, without it):
+
+    python -m bench.embedding_backends --model BAAI/bge-large-en-v1.5
+    python -m bench.embedding_backends --tier free --mode code --backends torch onnx-int8
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import time
+
+import numpy as np
+
+from app.config import Config
+from app.core.embedder import resolve_model
+from app.core.model_backends import BACKENDS
+from bench.common import summarize
+
+TEXTS = [
+    f"Passage {i}: reciprocal rank fusion combines ranked lists by summing 1 / (k + rank); "
+    f"BM25 saturates term frequency and weights rare terms by inverse document frequency ({i})."
+    for i in range(256)
+]
+
+
+def rss_mb() -> float:
+    # Current resident set size; Linux only
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def measure(model_name: str, backend: str, queries: int, batch_size: int, results):
+    from app.core.model_backends import load_sentence_transformer
+
+    before = rss_mb()
+    t = time.perf_counter()
+    model, used = load_sentence_transformer(model_name, backend)
+    load_s = time.perf_counter() - t
+
+    model.encode(TEXTS[:8], convert_to_numpy=True)
+    latencies = []
+    for i in range(queries):
+        t = time.perf_counter()
+        model.encode([TEXTS[i % len(TEXTS)]], convert_to_numpy=True)
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    t = time.perf_counter()
+    embeddings = model.encode(TEXTS, convert_to_numpy=True, batch_size=batch_size, normalize_embeddings=True)
+    throughput = len(TEXTS) / (time.perf_counter() - t)
+
+    results.put({
+        "backend": backend,
+        "used": used,
+        "load_s": load_s,
+        "rss_mb": rss_mb() - before,
+        "latencies": latencies,
+        "throughput": throughput,
+        "embeddings": embeddings.astype(np.float32),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="model name; defaults to the tier/mode model")
+    parser.add_argument("--tier", default="free")
+    parser.add_argument("--mode", default="text")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=Config.EMBED_MAX_BATCH_SIZE)
+    parser.add_argument("--timeout", type=float, default=1800, help="seconds allowed per backend (export included)")
+    args = parser.parse_args()
+
+    model_name = args.model or resolve_model(args.tier, args.mode)[0]
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    print(f"{model_name}, intra-op threads {Config.INTRA_OP_THREADS or 'default'}, {os.cpu_count()} CPUs")
+
+    context = multiprocessing.get_context("spawn")
+    baseline = None
+    for backend in backends:
+        results = context.Queue()
+        worker = context.Process(target=measure, args=(model_name, backend, args.queries, args.batch_size, results))
+        worker.start()
+        result = None
+        deadline = time.monotonic() + args.timeout
+        while result is None and time.monotonic() < deadline:
+            try:
+                result = results.get(timeout=1)
+            except queue.Empty:
+                if not worker.is_alive():
+                    break
+        worker.join(5)
+        if result is None:
+            worker.terminate()
+            print(f"  {backend}: failed (exit code {worker.exitcode})")
+            if baseline is None:
+                return
+            continue
+
+        embeddings = result["embeddings"]
+        if baseline is None:
+            baseline = embeddings
+        cosines = np.sum(embeddings * baseline, axis=1)
+        label = backend if result["used"] == backend else f"{backend} (fell back to {result['used']})"
+        print(f"  {label}")
+        print(f"    load {result['load_s']:6.1f} s   RSS +{result['rss_mb']:7.0f} MB   {result['throughput']:7.1f} texts/s (batch {args.batch_size})")
+        print(f"    query {summarize(result['latencies'])}")
+        print(f"    cosine vs torch: mean {cosines.mean():.5f}  min {cosines.min():.5f}")
+
+
+if __name__ == "__main__":
+    main()
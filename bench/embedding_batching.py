@@ -0,0 +1,92 @@
+"""
+Query-embedding throughput with 50 concurrent callers: the old path, where
+each query ran encode() on the event loop, against the MicroBatcher engine
+that Embedder now submits to.
+
+By default the encoder is synthetic (fixed cost per forward pass plus a
+per-item cost, sleeping like torch does outside the GIL), so it runs
+anywhere. --model runs a real sentence-transformers model instead:
+
+    python -m bench.embedding_batching
+    python -m bench.embedding_batching --model BAAI/bge-large-en-v1.5 --backend torch
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from app.config import Config
+from app.core.batching import MicroBatcher
+
+
+def synthetic_encoder(fixed_ms: float, per_item_ms: float, dim: int = 1024):
+    def encode(texts: list[str]) -> np.ndarray:
+        time.sleep((fixed_ms + per_item_ms * len(texts)) / 1000)
+        return np.zeros((len(texts), dim), dtype=np.float32)
+    return encode
+
+
+def model_encoder(model_name: str, backend: str):
+    from app.core.model_backends import load_sentence_transformer
+
+    model, _ = load_sentence_transformer(model_name, backend)
+    return lambda texts: model.encode(texts, convert_to_numpy=True, batch_size=Config.EMBED_MAX_BATCH_SIZE)
+
+
+async def run_clients(embed, concurrency: int, queries: int) -> float:
+    """
+    `concurrency` coroutines each embed `queries` questions back to back.
+    Returns queries per second.
+    """
+    async def client(n: int):
+        for i in range(queries):
+            await embed(f"question {n}-{i}: how does reciprocal rank fusion combine rankings?")
+
+    t = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(concurrency)))
+    return concurrency * queries / (time.perf_counter() - t)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=10, help="queries per client")
+    parser.add_argument("--fixed-ms", type=float, default=15, help="synthetic cost per forward pass")
+    parser.add_argument("--per-item-ms", type=float, default=1, help="synthetic cost per text")
+    parser.add_argument("--model", help="real model instead of the synthetic encoder")
+    parser.add_argument("--backend", default="torch")
+    args = parser.parse_args()
+
+    if args.model:
+        encode = model_encoder(args.model, args.backend)
+        label = f"{args.model} ({args.backend})"
+    else:
+        encode = synthetic_encoder(args.fixed_ms, args.per_item_ms)
+        label = f"synthetic encoder ({args.fixed_ms} ms + {args.per_item_ms} ms/item)"
+
+    async def on_loop(text: str):
+        # Old path: encode() blocks the event loop, so queries serialize
+        return encode([text])[0]
+
+    engine = MicroBatcher(
+        name="bench",
+        process_batch=encode,
+        max_batch_size=Config.EMBED_MAX_BATCH_SIZE,
+        max_wait_ms=Config.EMBED_MAX_WAIT_MS
+    )
+
+    async def batched(text: str):
+        return (await engine.submit([text]))[0]
+
+    print(f"{label}, {args.concurrency} concurrent clients x {args.queries} queries")
+    for name, embed in [("encode on event loop", on_loop), ("micro-batched", batched)]:
+        qps = asyncio.run(run_clients(embed, args.concurrency, args.queries))
+        print(f"  {name:22} {qps:8.1f} QPS")
+    stats = engine.stats()
+    print(f"  {stats['batches']} batches, mean batch size {stats['batch_size']['mean']}")
+
+
+if __name__ == "__main__":
+    main()
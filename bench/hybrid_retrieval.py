@@ -0,0 +1,149 @@
+"""
+Hybrid retrieval quality and latency on a synthetic corpus: recall@k and
+MRR for semantic-only, keyword-only, the previous text-keyed dict merge and
+the fusion methods in app.core.fusion, across top_k and over-fetch values.
+
+Documents belong to topics and carry a few rare "entity" terms. Half the
+queries name the target's entities but have a noisy query vector (keyword
+queries); the other half paraphrase it with topic words only and have a
+cleaner vector (semantic queries), so neither backend alone finds every
+target. Keyword search is the real Bm25Index; semantic search is exact
+cosine top-k over the synthetic vectors, as SessionVectors does.
+
+    python -m bench.hybrid_retrieval --docs 5000 --queries 400
+"""
+
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+from app.core.fusion import fuse
+from app.services.bm25_index import Bm25Index
+from bench.common import quiet, summarize
+
+
+def build_corpus(docs: int, topics: int, dim: int, rng: random.Random, nrng: np.random.Generator):
+    topic_words = [[f"t{t}w{i}" for i in range(40)] for t in range(topics)]
+    centers = nrng.normal(size=(topics, dim))
+    texts, entities, vectors, doc_topics = [], [], [], []
+    for d in range(docs):
+        t = rng.randrange(topics)
+        names = [f"e{d}x{i}" for i in range(3)]
+        words = [rng.choice(topic_words[t]) for _ in range(60)] + names
+        rng.shuffle(words)
+        texts.append(" ".join(words))
+        entities.append(names)
+        vectors.append(centers[t] + 0.8 * nrng.normal(size=dim))
+        doc_topics.append(t)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return texts, entities, vectors, doc_topics, topic_words
+
+
+def build_queries(count: int, texts, entities, vectors, doc_topics, topic_words, rng, nrng, keyword_noise: float, semantic_noise: float):
+    queries = []
+    for q in range(count):
+        target = rng.randrange(len(texts))
+        keyword_query = q % 2 == 0
+        topic = topic_words[doc_topics[target]]
+        if keyword_query:
+            text = " ".join(entities[target][:2] + [rng.choice(topic)])
+            noise = keyword_noise
+        else:
+            doc_words = texts[target].split()
+            text = " ".join(rng.choice([w for w in doc_words if w.startswith("t")]) for _ in range(4))
+            noise = semantic_noise
+        vec = vectors[target] + noise * nrng.normal(size=vectors.shape[1]) / math.sqrt(vectors.shape[1])
+        queries.append((f"d{target}", text, (vec / np.linalg.norm(vec)).astype(np.float32)))
+    return queries
+
+
+def semantic_search(vectors, ids, query_vec, top_k):
+    scores = vectors @ query_vec
+    top = np.argpartition(-scores, min(top_k, len(scores) - 1))[:top_k]
+    top = top[np.argsort(-scores[top])]
+    return [{"id": ids[i], "text": ids[i], "score": float(scores[i])} for i in top]
+
+
+def dict_merge(semantic, keyword, top_k):
+    # Previous behaviour: keyed by text, keyword hit wins, raw scores compared
+    merged = {c["text"]: c for c in semantic + keyword}
+    return sorted(merged.values(), key=lambda c: -c["score"])[:top_k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--top-k", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--overfetch", type=float, nargs="+", default=[1, 3])
+    parser.add_argument("--keyword-noise", type=float, default=4.0, help="query vector noise for keyword queries")
+    parser.add_argument("--semantic-noise", type=float, default=1.0, help="query vector noise for semantic queries")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    nrng = np.random.default_rng(args.seed)
+    texts, entities, vectors, doc_topics, topic_words = build_corpus(args.docs, args.topics, args.dim, rng, nrng)
+    ids = [f"d{i}" for i in range(args.docs)]
+    queries = build_queries(
+        args.queries, texts, entities, vectors, doc_topics, topic_words, rng, nrng, args.keyword_noise, args.semantic_noise
+    )
+
+    index = Bm25Index("bench", root=None, max_sessions=1)
+    with quiet():
+        index.upsert_chunks(texts, session_id="bench", mode="text", ids=ids)
+    filters = {"session_id": "bench", "mode": "text"}
+
+    print(f"{args.docs} docs, {args.queries} queries (half keyword, half semantic), dim {args.dim}")
+    print(f"  {'method':16} {'top_k':>5} {'overfetch':>9} {'recall@k':>9} {'MRR':>6}")
+    fusion_ms = []
+    keyword_ms = []
+    semantic_ms = []
+    for top_k in args.top_k:
+        for overfetch in args.overfetch:
+            fetch = math.ceil(top_k * overfetch)
+            results = {name: [] for name in ["semantic", "keyword", "dict-merge", "rrf", "weighted"]}
+            for target, text, vec in queries:
+                t = time.perf_counter()
+                semantic = semantic_search(vectors, ids, vec, fetch)
+                semantic_ms.append((time.perf_counter() - t) * 1000)
+                t = time.perf_counter()
+                keyword = [{**hit, "text": hit["id"]} for hit in index.search(text, top_k=fetch, filters=filters)]
+                keyword_ms.append((time.perf_counter() - t) * 1000)
+
+                ranked = {"semantic": semantic, "keyword": keyword}
+                results["semantic"].append(semantic[:top_k])
+                results["keyword"].append(keyword[:top_k])
+                results["dict-merge"].append(dict_merge(semantic[:top_k], keyword[:top_k], top_k))
+                t = time.perf_counter()
+                results["rrf"].append(fuse(ranked, "rrf")[:top_k])
+                fusion_ms.append((time.perf_counter() - t) * 1000)
+                results["weighted"].append(fuse(ranked, "weighted")[:top_k])
+
+            for name, per_query in results.items():
+                if name in ("semantic", "keyword", "dict-merge") and overfetch != args.overfetch[0]:
+                    # Unaffected by over-fetch; printed once per top_k
+                    continue
+                ranks = [
+                    next((r for r, hit in enumerate(hits, start=1) if hit["id"] == target), None)
+                    for (target, _, _), hits in zip(queries, per_query)
+                ]
+                recall = sum(r is not None for r in ranks) / len(ranks)
+                mrr = sum(1 / r for r in ranks if r) / len(ranks)
+                shown = "-" if name in ("semantic", "keyword", "dict-merge") else f"x{overfetch:g}"
+                print(f"  {name:16} {top_k:5} {shown:>9} {recall:9.3f} {mrr:6.3f}")
+
+    print("latency per query")
+    print(f"  semantic top-k   {summarize(semantic_ms)}")
+    print(f"  BM25 search      {summarize(keyword_ms)}")
+    print(f"  RRF fusion       {summarize(fusion_ms)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+OCR throughput against process-pool size, over generated page images
+(rendered text, so Tesseract has real work). Each worker count gets a
+fresh spawn pool, like executor.get_process_pool(); 1 worker is the old
+serial path.
+
+Needs the tesseract binary; --preprocess-only times just the PIL
+preprocessing that now runs in the workers:
+
+    python -m bench.ocr_scaling --images 32 --workers 1 2 4 8
+"""
+
+import argparse
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.utils.ocr_handler import ocr_image_bytes, preprocess_ocr_image
+
+SAMPLE = (
+    "Reciprocal rank fusion sums 1 / (k + rank) over every ranking a document appears in. "
+    "BM25 scores a term by its inverse document frequency and a saturating term frequency. "
+)
+
+
+def make_page(n: int, width: int = 1240, height: int = 1754) -> bytes:
+    """
+    A4 page at 150 dpi with ~40 lines of text, as PNG bytes.
+    """
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for line in range(40):
+        offset = (n * 7 + line * 13) % len(SAMPLE)
+        text = (SAMPLE * 2)[offset:offset + 90]
+        draw.text((60, 60 + line * 40), text, fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def preprocess_bytes(content: bytes) -> int:
+    from PIL import Image
+
+    return preprocess_ocr_image(Image.open(io.BytesIO(content))).width
+
+
+def run(fn, pages: list[bytes], workers: int) -> float:
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Start every worker (and its imports) before timing
+        list(pool.map(preprocess_bytes, pages[:workers]))
+        t = time.perf_counter()
+        list(pool.map(fn, pages))
+        return time.perf_counter() - t
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--preprocess-only", action="store_true")
+    args = parser.parse_args()
+
+    pages = [make_page(n) for n in range(args.images)]
+    fn = preprocess_bytes if args.preprocess_only else ocr_image_bytes
+    what = "preprocessing" if args.preprocess_only else "OCR (preprocess + tesseract)"
+    print(f"{what}, {args.images} generated pages, {os.cpu_count()} CPUs")
+
+    baseline = None
+    for workers in sorted(set(args.workers)):
+        seconds = run(fn, pages, workers)
+        baseline = baseline or seconds
+        print(f"  {workers:3} workers  {seconds:7.2f} s  {args.images / seconds:7.2f} pages/s  speedup x{baseline / seconds:.2f}")
+
+
+if __name__ == "__main__":
+    main()
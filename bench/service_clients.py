@@ -0,0 +1,57 @@
+"""
+Per-request overhead of the old query path, which built a QdrantService
+(new client + collection/index checks) and a keyword backend for every
+request, against the shared clients ServiceRegistry hands out.
+
+Needs the QDRANT_* and keyword backend settings of a running deployment:
+
+    python -m bench.service_clients --tier free --mode text --requests 50
+"""
+
+import argparse
+
+from app.services.keyword_backend import get_keyword_backend
+from app.services.qdrant_service import QdrantService
+from bench.common import percentile, quiet, summarize, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tier", default="free")
+    parser.add_argument("--mode", default="text")
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    filters = {"session_id": "bench-service-clients", "mode": args.mode}
+    with quiet():
+        qdrant = QdrantService(tier=args.tier, mode=args.mode)
+        keyword = get_keyword_backend(args.tier)
+    vector = [0.1] * qdrant.vector_size
+
+    def per_request():
+        service = QdrantService(tier=args.tier, mode=args.mode)
+        backend = get_keyword_backend(args.tier)
+        service.search(vector, top_k=5, filters=filters)
+        backend.search("benchmark query", top_k=5, filters=filters)
+        backend.close()
+        service.client.close()
+
+    def shared():
+        qdrant.search(vector, top_k=5, filters=filters)
+        keyword.search("benchmark query", top_k=5, filters=filters)
+
+    with quiet():
+        # One untimed call each so DNS/TLS setup isn't charged to either side
+        per_request()
+        shared()
+        cold = time_calls(per_request, args.requests)
+        warm = time_calls(shared, args.requests)
+
+    print(f"{args.requests} requests, {args.tier}/{args.mode}")
+    print(f"  per-request clients  {summarize(cold)}")
+    print(f"  shared clients       {summarize(warm)}")
+    print(f"  overhead per request {percentile(cold, 0.5) - percentile(warm, 0.5):8.2f} ms (p50)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import pytest
+
+from app.core import admission
+from app.core.admission import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    return clock
+
+
+def test_bucket_allows_burst_then_waits(clock):
+    bucket = TokenBucket(rate=2.0, burst=3)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() == pytest.approx(0.5)
+
+
+def test_bucket_refills_up_to_burst(clock):
+    bucket = TokenBucket(rate=1.0, burst=2)
+    bucket.take()
+    bucket.take()
+    clock.now += 1.5
+    assert bucket.take() == 0.0
+    assert bucket.take() == pytest.approx(0.5)
+    clock.now += 100
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, pytest.approx(1.0)]
+
+
+def test_rate_limiter_counts_per_tier(clock):
+    limiter = RateLimiter({"free": (60, 1), "pro": (600, 5)})
+    assert limiter.admit("free") == 0.0
+    assert limiter.admit("free") == pytest.approx(1.0)
+    assert limiter.admit("pro") == 0.0
+    # Tiers without a limit are always admitted
+    assert limiter.admit("internal") == 0.0
+    stats = limiter.stats()
+    assert (stats["free"]["allowed"], stats["free"]["rejected"]) == (1, 1)
+    assert (stats["pro"]["allowed"], stats["pro"]["rejected"]) == (1, 0)
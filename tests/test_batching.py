@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from app.core.batching import MicroBatcher
+
+
+class GatedBatches:
+    """
+    process_batch stand-in: records batches and blocks the first one until released.
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        self.started.set()
+        assert self.release.wait(5)
+        return [item * 10 for item in items]
+
+
+def test_results_are_split_per_caller():
+    batcher = MicroBatcher("test-split", lambda items: [i + 1 for i in items], max_batch_size=16, max_wait_ms=20)
+    futures = [batcher.submit_sync([i, i]) for i in range(3)]
+    assert [f.result(timeout=5) for f in futures] == [[1, 1], [2, 2], [3, 3]]
+    assert batcher.submit_sync([]).result(timeout=1) == []
+
+
+def test_cancelled_requests_are_dropped_and_worker_survives():
+    process = GatedBatches()
+    batcher = MicroBatcher("test-cancel", process, max_batch_size=1, max_wait_ms=1)
+    first = batcher.submit_sync([1])
+    assert process.started.wait(5)
+    # Queued behind the blocked batch, cancelled before the worker gets to it
+    cancelled = batcher.submit_sync([2])
+    kept = batcher.submit_sync([3])
+    assert cancelled.cancel()
+    process.release.set()
+
+    assert first.result(timeout=5) == [10]
+    assert kept.result(timeout=5) == [30]
+    assert process.batches == [[1], [3]]
+    assert batcher.submit_sync([4]).result(timeout=5) == [40]
+
+
+def test_batch_errors_reach_callers_and_worker_survives():
+    calls = []
+
+    def process(items):
+        calls.append(items)
+        if len(calls) == 1:
+            raise RuntimeError("model failed")
+        return items
+
+    batcher = MicroBatcher("test-errors", process, max_batch_size=4, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        batcher.submit_sync(["a"]).result(timeout=5)
+    assert batcher.submit_sync(["b"]).result(timeout=5) == ["b"]
+
+
+def test_malformed_results_fail_the_batch():
+    batcher = MicroBatcher("test-bad-result", lambda items: [], max_batch_size=4, max_wait_ms=20)
+    futures = [batcher.submit_sync(["a"]), batcher.submit_sync(["b"])]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+    batcher.process_batch = lambda items: items
+    assert batcher.submit_sync(["c"]).result(timeout=5) == ["c"]
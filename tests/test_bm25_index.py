@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+
+from app.services.bm25_index import Bm25Index, tokenize
+
+
+def test_tokenize_splits_snake_case():
+    assert tokenize("Parse_Config now") == ["parse_config", "parse", "config", "now"]
+
+
+def test_search_ranks_matching_chunks(tmp_path):
+    index = Bm25Index("free", root=str(tmp_path))
+    index.upsert_chunks(
+        ["the cat sat on the mat", "dogs chase cats", "quantum field theory", "cat cat cat"],
+        session_id="s1", mode="text", ids=["a", "b", "c", "d"]
+    )
+    hits = index.search("cat", top_k=3, filters={"session_id": "s1", "mode": "text"})
+    assert [h["id"] for h in hits] == ["d", "a"]
+    assert hits[0]["score"] > hits[1]["score"]
+    assert index.search("relativity", filters={"session_id": "s1", "mode": "text"}) == []
+
+
+def test_search_is_scoped_to_session_and_mode(tmp_path):
+    index = Bm25Index("free", root=str(tmp_path))
+    index.upsert_chunks(["alice notes"], session_id="alice", mode="text", ids=["a"])
+    index.upsert_chunks(["bob notes"], session_id="bob", mode="text", ids=["b"])
+    index.upsert_chunks(["alice code notes"], session_id="alice", mode="code", ids=["c"])
+    hits = index.search("notes", filters={"session_id": "alice", "mode": "text"})
+    assert [h["id"] for h in hits] == ["a"]
+
+
+def test_reupsert_replaces_document(tmp_path):
+    index = Bm25Index("free", root=str(tmp_path))
+    index.upsert_chunks(["old words"], session_id="s", mode="text", ids=["a"])
+    index.upsert_chunks(["new words"], session_id="s", mode="text", ids=["a"])
+    filters = {"session_id": "s", "mode": "text"}
+    assert index.search("old", filters=filters) == []
+    assert [h["id"] for h in index.search("new", filters=filters)] == ["a"]
+
+
+def test_snapshot_round_trip(tmp_path):
+    index = Bm25Index("free", root=str(tmp_path))
+    index.upsert_chunks(["vector databases", "keyword search"], session_id="s1", mode="text", ids=["a", "b"])
+    index.flush()
+
+    reloaded = Bm25Index("free", root=str(tmp_path))
+    hits = reloaded.search("keyword", filters={"session_id": "s1", "mode": "text"})
+    assert [(h["id"], h["text"]) for h in hits] == [("b", "keyword search")]
+    assert hits[0]["score"] == index.search("keyword", filters={"session_id": "s1", "mode": "text"})[0]["score"]
+
+
+def test_session_ids_with_paths_do_not_share_snapshots(tmp_path):
+    index = Bm25Index("free", root=str(tmp_path))
+    index.upsert_chunks(["alice secret"], session_id="x/alice", mode="text", ids=["a"])
+    index.flush()
+    assert index.path("x/alice", "text") != index.path("alice", "text")
+
+    reloaded = Bm25Index("free", root=str(tmp_path))
+    assert reloaded.search("secret", filters={"session_id": "alice", "mode": "text"}) == []
+    assert len(reloaded.search("secret", filters={"session_id": "x/alice", "mode": "text"})) == 1
+
+
+def test_snapshot_for_another_session_is_ignored(tmp_path):
+    index = Bm25Index("free", root=str(tmp_path))
+    index.upsert_chunks(["alice secret"], session_id="alice", mode="text", ids=["a"])
+    index.flush()
+    # Plant alice's snapshot at bob's path
+    os.replace(index.path("alice", "text"), index.path("bob", "text"))
+
+    reloaded = Bm25Index("free", root=str(tmp_path))
+    assert reloaded.search("secret", filters={"session_id": "bob", "mode": "text"}) == []
+    with open(index.path("bob", "text")) as f:
+        assert json.load(f)["session_id"] == "alice"
+
+
+def test_evicted_session_is_saved(tmp_path):
+    index = Bm25Index("free", root=str(tmp_path), max_sessions=1)
+    index.upsert_chunks(["first session"], session_id="s1", mode="text", ids=["a"])
+    index.upsert_chunks(["second session"], session_id="s2", mode="text", ids=["b"])
+    assert os.path.exists(index.path("s1", "text"))
+    assert [h["id"] for h in index.search("first", filters={"session_id": "s1", "mode": "text"})] == ["a"]
+
+
+def test_snapshot_write_does_not_block_other_sessions(tmp_path):
+    index = Bm25Index("free", root=str(tmp_path), max_sessions=1)
+    index.upsert_chunks(["slow session"], session_id="slow", mode="text", ids=["a"])
+    index.upsert_chunks(["fast session"], session_id="fast", mode="text", ids=["b"])
+
+    saving = threading.Event()
+    release = threading.Event()
+    save = index._save
+
+    def slow_save(key, postings):
+        if key == ("fast", "text"):
+            saving.set()
+            release.wait(5)
+        save(key, postings)
+
+    index._save = slow_save
+    # Loading "slow" evicts "fast", whose snapshot write now hangs
+    loader = threading.Thread(target=index.search, args=("slow",), kwargs={"filters": {"session_id": "slow", "mode": "text"}})
+    loader.start()
+    assert saving.wait(5)
+    hits = []
+    searcher = threading.Thread(target=lambda: hits.extend(index.search("slow", filters={"session_id": "slow", "mode": "text"})))
+    searcher.start()
+    searcher.join(2)
+    blocked = searcher.is_alive()
+    release.set()
+    loader.join(5)
+    searcher.join(5)
+    assert not blocked
+    assert [h["id"] for h in hits] == ["a"]
+    assert [h["id"] for h in index.search("fast", filters={"session_id": "fast", "mode": "text"})] == ["b"]
+
+
+def test_concurrent_upserts_survive_eviction(tmp_path):
+    index = Bm25Index("free", root=str(tmp_path), max_sessions=2)
+    sessions = [f"s{i}" for i in range(6)]
+
+    def work(session_id):
+        for n in range(20):
+            index.upsert_chunks([f"word{n}"], session_id=session_id, mode="text", ids=[f"{session_id}-{n}"])
+
+    threads = [threading.Thread(target=work, args=(s,)) for s in sessions]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for session_id in sessions:
+        for n in range(20):
+            hits = index.search(f"word{n}", filters={"session_id": session_id, "mode": "text"})
+            assert [h["id"] for h in hits] == [f"{session_id}-{n}"]
@@ -0,0 +1,106 @@
+from app.core.chunker import Chunker, CodeChunker
+
+
+def window_sums(chunker, counts):
+    packed, _ = chunker._pack(counts)
+    return [tokens for _, _, tokens in packed]
+
+
+def test_pack_respects_max_tokens_after_overlap():
+    chunker = Chunker("text", max_tokens=512, overlap=50)
+    assert chunker._pack([400, 400]) == ([(0, 1, 400), (1, 2, 400)], 1)
+    assert window_sums(chunker, [300, 300, 300]) == [300, 300, 300]
+
+
+def test_pack_keeps_overlap_that_fits():
+    chunker = Chunker("text", max_tokens=500, overlap=100)
+    packed, _ = chunker._pack([100] * 6)
+    assert packed == [(0, 5, 500), (4, 6, 200)]
+
+
+def test_pack_covers_every_segment_in_order():
+    chunker = Chunker("text", max_tokens=100, overlap=20)
+    counts = [30, 70, 10, 90, 5, 5, 60, 40, 100, 1]
+    packed, _ = chunker._pack(counts)
+    assert all(tokens <= 100 for _, _, tokens in packed)
+    covered = sorted({i for a, b, _ in packed for i in range(a, b)})
+    assert covered == list(range(len(counts)))
+    assert [a for a, _, _ in packed] == sorted(a for a, _, _ in packed)
+
+
+def test_pack_resumes_carried_window():
+    chunker = Chunker("text", max_tokens=100, overlap=0)
+    packed, open_start = chunker._pack([60, 30], final=False)
+    assert packed == [] and open_start == 0
+    packed, open_start = chunker._pack([60, 30, 50], final=False, carried=2)
+    assert packed == [(0, 2, 90)] and open_start == 2
+
+
+def test_oversized_segment_is_split_into_windows():
+    chunker = Chunker("text", max_tokens=64, overlap=8)
+    text = " ".join(["word"] * 1000)
+    spans = chunker.span_text(text)
+    assert len(spans) > 1
+    assert all(tokens <= 64 for _, _, tokens in spans)
+    assert all(chunker.estimate_tokens(text[a:b]) <= 64 for a, b, _ in spans)
+    # Cut at whitespace: every chunk is made of whole words
+    assert all(set(text[a:b].split()) == {"word"} for a, b, _ in spans)
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+
+
+def test_chunk_stream_splits_oversized_segments():
+    chunker = Chunker("text", max_tokens=64, overlap=8)
+    pages = ["Intro sentence.", " ".join(["word"] * 500), "Closing sentence."]
+    chunks = list(chunker.chunk_stream_counted(pages))
+    assert all(tokens <= 64 for _, tokens in chunks)
+    assert "Intro" in chunks[0][0] and "Closing" in chunks[-1][0]
+
+
+def test_text_chunks_follow_paragraphs():
+    chunker = Chunker("text", max_tokens=6, overlap=0)
+    text = "First paragraph here.\n\nSecond paragraph here.\n\nThird one."
+    assert chunker.chunk_text(text) == ["First paragraph here.", "Second paragraph here.", "Third one."]
+
+
+def test_code_chunker_cuts_at_symbols():
+    source = (
+        "import os\n"
+        "\n"
+        "@decorator\n"
+        "def first(a):\n"
+        "    return a\n"
+        "\n"
+        "\n"
+        "class Second:\n"
+        "    def method(self):\n"
+        "        return 1\n"
+    )
+    chunks = list(CodeChunker(max_tokens=200).chunk_source(source))
+    assert [meta["symbol"] for _, _, meta in chunks] == ["<module>", "first", "Second"]
+    assert chunks[1][0].startswith("@decorator")
+    assert (chunks[1][2]["start_line"], chunks[1][2]["end_line"]) == (3, 5)
+    assert (chunks[2][2]["start_line"], chunks[2][2]["end_line"]) == (8, 10)
+
+
+def test_code_chunker_splits_large_class_into_methods():
+    methods = "".join(f"    def m{i}(self):\n        return {'x' * 60!r}\n\n" for i in range(3))
+    source = "class Big:\n    attr = 1\n\n" + methods
+    chunks = list(CodeChunker(max_tokens=40).chunk_source(source))
+    symbols = [meta["symbol"] for _, _, meta in chunks]
+    assert symbols == ["Big", "Big.m0", "Big.m1", "Big.m2"]
+    assert all(tokens <= 40 for _, tokens, _ in chunks)
+
+
+def test_code_chunker_splits_long_lines():
+    source = "x = [" + ", ".join(str(i) for i in range(400)) + "]\n"
+    chunks = list(CodeChunker(max_tokens=64, overlap=10).chunk_source(source))
+    assert len(chunks) > 1
+    assert all(tokens <= 64 for _, tokens, _ in chunks)
+    assert all((meta["start_line"], meta["end_line"]) == (1, 1) for _, _, meta in chunks)
+
+
+def test_unparsable_code_falls_back_to_line_windows():
+    source = "".join(f"line {i} ((( not python\n" for i in range(50))
+    chunks = list(CodeChunker(max_tokens=30, overlap=0).chunk_source(source))
+    assert all(tokens <= 30 for _, tokens, _ in chunks)
+    assert chunks[0][2]["start_line"] == 1 and chunks[-1][2]["end_line"] == 50
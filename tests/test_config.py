@@ -0,0 +1,23 @@
+import pytest
+
+from app.config import Config, validate_tiers
+
+
+def test_default_tiers_are_valid():
+    validate_tiers(Config.ASKLYNE_TIERS)
+
+
+def test_tier_without_scheduler_settings_is_rejected(monkeypatch):
+    monkeypatch.setattr(Config, "TIER_QUEUE_LIMITS", {"free": 1, "pro": 1})
+    with pytest.raises(ValueError) as e:
+        validate_tiers(["free", "plus", "team"])
+    message = str(e.value)
+    assert "TIER_QUEUE_LIMITS has no entry for 'plus'" in message
+    assert "TIER_CONCURRENCY has no entry for 'team'" in message
+    assert "'free'" not in message
+
+
+def test_default_tier_must_be_served(monkeypatch):
+    monkeypatch.setattr(Config, "DEFAULT_TIER", "pro")
+    with pytest.raises(ValueError, match="DEFAULT_TIER"):
+        validate_tiers(["free"])
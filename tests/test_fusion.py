@@ -0,0 +1,51 @@
+import pytest
+
+from app.core.fusion import fuse, reciprocal_rank_fusion, weighted_score_fusion
+
+
+def hit(chunk_id, score, **fields):
+    return {"id": chunk_id, "score": score, "text": chunk_id, **fields}
+
+
+def test_rrf_scores_by_rank_only():
+    fused = reciprocal_rank_fusion({
+        "semantic": [hit("a", 0.9), hit("b", 0.8)],
+        "keyword": [hit("b", 12.0), hit("c", 3.0)],
+    }, k=60)
+    assert [c["id"] for c in fused] == ["b", "a", "c"]
+    b = fused[0]
+    assert b["score"] == pytest.approx(1 / 62 + 1 / 61)
+    assert b["sources"] == {"semantic": {"rank": 2, "score": 0.8}, "keyword": {"rank": 1, "score": 12.0}}
+    assert b["source"] == "semantic+keyword"
+    assert fused[1]["source"] == "semantic"
+
+
+def test_rrf_weights_and_duplicates():
+    fused = reciprocal_rank_fusion({
+        "semantic": [hit("a", 0.9), hit("a", 0.5)],
+        "keyword": [hit("b", 5.0)],
+    }, k=0, weights={"keyword": 2.0})
+    # A repeated id within one backend only counts at its best rank
+    assert fused[0]["id"] == "b" and fused[0]["score"] == pytest.approx(2.0)
+    assert fused[1]["id"] == "a" and fused[1]["score"] == pytest.approx(1.0)
+
+
+def test_fused_entry_fills_missing_fields():
+    fused = reciprocal_rank_fusion({
+        "semantic": [hit("a", 0.9, symbol=None)],
+        "keyword": [hit("a", 4.0, symbol="f")],
+    })
+    assert fused[0]["symbol"] == "f"
+
+
+def test_weighted_fusion_normalises_scores():
+    fused = weighted_score_fusion({
+        "semantic": [hit("a", 0.9), hit("b", 0.5)],
+        "keyword": [hit("b", 10.0), hit("c", 0.0)],
+    })
+    assert {c["id"]: c["score"] for c in fused} == {"a": 1.0, "b": 1.0, "c": 0.0}
+
+
+def test_unknown_fusion_method():
+    with pytest.raises(ValueError):
+        fuse({}, method="borda")
@@ -0,0 +1,143 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core import llm_client
+from app.core.llm_client import LLMClient, LLMError
+
+
+class MockLLM:
+    """
+    Stand-in for the LLM endpoint behind httpx.MockTransport: records the
+    requests it gets and answers from `respond(payload)`.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        self.requests.append(payload)
+        return self.respond(payload)
+
+
+def sse(*events, done=True) -> bytes:
+    lines = [f"data: {json.dumps(event)}\n\n" for event in events]
+    if done:
+        lines.append("data: [DONE]\n\n")
+    return "".join(lines).encode("utf-8")
+
+
+@pytest.fixture
+def mock_llm():
+    """
+    Installs a MockTransport-backed client as the shared pool and returns a
+    function that sets the mock's responder.
+    """
+    servers = []
+
+    def install(respond):
+        server = MockLLM(respond)
+        llm_client._http_client = httpx.AsyncClient(transport=httpx.MockTransport(server))
+        servers.append(server)
+        return server
+
+    yield install
+    asyncio.run(llm_client.close_http_client())
+
+
+async def collect(stream) -> list[str]:
+    return [token async for token in stream]
+
+
+def test_query_parses_chat_and_completion_formats(mock_llm):
+    client = LLMClient("test-model", max_tokens=64)
+
+    server = mock_llm(lambda payload: httpx.Response(200, json={"choices": [{"message": {"content": "chat answer"}}]}))
+    assert asyncio.run(client.query("hi")) == "chat answer"
+    assert server.requests[0]["model"] == "test-model"
+    assert server.requests[0]["max_tokens"] == 64
+    assert "stream" not in server.requests[0]
+
+    mock_llm(lambda payload: httpx.Response(200, json={"output": {"choices": [{"text": "together answer"}]}}))
+    assert asyncio.run(client.query("hi")) == "together answer"
+
+
+def test_query_raises_llm_error(mock_llm):
+    mock_llm(lambda payload: httpx.Response(500, json={"error": "boom"}))
+    with pytest.raises(LLMError, match=r"^\[LLM failed\]$"):
+        asyncio.run(LLMClient("test-model").query("hi"))
+
+    mock_llm(lambda payload: httpx.Response(200, json={"unexpected": True}))
+    with pytest.raises(LLMError, match="unexpected format"):
+        asyncio.run(LLMClient("test-model").query("hi"))
+
+    mock_llm(lambda payload: httpx.Response(200, json={"choices": []}))
+    with pytest.raises(LLMError, match=r"^\[LLM failed\]$"):
+        asyncio.run(LLMClient("test-model").query("hi"))
+
+
+def test_answers_that_look_like_placeholders_are_answers(mock_llm):
+    mock_llm(lambda payload: httpx.Response(200, json={"choices": [{"message": {"content": "[LLM] is short for large language model"}}]}))
+    assert asyncio.run(LLMClient("test-model").query("hi")) == "[LLM] is short for large language model"
+
+
+def test_query_stream_parses_sse_deltas(mock_llm):
+    body = sse(
+        {"choices": [{"delta": {"role": "assistant"}}]},
+        {"choices": [{"delta": {"content": "Hel"}}]},
+        {"choices": [{"delta": {"content": "lo"}}]},
+        {"choices": []},
+        {"choices": [{"text": "!"}]},
+    )
+    server = mock_llm(lambda payload: httpx.Response(200, content=body, headers={"content-type": "text/event-stream"}))
+
+    tokens = asyncio.run(collect(LLMClient("test-model").query_stream("hi")))
+    assert tokens == ["Hel", "lo", "!"]
+    assert server.requests[0]["stream"] is True
+
+
+def test_query_stream_stops_at_done(mock_llm):
+    body = sse({"choices": [{"delta": {"content": "a"}}]}) + sse({"choices": [{"delta": {"content": "never"}}]})
+    mock_llm(lambda payload: httpx.Response(200, content=body))
+    assert asyncio.run(collect(LLMClient("test-model").query_stream("hi"))) == ["a"]
+
+
+def test_query_stream_mid_stream_failure_keeps_sent_tokens(mock_llm):
+    async def broken_body():
+        yield sse({"choices": [{"delta": {"content": "partial"}}]}, done=False)
+        raise httpx.ReadError("connection reset")
+
+    mock_llm(lambda payload: httpx.Response(200, content=broken_body()))
+    tokens = []
+
+    async def run():
+        async for token in LLMClient("test-model").query_stream("hi"):
+            tokens.append(token)
+
+    with pytest.raises(LLMError):
+        asyncio.run(run())
+    assert tokens == ["partial"]
+
+
+def test_calls_share_one_pooled_client(mock_llm):
+    server = mock_llm(lambda payload: httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]}))
+    pooled = llm_client.get_http_client()
+
+    async def run():
+        clients = [LLMClient("a"), LLMClient("b")]
+        return await asyncio.gather(*(client.query("hi") for client in clients * 3))
+
+    assert asyncio.run(run()) == ["ok"] * 6
+    assert len(server.requests) == 6
+    assert llm_client.get_http_client() is pooled
+    assert llm_client.open_http_client() is pooled
+
+    asyncio.run(llm_client.close_http_client())
+    assert pooled.is_closed
+    # A closed pool is replaced on next use rather than reused
+    reopened = llm_client.get_http_client()
+    assert reopened is not pooled and not reopened.is_closed
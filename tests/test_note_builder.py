@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from app.config import Config
+from app.core import note_builder
+from app.core.llm_client import LLMError
+from app.core.lru_cache import TTLCache
+
+
+class StubLLM:
+    """
+    LLMClient stand-in: echoes a short summary of each prompt and records it.
+    """
+
+    prompts: list[str] = []
+    fail = False
+
+    def __init__(self, model_name: str, max_tokens: int = 1024):
+        self.model_name = model_name
+
+    async def query(self, prompt: str) -> str:
+        StubLLM.prompts.append(prompt)
+        if StubLLM.fail:
+            raise LLMError("[LLM failed]")
+        if prompt.startswith(note_builder.MAP_PROMPT.split("{text}")[0]):
+            first = prompt.split("Exchanges:\n", 1)[1].split(":", 1)[0]
+            return f"notes from {first}"
+        if prompt.startswith(note_builder.REDUCE_PROMPT.split("{text}")[0]):
+            return "merged(" + prompt.split("Partial notes:\n", 1)[1].replace("\n\n---\n\n", "|") + ")"
+        return prompt
+
+
+@pytest.fixture
+def session(monkeypatch):
+    interactions = []
+    StubLLM.prompts = []
+    StubLLM.fail = False
+    monkeypatch.setattr(note_builder, "LLMClient", StubLLM)
+    monkeypatch.setattr(note_builder, "load_interactions", lambda session_id: interactions)
+    monkeypatch.setattr(note_builder, "summary_cache", TTLCache(max_entries=100, ttl_seconds=60))
+    monkeypatch.setattr(Config, "NOTES_WINDOW_EXCHANGES", 2)
+    monkeypatch.setattr(Config, "NOTES_REDUCE_FANIN", 2)
+    return interactions
+
+
+def generate(prompt_type="full", custom_prompt=""):
+    return asyncio.run(note_builder.generate_notes("s", "free", "text", prompt_type, custom_prompt))
+
+
+def test_no_conversation(session):
+    assert generate().startswith("[Error")
+    assert StubLLM.prompts == []
+
+
+def test_short_session_is_one_prompt(session):
+    session.extend([{"query": "What is BM25?", "response": "A ranking function."}])
+    notes = generate(prompt_type="custom", custom_prompt="Use tables")
+    assert len(StubLLM.prompts) == 1
+    assert "Q1: What is BM25?\nA1: A ranking function." in notes
+    assert "User Instructions:\nUse tables" in notes
+
+
+def test_response_only_omits_queries(session):
+    session.extend([{"query": "secret question", "response": "answer"}])
+    notes = generate(prompt_type="response_only")
+    assert "A1: answer" in notes and "secret question" not in notes
+
+
+def test_long_session_is_map_reduced_in_order(session):
+    session.extend({"query": f"q{i}", "response": f"r{i}"} for i in range(7))
+    notes = generate()
+    # 4 windows of 2 -> 2 merges -> final prompt; window numbering continues across windows
+    assert "merged(notes from Q1|notes from Q3)\n\n---\n\nmerged(notes from Q5|notes from Q7)" in notes
+    assert len(StubLLM.prompts) == 4 + 2 + 1
+
+
+def test_unchanged_windows_come_from_the_cache(session):
+    session.extend({"query": f"q{i}", "response": f"r{i}"} for i in range(4))
+    generate()
+    session.extend({"query": f"q{i}", "response": f"r{i}"} for i in range(4, 6))
+    StubLLM.prompts = []
+    generate()
+    # Only the new window is summarised
+    map_prompts = [p for p in StubLLM.prompts if "Exchanges:" in p]
+    assert len(map_prompts) == 1 and "Q5:" in map_prompts[0]
+
+
+def test_failed_summaries_are_not_cached(session):
+    session.extend({"query": f"q{i}", "response": f"r{i}"} for i in range(4))
+    StubLLM.fail = True
+    assert generate() == "[LLM failed]"
+    StubLLM.fail = False
+    StubLLM.prompts = []
+    generate()
+    assert len([p for p in StubLLM.prompts if "Exchanges:" in p]) == 2
@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from app.core.scheduler import FairClock, Overloaded, TierScheduler
+
+
+def make_scheduler(**overrides):
+    options = {
+        "capacity": 2,
+        "quotas": {"free": 1, "pro": 2},
+        "weights": {"free": 1.0, "pro": 3.0},
+        "queue_limits": {"free": 1, "pro": 8},
+        "timeout": 1.0,
+    }
+    options.update(overrides)
+    return TierScheduler(**options)
+
+
+def test_fair_clock_shares_by_weight():
+    clock = FairClock({"free": 1.0, "pro": 3.0})
+    tags = [(clock.tag("free"), "free") for _ in range(4)] + [(clock.tag("pro"), "pro") for _ in range(12)]
+    served = [tier for _, tier in sorted(tags)[:8]]
+    assert served.count("pro") == 6 and served.count("free") == 2
+
+
+def test_fair_clock_idle_tier_banks_no_credit():
+    clock = FairClock({"free": 1.0, "pro": 1.0})
+    for _ in range(5):
+        clock.advance(clock.tag("pro"))
+    # free was idle: it starts at the current virtual time, not at 0
+    assert clock.tag("free") == clock.vtime
+
+
+def test_quota_caps_a_tier_and_queue_limit_sheds():
+    async def run():
+        scheduler = make_scheduler()
+        await scheduler.acquire("free")
+        waiter = asyncio.ensure_future(scheduler.acquire("free"))
+        await asyncio.sleep(0)
+        # A slot is free, but free is at its quota of 1
+        assert scheduler.active == {"free": 1, "pro": 0} and not waiter.done()
+        with pytest.raises(Overloaded):
+            await scheduler.acquire("free")
+        assert scheduler.shed["free"] == 1
+
+        scheduler.release("free")
+        await waiter
+        assert scheduler.active["free"] == 1
+
+    asyncio.run(run())
+
+
+def test_freed_slots_go_to_lowest_fair_tag():
+    async def run():
+        scheduler = make_scheduler(capacity=1, quotas={"free": 1, "pro": 1}, queue_limits={"free": 8, "pro": 8})
+        order = []
+
+        async def request(tier):
+            async with scheduler.slot(tier):
+                order.append(tier)
+                await asyncio.sleep(0)
+
+        await scheduler.acquire("pro")
+        tasks = [asyncio.ensure_future(request(t)) for t in ["free", "free", "pro", "pro", "pro", "pro"]]
+        await asyncio.sleep(0)
+        scheduler.release("pro")
+        await asyncio.gather(*tasks)
+        # pro (weight 3) advances its tag a third as fast; ties go to free
+        assert order == ["free", "pro", "pro", "free", "pro", "pro"]
+
+    asyncio.run(run())
+
+
+def test_waiting_too_long_times_out():
+    async def run():
+        scheduler = make_scheduler(capacity=1, timeout=0.01)
+        await scheduler.acquire("pro")
+        with pytest.raises(Overloaded) as e:
+            await scheduler.acquire("pro")
+        assert e.value.retry_after == 0.01
+        assert scheduler.timed_out["pro"] == 1 and scheduler.stats()["tiers"]["pro"]["waiting"] == 0
+        # The abandoned waiter doesn't take the next free slot
+        scheduler.release("pro")
+        await scheduler.acquire("pro")
+        assert scheduler.active["pro"] == 1
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_is_removed():
+    async def run():
+        scheduler = make_scheduler(capacity=1)
+        await scheduler.acquire("pro")
+        waiter = asyncio.ensure_future(scheduler.acquire("pro"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.stats()["tiers"]["pro"]["waiting"] == 0
+        scheduler.release("pro")
+        assert scheduler.active["pro"] == 0
+
+    asyncio.run(run())
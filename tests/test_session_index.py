@@ -0,0 +1,43 @@
+import numpy as np
+
+from app.core.session_index import SessionVectors
+
+
+def test_search_returns_exact_cosine_top_k():
+    vectors = SessionVectors()
+    vectors.add(["x", "y", "xy"], [[1, 0], [0, 2], [1, 1]], [{"n": 1}, {"n": 2}, {"n": 3}])
+    hits = vectors.search([3, 0], top_k=2)
+    assert [chunk_id for chunk_id, _, _ in hits] == ["x", "xy"]
+    assert hits[0][1] == np.float32(1.0)
+    assert abs(hits[1][1] - 2 ** -0.5) < 1e-6
+    assert hits[0][2] == {"n": 1}
+    assert [chunk_id for chunk_id, _, _ in vectors.search([0, 1], top_k=10)] == ["y", "xy", "x"]
+
+
+def test_readding_an_id_overwrites_its_row():
+    vectors = SessionVectors()
+    vectors.add(["a", "b"], [[1, 0], [0, 1]], [{"v": 1}, {"v": 1}])
+    vectors.add(["a"], [[0, 1]], [{"v": 2}])
+    assert len(vectors) == 2
+    hits = vectors.search([0, 1], top_k=2)
+    assert sorted((chunk_id, payload["v"]) for chunk_id, _, payload in hits) == [("a", 2), ("b", 1)]
+
+
+def test_grows_past_initial_capacity():
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(200, 8)).astype(np.float32)
+    vectors = SessionVectors()
+    for start in range(0, 200, 30):
+        ids = [str(i) for i in range(start, min(start + 30, 200))]
+        vectors.add(ids, data[start:start + 30], [{} for _ in ids])
+    assert len(vectors) == 200
+    for i in (0, 63, 64, 199):
+        assert vectors.search(data[i], top_k=1)[0][0] == str(i)
+
+
+def test_empty_index_and_zero_k():
+    vectors = SessionVectors()
+    assert vectors.search([1, 0], top_k=3) == []
+    vectors.add([], [], [])
+    vectors.add(["a"], [[1, 0]], [{}])
+    assert vectors.search([1, 0], top_k=0) == []
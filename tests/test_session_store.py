@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+
+import pytest
+
+from app.services.session_store import ExchangeLimitReached, JsonlSessionStore, SessionStore, SqliteSessionStore
+
+
+@pytest.fixture(params=["jsonl", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "jsonl":
+        return JsonlSessionStore(str(tmp_path / "sessions"))
+    return SqliteSessionStore(str(tmp_path / "sessions.sqlite3"))
+
+
+def test_session_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+def test_append_returns_count(store):
+    assert store.count("s") == 0
+    assert [store.append("s", f"q{i}", f"r{i}") for i in range(3)] == [1, 2, 3]
+    assert store.append("other", "q", "r") == 1
+    assert store.count("s") == 3
+
+
+def test_read_all(store):
+    for i in range(5):
+        store.append("s", f"q{i}", f"r{i}", mode="text")
+    assert [e["response"] for e in store.read_all("s")] == [f"r{i}" for i in range(5)]
+    assert store.read_all("s")[0]["mode"] == "text"
+    assert store.read_all("missing") == []
+
+
+def test_reserve_counts_pending_claims(store):
+    store.append("s", "q0", "r0")
+    first = store.reserve("s", limit=3)
+    second = store.reserve("s", limit=3)
+    with pytest.raises(ExchangeLimitReached):
+        store.reserve("s", limit=3)
+
+    second.release()
+    second.release()
+    third = store.reserve("s", limit=3)
+    assert first.commit("q1", "r1") == 2
+    assert third.commit("q2", "r2") == 3
+    # Committing consumed the claims, so only stored exchanges count now
+    with pytest.raises(ExchangeLimitReached):
+        store.reserve("s", limit=3)
+    assert store.reserve("s", limit=None).commit("q3", "r3") == 4
+    assert store.count("s") == 4
+
+
+def test_concurrent_reservations_respect_limit(store):
+    granted = []
+    barrier = threading.Barrier(8)
+
+    def claim():
+        barrier.wait()
+        try:
+            granted.append(store.reserve("s", limit=3))
+        except ExchangeLimitReached:
+            pass
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(granted) == 3
+    for reservation in granted:
+        reservation.commit("q", "r")
+    assert store.count("s") == 3
+
+
+def test_jsonl_migrates_legacy_log(tmp_path):
+    os.makedirs(tmp_path / "s")
+    with open(tmp_path / "s" / "interaction_log.json", "w") as f:
+        json.dump([{"query": "old", "response": "answer"}], f)
+    store = JsonlSessionStore(str(tmp_path))
+    assert store.count("s") == 1
+    assert store.append("s", "new", "answer") == 2
+    assert [e["query"] for e in store.read_all("s")] == ["old", "new"]
+
+
+def test_jsonl_ignores_partial_trailing_line(tmp_path):
+    store = JsonlSessionStore(str(tmp_path))
+    store.append("s", "q", "r")
+    with open(store.path("s"), "a") as f:
+        f.write('{"query": "half')
+    assert [e["query"] for e in store.read_all("s")] == ["q"]
+
+
+def test_jsonl_count_sees_appends_by_other_writers(tmp_path):
+    store = JsonlSessionStore(str(tmp_path))
+    other = JsonlSessionStore(str(tmp_path))
+    store.append("s", "q1", "r1")
+    other.append("s", "q2", "r2")
+    assert store.count("s") == 2
+    assert store.append("s", "q3", "r3") == 3